@@ -1,18 +1,42 @@
-from flask import Flask, request, render_template_string, send_file, session, redirect, url_for
+from flask import Flask, request, render_template_string, session, redirect, url_for, jsonify, Response, stream_with_context
 import os
-import requests
 import re
+import logging
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import csv
-import io
+import threading
+import time
+from collections import Counter
+from azure_client import AzureOpenAIError, StreamedResponse, get_client
+from async_client import get_runner
+from llm_cache import get_cache
+from post_store import get_store
+from post_archive import POST_ARCHIVE_ENABLED, get_archive
+from post_prompts import PLATFORM_CHAR_LIMITS, post_messages, prompt_cache, template_name
+from job_queue import get_queue
+from post_stream import IncrementalPostParser, format_sse
+from response_parser import split_content_hashtags
+from generation_engine import (GENERATION_CONCURRENCY, CompletionRequest, DeadlineExceeded, GenerationError,
+                               campaign_deadline, generate_posts, generate_posts_async, generate_post_batches, run_steps, run_steps_async)
+from candidate_selection import DEFAULT_RULES, PLATFORM_RULES, candidate_count, select_candidate, selection_stats
+from length_fitter import LENGTH_FIT_ENABLED, combined_length, fit_post, truncate_words
+from token_budget import token_budget
+from batch_generation import BATCH_FORMAT_INSTRUCTIONS, GENERATION_BATCH_SIZE, run_batch
+from duplicate_index import DUPLICATE_CHECK_ENABLED, DUPLICATE_MAX_REGENERATIONS, SeriesIndex
+from platform_variants import (CROSS_POST_PLATFORMS, DERIVED_PLATFORMS, DRAFT_WAIT_TIMEOUT, DraftBoard, derivation_prompt,
+                               multi_platform_tasks)
+import metrics
 
 load_dotenv()
 
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
-AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY")
+# Request completions with stream=true and push tokens to the page as they arrive
+STREAM_COMPLETIONS = os.getenv("STREAM_COMPLETIONS", "0") == "1"
+# Generate single-platform campaigns as coroutines on one event loop (set by
+# asgi.py); cross-posted and batched campaigns keep using worker threads
+ASYNC_GENERATION = os.getenv("ASYNC_GENERATION", "0") == "1"
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "supersecretkey")
@@ -161,6 +185,21 @@ HTML_TEMPLATE = """
             gap: 24px;
             margin-bottom: 10px;
         }
+        .results-grid {
+            display: grid;
+            gap: 16px;
+            overflow-x: auto;
+        }
+        .platform-badge {
+            display: inline-block;
+            background: #ffe066;
+            color: #7a5c00;
+            border-radius: 6px;
+            padding: 2px 8px;
+            margin-right: 8px;
+            font-size: 0.85em;
+            text-transform: capitalize;
+        }
         .result-card {
             background: #fffde4;
             border-radius: 14px;
@@ -196,6 +235,46 @@ HTML_TEMPLATE = """
             margin-bottom: 6px;
             letter-spacing: 1px;
         }
+        .post-pending {
+            color: #b38f00;
+            font-style: italic;
+            margin-bottom: 10px;
+        }
+        .job-progress {
+            font-weight: 600;
+            color: #b38f00;
+            margin-bottom: 12px;
+        }
+        .post-error {
+            color: #c62828;
+            background: #ffebee;
+            border: 1.5px solid #ef9a9a;
+            border-radius: 8px;
+            padding: 8px 12px;
+            margin-bottom: 10px;
+            font-size: 0.95em;
+        }
+        .save-status {
+            min-height: 1.2em;
+            margin-top: 6px;
+            font-size: 0.85em;
+            color: #757575;
+        }
+        .history {
+            margin-top: 36px;
+            border-top: 1.5px solid #ffe066;
+            padding-top: 20px;
+        }
+        .history-search {
+            display: flex;
+            gap: 8px;
+            align-items: flex-end;
+        }
+        .history-search input, .history-search select { margin: 0; }
+        .history-meta {
+            font-size: 0.85em;
+            color: #757575;
+        }
         .poll-question {
             background: linear-gradient(135deg, #fff9c4 0%, #fffde4 100%);
             border: 2px solid #ffe066;
@@ -283,6 +362,7 @@ HTML_TEMPLATE = """
                     <option value="linkedin">LinkedIn</option>
                     <option value="facebook">Facebook</option>
                     <option value="tiktok">TikTok</option>
+                    <option value="all">All platforms (cross-post)</option>
                 </select>
             </div>
             <div class="form-group">
@@ -323,20 +403,101 @@ HTML_TEMPLATE = """
                     <option value="7">Weekly (7 days apart)</option>
                 </select>
             </div>
+            <div class="form-group">
+                <label><input type="checkbox" name="fresh" value="1" style="width:auto;margin-right:8px;">Generate fresh variants (skip cached results)</label>
+            </div>
             <button class="btn" id="generateBtn" type="submit">
                 <span id="spinner" style="display:none;vertical-align:middle;margin-right:8px;width:18px;height:18px;border:3px solid #fff;border-radius:50%;border-top:3px solid #ffd600;animation:spin 1s linear infinite;"></span>
                 <span id="btnText">Generate Posts</span>
             </button>
         </form>
+        <div class="history">
+            <h3>Reuse Past Posts</h3>
+            <form method="get" action="{{ url_for('history') }}" class="history-search">
+                <input type="search" name="q" placeholder="Search earlier posts by topic, words or hashtags" value="{{ history_query.q|default('') }}">
+                <select name="platform" style="max-width:140px;">
+                    <option value="">Any platform</option>
+                    {% for value in ['general', 'instagram', 'twitter', 'linkedin', 'facebook', 'tiktok'] %}
+                    <option value="{{ value }}" {% if history_query.platform == value %}selected{% endif %}>{{ value|capitalize }}</option>
+                    {% endfor %}
+                </select>
+                <select name="tone" style="max-width:140px;">
+                    <option value="">Any tone</option>
+                    {% for value in ['professional', 'casual', 'educational', 'inspirational', 'humorous'] %}
+                    <option value="{{ value }}" {% if history_query.tone == value %}selected{% endif %}>{{ value|capitalize }}</option>
+                    {% endfor %}
+                </select>
+                <button class="btn" type="submit" style="margin:0;">Search</button>
+            </form>
+            {% if history_error %}
+            <div class="post-error" style="margin-top:12px;">⚠️ {{ history_error }}</div>
+            {% endif %}
+            {% if history is not none %}
+            {% if history %}
+            <form method="post" action="{{ url_for('reschedule_history') }}" style="margin-top:16px;">
+                <div class="results-list">
+                    {% for entry in history %}
+                    <label class="result-card" style="font-weight:normal;color:inherit;">
+                        <div class="result-row">
+                            <input type="checkbox" name="post_id" value="{{ entry.id }}" style="width:auto;">
+                            <span class="platform-badge">{{ entry.platform }}</span><strong>{{ entry.topic }}</strong>
+                        </div>
+                        <div style="white-space:pre-line;">{{ entry.content }}</div>
+                        <div class="hashtags">{{ entry.hashtags }}</div>
+                        <div class="history-meta">{{ entry.tone }} · {{ (entry.prompt_tokens or 0) + (entry.completion_tokens or 0) }} tokens · {{ '%.1f'|format(entry.latency or 0) }}s</div>
+                    </label>
+                    {% endfor %}
+                </div>
+                <div class="result-row" style="margin-top:16px;">
+                    <label>Date:</label>
+                    <input type="date" name="baseDate" required value="{{ base_date }}" class="edit-input" style="max-width: 140px;">
+                    <label style="margin-left:16px;">Time:</label>
+                    <input type="time" name="baseTime" required value="{{ base_time }}" class="edit-input" style="max-width: 100px;">
+                    <select name="timeOption" class="edit-input" style="max-width: 160px;">
+                        <option value="same">Same time for all</option>
+                        <option value="different">Daily intervals</option>
+                    </select>
+                    <select name="interval" class="edit-input" style="max-width: 120px;">
+                        <option value="1">1 day apart</option>
+                        <option value="2">2 days apart</option>
+                        <option value="3">3 days apart</option>
+                        <option value="7">7 days apart</option>
+                    </select>
+                </div>
+                <button class="btn" type="submit">Schedule Selected Posts</button>
+            </form>
+            {% else %}
+            <p class="history-meta">No earlier posts match.</p>
+            {% endif %}
+            {% endif %}
+        </div>
         {% if posts %}
         <div class="posts">
             <h3>Generated Posts</h3>
-            <form method="post">
+            {% if job %}
+            <div class="job-progress" id="jobProgress">Generated {{ job.completed }} of {{ job.total }} posts...</div>
+            {% endif %}
+            <form method="post" id="editForm">
                 <input type="hidden" name="edit" value="1">
+                {% if platforms %}
+                <div class="results-grid" style="grid-template-columns: repeat({{ platforms|length }}, minmax(260px, 1fr));">
+                {% else %}
                 <div class="results-list">
+                {% endif %}
                     {% for post in posts %}
-                    <div class="result-card">
+                    <div class="result-card" id="post-{{ loop.index0 }}" data-version="{{ post.version }}"
+                         data-url="{{ url_for('patch_post', campaign_id=campaign_id, index=loop.index0) }}">
+                        {% if post.platform %}
+                        <div class="post-number"><span class="platform-badge">{{ post.platform }}</span>Post {{ loop.index0 // platforms|length + 1 }}</div>
+                        {% else %}
                         <div class="post-number">Post {{ loop.index }}</div>
+                        {% endif %}
+                        {% if post.status == 'pending' %}
+                        <div class="post-pending">⏳ Generating...</div>
+                        {% endif %}
+                        {% if post.status == 'failed' %}
+                        <div class="post-error">⚠️ Generation failed: {{ post.error }}</div>
+                        {% endif %}
                         <div class="result-row">
                             <label>Date:</label>
                             <input type="date" name="date_{{ loop.index0 }}" value="{{ post.date }}" required class="edit-input" style="max-width: 140px;">
@@ -351,15 +512,21 @@ HTML_TEMPLATE = """
                             <label>Hashtags:</label>
                             <textarea name="hashtags_{{ loop.index0 }}" class="edit-textarea" style="min-height:30px;">{{ post.hashtags }}</textarea>
                         </div>
+                        <div class="save-status"></div>
                     </div>
                     {% endfor %}
                 </div>
-                <button class="btn" type="submit" style="margin-top:16px;">Save Changes</button>
+                <button class="btn" type="submit" id="saveBtn" style="margin-top:16px;">Save Changes</button>
             </form>
             <form method="get" action="{{ url_for('download_csv') }}" style="margin-top:24px;">
                 <button class="csv-btn" type="submit" title="Download as CSV">
                     <span style="vertical-align:middle;margin-right:8px;">&#128190;</span> Download CSV
                 </button>
+                {% for platform in platforms %}
+                <button class="csv-btn" type="submit" name="platform" value="{{ platform }}" title="Download the {{ platform }} posts as CSV" style="text-transform:capitalize;">
+                    {{ platform }} CSV
+                </button>
+                {% endfor %}
             </form>
         </div>
         {% endif %}
@@ -383,6 +550,113 @@ HTML_TEMPLATE = """
                 btnText.textContent = 'Generating...';
             }
         });
+
+        {% if posts %}
+        // Each card saves its changed fields on its own, so an edit never
+        // re-renders the list; the Save Changes form remains for browsers without JS
+        var savedValues = {};
+        var saveTimers = {};
+        document.getElementById('saveBtn').style.display = 'none';
+        document.querySelectorAll('#editForm .edit-input, #editForm .edit-textarea').forEach(function(field) {
+            savedValues[field.name] = field.value;
+            field.addEventListener('input', function() {
+                clearTimeout(saveTimers[field.name]);
+                saveTimers[field.name] = setTimeout(function() { saveField(field); }, 800);
+            });
+            field.addEventListener('change', function() { saveField(field); });
+        });
+        document.getElementById('editForm').addEventListener('submit', function(e) { e.preventDefault(); });
+
+        function saveField(field) {
+            clearTimeout(saveTimers[field.name]);
+            var name = field.name.split('_');
+            var card = document.getElementById('post-' + name[1]);
+            // Saves of one card run one after another so each sends the version the previous one returned
+            card.saving = (card.saving || Promise.resolve()).then(function() {
+                if (field.value === savedValues[field.name]) return;
+                var value = field.value;
+                var body = {version: parseInt(card.dataset.version, 10)};
+                body[name[0]] = value;
+                var status = card.querySelector('.save-status');
+                status.textContent = 'Saving...';
+                return fetch(card.dataset.url, {
+                    method: 'PATCH',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify(body)
+                }).then(function(r) {
+                    return r.json().then(function(data) {
+                        if (r.ok) {
+                            savedValues[field.name] = value;
+                            card.dataset.version = data.version;
+                            status.textContent = 'Saved';
+                        } else if (r.status === 409) {
+                            showPost(data.post);
+                            status.textContent = 'This post was changed elsewhere; showing the latest version';
+                        } else {
+                            status.textContent = '⚠️ Not saved: ' + data.error;
+                        }
+                    });
+                }).catch(function() { status.textContent = '⚠️ Not saved: connection lost'; });
+            });
+        }
+
+        function showPost(post) {
+            var card = document.getElementById('post-' + post.index);
+            if (!card) return;
+            var pending = card.querySelector('.post-pending');
+            if (pending && post.status) pending.textContent = post.status === 'ok' ? '✅ Ready' : '⚠️ ' + post.error;
+            ['date', 'time', 'content', 'hashtags'].forEach(function(name) {
+                if (post[name] === undefined) return;
+                var field = card.querySelector('[name="' + name + '_' + post.index + '"]');
+                field.value = savedValues[field.name] = post[name];
+            });
+            if (post.version !== undefined) card.dataset.version = post.version;
+        }
+        {% endif %}
+
+        {% if job %}
+
+        if (window.EventSource) {
+            // Posts (and tokens, when streaming is enabled) are pushed as they finish
+            var source = new EventSource('{{ url_for('job_events', job_id=job.id, after=job.events) }}');
+            var completed = {{ job.completed }};
+            source.addEventListener('delta', function(e) {
+                var delta = JSON.parse(e.data);
+                var box = document.querySelector('textarea[name="content_' + delta.index + '"]');
+                if (box) box.value += delta.text;
+            });
+            source.addEventListener('post', function(e) {
+                showPost(JSON.parse(e.data));
+                completed += 1;
+                document.getElementById('jobProgress').textContent =
+                    'Generated ' + completed + ' of {{ job.total }} posts...';
+            });
+            source.addEventListener('state', function(e) {
+                var job = JSON.parse(e.data);
+                if (job.state === 'done' || job.state === 'failed') {
+                    source.close();
+                    window.location.reload();
+                }
+            });
+        } else (function pollJob() {
+            fetch('{{ url_for('job_status', job_id=job.id) }}')
+                .then(function(r) { return r.json(); })
+                .then(function(job) {
+                    if (job.error && !job.posts) return;
+                    document.getElementById('jobProgress').textContent =
+                        'Generated ' + job.completed + ' of ' + job.total + ' posts...';
+                    if (job.state === 'done' || job.state === 'failed') {
+                        window.location.reload();
+                        return;
+                    }
+                    job.posts.forEach(function(post) {
+                        if (post.status !== 'pending') showPost(post);
+                    });
+                    setTimeout(pollJob, 1500);
+                })
+                .catch(function() { setTimeout(pollJob, 3000); });
+        })();
+        {% endif %}
     </script>
 </body>
 </html>
@@ -397,272 +671,371 @@ PLATFORM_ALGORITHMS = {
     "general": "General Social Media Algorithm: Post engaging, relevant content with appropriate hashtags. Encourage interaction, post consistently, and use a mix of content types for best results. Content length: up to 800 characters."
 }
 
-def generate_post_llm(topic, platform, tone, index, algorithm):
-    PLATFORM_CHAR_LIMITS = {
-        'instagram': 800,
-        'twitter': 280,
-        'linkedin': 1200,
-        'facebook': 1000,
-        'tiktok': 150,
-        'general': 800
-    }
-    char_limit = PLATFORM_CHAR_LIMITS.get(platform, PLATFORM_CHAR_LIMITS['general'])
-    if AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_KEY and AZURE_OPENAI_DEPLOYMENT and AZURE_OPENAI_API_VERSION:
-        print(f"Generating content for {platform} with topic: {topic}")
-        print(f"API Endpoint: {AZURE_OPENAI_ENDPOINT}")
-        print(f"Deployment: {AZURE_OPENAI_DEPLOYMENT}")
-        print(f"API Version: {AZURE_OPENAI_API_VERSION}")
-        print(f"API Key: {'Set' if AZURE_OPENAI_KEY else 'Not set'}")
-        prompt = f'''
-You are an expert content creator or copywriter. Generate an engaging article/post on "{topic}".
+HTML_TAG = re.compile('<[^<]+?>')
+# Rows joined into each chunk of a streamed CSV download
+CSV_CHUNK_ROWS = 100
+# Post fields the results page can edit, and the formats the dated ones must follow
+EDITABLE_FIELDS = ('date', 'time', 'content', 'hashtags')
+EDITABLE_FORMATS = {'date': '%Y-%m-%d', 'time': '%H:%M'}
+# Campaigns a session remembers as its own for cross-campaign CSV exports;
+# the IDs travel in the session cookie, which holds about 4KB
+SESSION_CAMPAIGNS = 50
 
-Context:
-- Target audience: {platform}
-- Purpose: educate, inform, and engage
-- Style: {tone}
+def observe_usage(response, data, template=None):
+    # Calibrate the chars-per-token ratio from fresh (not cached) answers
+    if not getattr(response, 'from_cache', False):
+        token_budget.observe(data.get("usage"), choice_texts(data))
+        if template is not None:
+            prompt_cache.observe(template, data.get("usage"))
 
-Tone Guidelines:
-- Professional: Use formal language, industry insights, and authoritative tone. Include data, statistics, and expert opinions.
-- Casual & Friendly: Use conversational language, personal anecdotes, and relatable examples. Be warm and approachable.
-- Educational: Use clear explanations, step-by-step breakdowns, and teaching moments. Include "did you know" facts and learning points.
-- Inspirational: Use motivational language, success stories, and uplifting messages. Include quotes, achievements, and positive energy.
-- Humorous: Use wit, clever analogies, and light-hearted approach. Include puns, funny observations, and entertaining angles.
-
-Structure:
-- Start with a compelling hook that immediately explains what the topic is and why it matters to the reader.
-- Use a comprehensive, story-like narrative that thoroughly explores the topic with detailed explanations, real-world examples, and practical applications.
-- Organize the post into 2-3 engaging, descriptive sections or paragraphs for shorter platforms (Instagram, Facebook, General), or 3-4 sections for longer platforms (LinkedIn). Each section should deeply explore different aspects, provide detailed explanations, and include practical examples that help readers truly understand the topic.
-- Use tone-appropriate formatting: Professional (clean, structured), Casual (emojis, friendly), Educational (bullet points, examples), Inspirational (bold statements, quotes), Humorous (clever formatting, puns).
-- Include comprehensive examples: Professional (detailed industry cases), Casual (relatable personal stories), Educational (step-by-step learning moments), Inspirational (detailed success stories), Humorous (entertaining analogies with explanations).
-- Provide detailed explanations that break down complex concepts into simple, understandable parts.
-- End with a comprehensive summary that reinforces understanding and provides actionable insights.
-
-Tone & Style:
-- Use storytelling, relatable examples, and vivid language to make the topic enjoyable and easy to understand for all readers.
-- Use simple, clear language. Avoid overly AI‑sounding or polished phrases.
-- Maintain conversational flow, vary sentence length, sprinkle rhetorical questions or surprises for “burstiness” and engagement.
-
-Mentions:
-- You must mention at least 2 influential people (real or hypothetical, relevant to the topic and platform) in the post, and each mention must start with '@' (e.g., @sundarpichai, @tim_cook, @satyanadella, @larrypage, @sherylsandberg, @markzuckerberg, etc). More than 2 mentions are allowed if relevant.
-- Choose the most relevant influential people for the topic (e.g., Sundar Pichai, Tim Cook, Satya Nadella, Larry Page, Sheryl Sandberg, Mark Zuckerberg, etc).
-
-Hashtags:
-- All hashtags must be placed together at the end of the post, not within the content.
-- Hashtags must be highly relevant to the topic only (not the platform or generic tags).
-- You must include hashtags as instructed. Do not skip this step.
-
-Constraints:
-- Each section ≈ 80–120 words
-- Don’t use jargon unless you define it
-- Avoid vague statements; be specific
-- IMPORTANT: The entire post, including headings, content, and hashtags, must be no longer than {char_limit} characters. Do not exceed this limit. Finish your story or post naturally within this space. Do not cut off mid-sentence or mid-thought - ensure complete, coherent endings.
-
-Engagement Tips:
-- Professional: Use industry statistics, expert quotes, and authoritative language. Include detailed data-driven insights, comprehensive case studies, and professional achievements with thorough explanations.
-- Casual & Friendly: Use emojis, personal stories, and conversational language. Include relatable examples, detailed personal anecdotes, and warm interactions that help readers connect with the topic.
-- Educational: Use "did you know" facts, step-by-step explanations, and detailed learning moments. Include comprehensive examples, teaching points, and thorough breakdowns of complex concepts.
-- Inspirational: Use motivational quotes, success stories, and uplifting language. Include detailed achievement stories, comprehensive success examples, and positive energy that motivates learning.
-- Humorous: Use clever puns, witty observations, and entertaining angles. Include funny analogies with detailed explanations and light-hearted humor that makes learning enjoyable.
-- Provide comprehensive explanations that break down complex topics into simple, understandable parts
-- Include practical applications and real-world examples that help readers truly understand and apply the knowledge
-- Use detailed analogies and metaphors that make abstract concepts concrete and relatable
-
-After the content, add a line starting with 'Hashtags:' followed by hashtags that are highly relevant to the topic only, with #, space-separated. For Twitter, use only 2-3 hashtags. For other platforms, use up to 10 hashtags. Do not repeat hashtags from previous posts in the series.
-'''
-        
-        # Special handling for Twitter to ensure concise content
-        if platform == 'twitter':
-            prompt = f'''
-You are an expert Twitter content creator. Generate a concise, engaging tweet about "{topic}".
-
-Requirements:
-- Maximum 240 characters for content (leaving 40 for hashtags and mentions)
-- Include 1 mention starting with '@' (e.g., @sundarpichai, @tim_cook, @satyanadella)
-- Use only 2-3 relevant hashtags at the end
-- Make it viral-worthy and shareable
-- Use trending language and emojis where appropriate
-- Include surprising facts or statistics
-- Create FOMO (fear of missing out) or curiosity
-- Use power words and emotional triggers
-- Ensure the tweet has a natural, complete ending - do not cut off mid-sentence
-
-Format: Content with mention + hashtags
-Example: "🚀 AI is changing healthcare FOREVER! @sundarpichai just revealed Google's AI can diagnose diseases 10x faster than doctors. This is INSANE! The future is NOW! 🔥 #AI #Healthcare #Tech"
-
-Generate the tweet within the 280 character limit.
-'''
-        
-        url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_OPENAI_KEY
-        }
+def add_usage(spent, response, data):
+    # What a post cost; answers from the completion cache cost nothing
+    if getattr(response, 'from_cache', False):
+        return
+    usage = data.get("usage")
+    spent['answers'] += 1
+    if not usage:
+        # A stream that did not report its usage
+        spent['unmetered'] += 1
+        return
+    spent['prompt_tokens'] += usage.get("prompt_tokens") or 0
+    spent['completion_tokens'] += usage.get("completion_tokens") or 0
+
+def archive_post(topic, platform, tone, content, hashtags, spent, latency, share=1):
+    """Keep a generated post in the history with what it cost.
+
+    spent is filled by add_usage; posts made only from cached answers were
+    archived when they were first generated. A completion that produced
+    share posts is split evenly between them, and the tokens are left
+    unknown when an answer did not report its usage.
+    """
+    if not POST_ARCHIVE_ENABLED or not spent['answers']:
+        return
+    metered = not spent['unmetered']
+    get_archive().add(topic=topic, platform=platform, tone=tone, content=content, hashtags=hashtags,
+                      prompt_tokens=round(spent['prompt_tokens'] / share) if metered else None,
+                      completion_tokens=round(spent['completion_tokens'] / share) if metered else None,
+                      latency=round(latency / share, 3))
+
+def choice_texts(data):
+    return [(choice.get("message") or {}).get("content") or '' for choice in data["choices"]]
+
+def cut_off_choices(data):
+    # Choices that stopped at max_tokens, possibly before their hashtags line
+    return {i for i, choice in enumerate(data["choices"]) if choice.get("finish_reason") == 'length'}
+
+def send_completion(request):
+    """Send a CompletionRequest with the shared blocking client."""
+    client = get_client()
+    if request.on_delta is None:
+        return client.chat_completion(request.body, timeout=request.timeout, use_cache=request.use_cache,
+                                      cache_variant=request.cache_variant)
+    # Stream tokens to the caller while the completion is generated
+    parser = IncrementalPostParser()
+    outcome = {}
+    try:
+        for delta in client.stream_chat_completion(request.body, timeout=request.timeout, use_cache=request.use_cache,
+                                                   cache_variant=request.cache_variant, outcome=outcome):
+            visible = parser.feed(delta)
+            if visible:
+                request.on_delta(visible)
+    except AzureOpenAIError as e:
+        raise GenerationError(str(e)) from e
+    return StreamedResponse(parser.text, outcome['from_cache'], outcome['usage'], outcome['finish_reason'])
+
+async def send_completion_async(request):
+    """Send a CompletionRequest from the async generation loop; answers are not streamed there."""
+    return await get_runner().client().chat_completion(request.body, timeout=request.timeout, use_cache=request.use_cache,
+                                                       cache_variant=request.cache_variant)
+
+def generate_post_llm(topic, platform, tone, index, algorithm, fresh=False, on_delta=None, avoid_hashtags=(), avoid_text=None,
+                      deadline=None):
+    steps = post_steps(topic, platform, tone, index, algorithm, fresh, on_delta, avoid_hashtags, avoid_text)
+    if deadline is None:
+        return run_steps(steps, send_completion)
+    return run_steps(steps, lambda request: send_completion(deadline.bind(request)))
+
+def post_steps(topic, platform, tone, index, algorithm, fresh=False, on_delta=None, avoid_hashtags=(), avoid_text=None):
+    """generate_post_llm as a generator of CompletionRequests, driven by run_steps or run_steps_async."""
+    char_limit = PLATFORM_CHAR_LIMITS.get(platform, PLATFORM_CHAR_LIMITS['general'])
+    if get_client().is_configured():
+        logger.debug("Generating post %s for %s with topic: %s", index, platform, topic)
+        prompt_start = time.perf_counter()
+        # The system prompt is shared by every post of a platform and tone and
+        # starts with instructions shared by all of them, so the provider's
+        # prompt cache can serve it; only the short user message varies
+        template = template_name('post', platform)
         body = {
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 400,
+            "messages": post_messages('post', topic, platform, tone, avoid_hashtags, avoid_text),
             "temperature": 0.9
         }
+        # max_tokens follows the platform's character limit instead of a fixed 400
+        token_budget.apply(body, char_limit)
+        metrics.span_seconds.observe(time.perf_counter() - prompt_start, span='prompt_build')
+        streaming = STREAM_COMPLETIONS and on_delta is not None
+        # Ask for several candidates in one call and keep the best one locally
+        candidates = 1 if streaming else candidate_count(platform)
+        if candidates > 1:
+            body["n"] = candidates
+        failed_reasons = set()
+        spent = Counter()
         try:
-            response = requests.post(url, headers=headers, json=body, timeout=30)
+            # A streamed answer is handed to on_delta as it is generated
+            response = yield CompletionRequest(body, use_cache=not fresh, cache_variant=index,
+                                               on_delta=on_delta if streaming else None)
             if response.status_code != 200:
-                print(f"API Error: Status {response.status_code}")
-                return None, None
+                raise GenerationError(f"API Error: Status {response.status_code}")
             data = response.json()
             if "choices" not in data or len(data["choices"]) == 0:
-                print(f"API Error: No choices in response")
-                return None, None
+                logger.warning("No choices in response for %s post %s", platform, index)
+                raise GenerationError("API Error: No choices in response")
             fullText = data["choices"][0]["message"]["content"].strip()
+            observe_usage(response, data, template)
+            add_usage(spent, response, data)
+            cut_off = cut_off_choices(data)
+            if len(data["choices"]) > 1:
+                with metrics.span('parse'):
+                    selection = select_candidate(choice_texts(data), lambda text: split_content_hashtags(text, platform),
+                                                 platform, char_limit, cut_off=cut_off)
+                fullText = data["choices"][selection.index]["message"]["content"].strip()
+                failed_reasons = set(selection.reasons)
+            elif cut_off:
+                failed_reasons = {'truncated'}
+            truncated = 'truncated' in failed_reasons
             if not fullText:
-                print(f"API Error: Empty response content")
-                return None, None
-            content = fullText
-            hashtags = ''
-            
-            # Special handling for Twitter - parse hashtags from the same line
-            if platform == 'twitter':
-                # Look for hashtags at the end of the content
-                hashtag_pattern = r'(\s+#\w+(?:\s+#\w+)*)$'
-                hashtag_match = re.search(hashtag_pattern, fullText)
-                if hashtag_match:
-                    hashtags = hashtag_match.group(1).strip()
-                    content = re.sub(hashtag_pattern, '', fullText).strip()
-                else:
-                    # If no hashtags found, treat entire content as content
-                    content = fullText.strip()
-                    hashtags = ''
-            else:
-                # For other platforms, use the original parsing logic
-                hashtagMatch = re.search(r'(?:^|\n)hashtags:\s*([#\w\s-]+)', fullText, re.IGNORECASE)
-                if hashtagMatch:
-                    hashtags = hashtagMatch.group(1).strip()
-                    content = re.sub(r'(?:^|\n)hashtags:\s*([#\w\s-]+)', '', content, flags=re.IGNORECASE).strip()
-                else:
-                    # Look for hashtags at the end of the content (similar to Twitter but for multi-line)
-                    lines = fullText.split('\n')
-                    content_lines = []
-                    hashtags = ''
-                    
-                    for line in lines:
-                        # Check if line contains mostly hashtags
-                        hashtag_count = line.count('#')
-                        word_count = len(line.split())
-                        
-                        if hashtag_count >= 2 and hashtag_count >= word_count * 0.5:  # If more than 50% are hashtags
-                            hashtags = line.strip()
-                        else:
-                            content_lines.append(line)
-                    
-                    content = '\n'.join(content_lines).strip()
-            # Remove all '**' and '*' from content
-            content = content.replace('**', '').replace('*', '')
-            # Check if total length exceeds limit and regenerate if needed
-            combined = (content + ' ' + hashtags).strip()
-            if len(combined) > char_limit:
-                # For Twitter, be extra strict about character limits
-                if platform == 'twitter' and len(combined) > 280:
-                    # Truncate content to fit within 280 characters
-                    available_chars = 280 - len(hashtags) - 1  # -1 for space
-                    if available_chars > 0:
-                        content = content[:available_chars].rsplit(' ', 1)[0] + '...'
-                        combined = (content + ' ' + hashtags).strip()
-                # If content is too long, try to regenerate with a more restrictive prompt
-                # Special regeneration prompt for Twitter
-                if platform == 'twitter':
-                    shorter_prompt = f'''
-You are an expert Twitter content creator. Generate a concise tweet about "{topic}".
-
-Requirements:
-- Maximum 240 characters for content
-- Include 1 mention starting with '@'
-- Use only 2-3 relevant hashtags
-- Make it viral-worthy and shareable
-- Use trending language and emojis where appropriate
-- Include surprising facts or statistics
-- Create FOMO or curiosity
-- Use power words and emotional triggers
-- Do not exceed 280 characters total
-- Ensure natural, complete endings - do not cut off mid-sentence
-
-Generate a tweet within the strict limit.
-'''
-                else:
-                    shorter_prompt = f'''
-You are an expert content creator. Generate a concise, engaging post on "{topic}" for {platform} in a {tone} tone.
-
-Requirements:
-- Maximum {char_limit} characters total (including hashtags)
-- Include at least 2 mentions starting with '@'
-- Add relevant hashtags at the end
-- For Twitter: use only 3-4 hashtags
-- For other platforms: use up to 10 hashtags
-- Make it engaging and complete within the limit
-- Match the {tone} tone: Professional (authoritative), Casual (friendly), Educational (instructive), Inspirational (uplifting), Humorous (entertaining)
-- Use tone-appropriate language and examples
-- Include tone-specific engagement elements
-- Provide comprehensive explanations that help readers truly understand the topic
-- Include detailed examples and practical applications
-- Break down complex concepts into simple, digestible parts
-- Make complex topics simple and accessible
-- Do not exceed {char_limit} characters under any circumstances
-- Ensure natural, complete endings - do not cut off mid-sentence or mid-thought
-
-Generate the content and hashtags within this strict limit.
-'''
+                logger.warning("Empty response content for %s post %s", platform, index)
+                raise GenerationError("API Error: Empty response content")
+            with metrics.span('parse'):
+                content, hashtags = split_content_hashtags(fullText, platform)
+            # Posts over the limit are trimmed locally; a follow-up completion is
+            # only requested when no coherent fit exists, or when every candidate
+            # failed for something other than its length
+            min_hashtags = PLATFORM_RULES.get(platform, DEFAULT_RULES)[1]
+            length = combined_length(content, hashtags, platform)
+            fitted = False
+            if length > char_limit and LENGTH_FIT_ENABLED:
+                with metrics.span('fit'):
+                    fit = fit_post(content, hashtags, platform, char_limit, min_hashtags)
+                metrics.local_fits.inc(platform=platform, outcome='fitted' if fit.ok else 'regenerate')
+                if fit.ok:
+                    content, hashtags, fitted = fit.content, fit.hashtags, True
+            if (length > char_limit and not fitted) or failed_reasons - {'too_long'}:
+                # Regenerate with a more restrictive prompt
+                metrics.regenerations.inc(platform=platform)
+                logger.info("Regenerating %s post %s (%d chars, limit %d)", platform, index, length, char_limit)
                 try:
-                    body["messages"][0]["content"] = shorter_prompt
-                    response = requests.post(url, headers=headers, json=body, timeout=30)
+                    template = template_name('regeneration', platform)
+                    body["messages"] = post_messages('regeneration', topic, platform, tone, avoid_hashtags, avoid_text)
+                    if truncated:
+                        # Give the retry more room than the answer that was cut off
+                        body["max_tokens"] = min(token_budget.maximum, body["max_tokens"] * 2)
+                    with metrics.span('regeneration'):
+                        response = yield CompletionRequest(body, use_cache=not fresh, cache_variant=index)
                     if response.status_code == 200:
                         data = response.json()
-                        fullText = data["choices"][0]["message"]["content"].strip()
-                        content = fullText
-                        hashtags = ''
-                        
-                        # Special handling for Twitter - parse hashtags from the same line
-                        if platform == 'twitter':
-                            # Look for hashtags at the end of the content
-                            hashtag_pattern = r'(\s+#\w+(?:\s+#\w+)*)$'
-                            hashtag_match = re.search(hashtag_pattern, fullText)
-                            if hashtag_match:
-                                hashtags = hashtag_match.group(1).strip()
-                                content = re.sub(hashtag_pattern, '', fullText).strip()
-                            else:
-                                # If no hashtags found, treat entire content as content
-                                content = fullText.strip()
-                                hashtags = ''
+                        observe_usage(response, data, template)
+                        add_usage(spent, response, data)
+                        cut_off = cut_off_choices(data)
+                        if len(data["choices"]) > 1:
+                            selection = select_candidate(choice_texts(data), lambda text: split_content_hashtags(text, platform),
+                                                         platform, char_limit, cut_off=cut_off)
+                            content, hashtags = selection.content, selection.hashtags
+                            truncated = selection.index in cut_off
                         else:
-                            # For other platforms, use the original parsing logic
-                            hashtagMatch = re.search(r'(?:^|\n)hashtags:\s*([#\w\s-]+)', fullText, re.IGNORECASE)
-                            if hashtagMatch:
-                                hashtags = hashtagMatch.group(1).strip()
-                                content = re.sub(r'(?:^|\n)hashtags:\s*([#\w\s-]+)', '', content, flags=re.IGNORECASE).strip()
-                            else:
-                                # Look for hashtags at the end of the content (similar to Twitter but for multi-line)
-                                lines = fullText.split('\n')
-                                content_lines = []
-                                hashtags = ''
-                                
-                                for line in lines:
-                                    # Check if line contains mostly hashtags
-                                    hashtag_count = line.count('#')
-                                    word_count = len(line.split())
-                                    
-                                    if hashtag_count >= 2 and hashtag_count >= word_count * 0.5:  # If more than 50% are hashtags
-                                        hashtags = line.strip()
-                                    else:
-                                        content_lines.append(line)
-                                
-                                content = '\n'.join(content_lines).strip()
-                        content = content.replace('**', '').replace('*', '')
+                            fullText = data["choices"][0]["message"]["content"].strip()
+                            content, hashtags = split_content_hashtags(fullText, platform)
+                            truncated = bool(cut_off)
                 except Exception:
-                    pass  # Keep original content if regeneration fails
-            
+                    # Keep original content if regeneration fails
+                    logger.info("Regeneration failed for %s post %s", platform, index, exc_info=True)
+                if LENGTH_FIT_ENABLED and combined_length(content, hashtags, platform) > char_limit:
+                    fit = fit_post(content, hashtags, platform, char_limit, min_hashtags)
+                    if fit.ok:
+                        content, hashtags = fit.content, fit.hashtags
+            if truncated:
+                # A cut-off answer can be under the limit and still miss its ending or hashtags
+                raise GenerationError("API Error: Answer was cut off at max_tokens")
+            if platform == 'twitter' and combined_length(content, hashtags, platform) > char_limit:
+                # Twitter rejects longer tweets, so cut at a word as a last resort
+                content = truncate_words(content, hashtags, platform, char_limit)
+                if content is None:
+                    raise GenerationError(f"Tweet does not fit in {char_limit} characters")
+            archive_post(topic, platform, tone, content, hashtags, spent, time.perf_counter() - prompt_start)
             return content, hashtags
-        except Exception:
-            return None, None
+        except GenerationError:
+            raise
+        except AzureOpenAIError as e:
+            raise GenerationError(str(e)) from e
+        except Exception as e:
+            raise GenerationError(f"Request failed: {e.__class__.__name__}") from e
     else:
-        print("API credentials not found. Please check your .env file.")
-        print(f"Missing: AZURE_OPENAI_ENDPOINT={bool(AZURE_OPENAI_ENDPOINT)}, AZURE_OPENAI_KEY={bool(AZURE_OPENAI_KEY)}, AZURE_OPENAI_DEPLOYMENT={bool(AZURE_OPENAI_DEPLOYMENT)}, AZURE_OPENAI_API_VERSION={bool(AZURE_OPENAI_API_VERSION)}")
-        return None, None
+        logger.error("API credentials not found. Please set AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_KEY, AZURE_OPENAI_DEPLOYMENT "
+                     "and AZURE_OPENAI_API_VERSION, or AZURE_OPENAI_DEPLOYMENTS, in your .env file.")
+        raise GenerationError("API credentials not found")
+
+def derive_post_llm(draft, topic, platform, tone, index, fresh=False, deadline=None):
+    """Rewrite a long-form draft (content, hashtags) as a short post for platform.
+
+    Much cheaper than generating from scratch: the prompt is short and the
+    answer is capped by the short platform's limit.
+    """
+    char_limit = PLATFORM_CHAR_LIMITS.get(platform, PLATFORM_CHAR_LIMITS['general'])
+    client = get_client()
+    if not client.is_configured():
+        raise GenerationError("API credentials not found")
+    body = {
+        "messages": [{"role": "user", "content": derivation_prompt(draft, topic, platform, tone, char_limit)}],
+        "temperature": 0.7
+    }
+    token_budget.apply(body, char_limit)
+    start = time.perf_counter()
+    try:
+        response = client.chat_completion(body, timeout=deadline.request_timeout if deadline else None,
+                                          use_cache=not fresh, cache_variant=('derived', index))
+    except GenerationError:
+        raise
+    except AzureOpenAIError as e:
+        raise GenerationError(str(e)) from e
+    except Exception as e:
+        raise GenerationError(f"Request failed: {e.__class__.__name__}") from e
+    if response.status_code != 200:
+        raise GenerationError(f"API Error: Status {response.status_code}")
+    data = response.json()
+    if not data.get("choices"):
+        raise GenerationError("API Error: No choices in response")
+    observe_usage(response, data)
+    if cut_off_choices(data):
+        raise GenerationError("API Error: Answer was cut off at max_tokens")
+    with metrics.span('parse'):
+        content, hashtags = split_content_hashtags((data["choices"][0]["message"]["content"] or '').strip(), platform)
+    if not content:
+        raise GenerationError("API Error: Empty response content")
+    if combined_length(content, hashtags, platform) > char_limit:
+        fit = fit_post(content, hashtags, platform, char_limit, PLATFORM_RULES.get(platform, DEFAULT_RULES)[1])
+        if not (LENGTH_FIT_ENABLED and fit.ok):
+            raise GenerationError(f"Derived {platform} post is over {char_limit} characters")
+        content, hashtags = fit.content, fit.hashtags
+    spent = Counter()
+    add_usage(spent, response, data)
+    archive_post(topic, platform, tone, content, hashtags, spent, time.perf_counter() - start)
+    return content, hashtags
+
+def current_campaign_id():
+    # The session cookie only carries campaign IDs; posts live in the store
+    campaign_id = session.get('campaign_id')
+    if campaign_id and get_store().campaign_exists(campaign_id):
+        return campaign_id
+    return None
+
+def remember_campaign(campaign_id):
+    """Make campaign_id the session's current campaign and one it may export."""
+    session['campaign_id'] = campaign_id
+    session['campaign_ids'] = (session.get('campaign_ids', []) + [campaign_id])[-SESSION_CAMPAIGNS:]
+
+def session_campaign_ids():
+    # Campaigns created by this session that are still in the store
+    store = get_store()
+    campaign_ids = list(session.get('campaign_ids', []))
+    if session.get('campaign_id') and session['campaign_id'] not in campaign_ids:
+        campaign_ids.append(session['campaign_id'])
+    return [campaign_id for campaign_id in campaign_ids if store.campaign_exists(campaign_id)]
+
+def current_posts():
+    campaign_id = current_campaign_id()
+    return get_store().get_posts(campaign_id) if campaign_id else []
+
+def generate_post_batch_llm(topic, platform, tone, indices, algorithm, fresh=False, used_hashtags=(), deadline=None):
+    """Generate the posts at the given series indices with one completion per batch.
+
+    Returns one (content, hashtags) tuple or GenerationError per index.
+    """
+    char_limit = PLATFORM_CHAR_LIMITS.get(platform, PLATFORM_CHAR_LIMITS['general'])
+    client = get_client()
+    if not client.is_configured():
+        logger.error("API credentials not found. Please check your .env file.")
+        raise GenerationError("API credentials not found")
+    hashtag_rule = "2-3 hashtags" if platform == 'twitter' else "up to 10 hashtags"
+    mention_rule = "1 mention" if platform == 'twitter' else "at least 2 mentions"
+    # What each attempt's completion cost, and the posts it produced
+    answers = {}
+    made = {}
+
+    def request_batch(count, used, attempt):
+        prompt = f'''
+You are an expert content creator or copywriter. Write {count} different engaging posts on "{topic}" for a {platform} series.
+
+Context:
+- Target audience: {platform}
+- Platform notes: {algorithm}
+- Purpose: educate, inform, and engage
+- Style: {tone}
+
+Each post:
+- Starts with a compelling hook, then explores one distinct angle of the topic with specific, practical examples.
+- Uses simple, clear, conversational language in a {tone} tone; avoid overly AI-sounding phrases.
+- Includes {mention_rule} of influential people relevant to the topic, each starting with '@' (e.g., @sundarpichai, @satyanadella).
+- Has {hashtag_rule}, highly relevant to the topic only, in the "hashtags" list and not in the content.
+- Together with its hashtags is no longer than {char_limit} characters, with a natural, complete ending.
+'''
+        if used:
+            prompt += f"- Must not use these hashtags, which earlier posts in the series already used: {' '.join(used)}\n"
+        prompt += BATCH_FORMAT_INSTRUCTIONS.format(count=count)
+        body = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.9,
+            "response_format": {"type": "json_object"}
+        }
+        # JSON keys, quotes and the hashtag list cost a few more tokens per post
+        token_budget.apply(body, char_limit, posts=count, per_post_overhead=40)
+        start = time.perf_counter()
+        try:
+            response = client.chat_completion(body, timeout=deadline.request_timeout if deadline else None,
+                                              use_cache=not fresh and attempt == 0,
+                                              cache_variant=('batch', indices[0], count, attempt))
+        except GenerationError:
+            raise
+        except AzureOpenAIError as e:
+            raise GenerationError(str(e)) from e
+        except Exception as e:
+            raise GenerationError(f"Request failed: {e.__class__.__name__}") from e
+        if response.status_code != 200:
+            raise GenerationError(f"API Error: Status {response.status_code}")
+        data = response.json()
+        if not data.get("choices"):
+            raise GenerationError("API Error: No choices in response")
+        observe_usage(response, data)
+        spent = answers[attempt] = Counter()
+        add_usage(spent, response, data)
+        spent['seconds'] = time.perf_counter() - start
+        return data["choices"][0]["message"]["content"] or ''
+
+    results = run_batch(request_batch, len(indices), char_limit, used_hashtags=used_hashtags, platform=platform,
+                        on_post=lambda attempt, post: made.setdefault(attempt, []).append(post))
+    for attempt, posts in made.items():
+        for content, hashtags in posts:
+            archive_post(topic, platform, tone, content, hashtags, answers[attempt], answers[attempt]['seconds'],
+                         share=len(posts))
+    return results
+
+def build_schedule(count, base_date, base_time, time_option, interval, now):
+    """(position, date, time) slots for count posts from the scheduling fields of a form."""
+    try:
+        post_base_date = datetime.strptime(base_date, '%Y-%m-%d')
+    except Exception:
+        post_base_date = now
+    try:
+        base_hour, base_minute = map(int, base_time.split(':'))
+    except Exception:
+        base_hour, base_minute = now.hour, (now.minute // 5) * 5
+    schedule = []
+    for i in range(1, count + 1):
+        if time_option == 'different':
+            post_date = post_base_date + timedelta(days=(i - 1) * interval)
+        else:
+            post_date = post_base_date
+        post_datetime = post_date.replace(hour=base_hour, minute=base_minute)
+        schedule.append((i, post_datetime.strftime('%Y-%m-%d'), post_datetime.strftime('%H:%M')))
+    return schedule
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -672,14 +1045,20 @@ def index():
     base_time = ''
     if request.method == 'POST':
         if request.form.get('edit') == '1':
-            # Save edits to posts
-            posts = session.get('posts', [])
-            for i in range(len(posts)):
-                posts[i]['date'] = request.form.get(f'date_{i}', posts[i]['date'])
-                posts[i]['time'] = request.form.get(f'time_{i}', posts[i]['time'])
-                posts[i]['content'] = request.form.get(f'content_{i}', posts[i]['content'])
-                posts[i]['hashtags'] = request.form.get(f'hashtags_{i}', posts[i]['hashtags'])
-            session['posts'] = posts
+            # Save edits to posts, writing only the posts that changed
+            store = get_store()
+            campaign_id = current_campaign_id()
+            posts = current_posts()
+            for i, post in enumerate(posts):
+                changes = {}
+                for field in EDITABLE_FIELDS:
+                    # Browsers submit textarea line breaks as CRLF
+                    value = request.form.get(f'{field}_{i}', post[field]).replace('\r\n', '\n')
+                    if value != post[field]:
+                        changes[field] = value
+                if changes:
+                    store.update_post(campaign_id, i, changes)
+                    post.update(changes)
         else:
             topic = request.form.get('topic')
             platform = request.form.get('platform')
@@ -689,65 +1068,434 @@ def index():
             base_time = request.form.get('baseTime')
             time_option = request.form.get('timeOption', 'same')
             interval = int(request.form.get('interval', 1))
+            fresh = request.form.get('fresh') == '1'
+            # 'all' cross-posts the topic: every slot gets one post per platform
+            platforms = list(CROSS_POST_PLATFORMS) if platform == 'all' else None
             algo = PLATFORM_ALGORITHMS.get(platform, PLATFORM_ALGORITHMS['general'])
-            try:
-                post_base_date = datetime.strptime(base_date, '%Y-%m-%d')
-            except Exception:
-                post_base_date = now
-            try:
-                base_hour, base_minute = map(int, base_time.split(':'))
-            except Exception:
-                base_hour, base_minute = now.hour, (now.minute // 5) * 5
-            posts = []
-            for i in range(1, postCount + 1):
-                if time_option == 'different':
-                    post_date = post_base_date + timedelta(days=(i - 1) * interval)
-                else:
-                    post_date = post_base_date
-                post_datetime = post_date.replace(hour=base_hour, minute=base_minute)
-                date_str = post_datetime.strftime('%Y-%m-%d')
-                time_str = post_datetime.strftime('%H:%M')
-                
-                content, hashtags = generate_post_llm(topic, platform, tone, i, algo)
-                posts.append({
-                    'date': date_str,
-                    'time': time_str,
-                    'content': content,
-                    'hashtags': hashtags
-                })
-            session['posts'] = posts
+            schedule = build_schedule(postCount, base_date, base_time, time_option, interval, now)
+
+            # Store placeholders right away and generate in the background
+            store = get_store()
+            if platforms:
+                placeholders = [{'date': date_str, 'time': time_str, 'content': '', 'hashtags': '',
+                                 'status': 'pending', 'platform': post_platform}
+                                for _, date_str, time_str in schedule for post_platform in platforms]
+                work = lambda job: run_multi_platform_job(job, schedule, platforms, topic, tone, fresh)
+            else:
+                placeholders = [{'date': date_str, 'time': time_str, 'content': '', 'hashtags': '', 'status': 'pending'}
+                                for _, date_str, time_str in schedule]
+                work = lambda job: run_campaign_job(job, schedule, topic, platform, tone, algo, fresh)
+            campaign_id = store.create_campaign(placeholders, topic=topic, platform=platform, tone=tone)
+            if ASYNC_GENERATION and not platforms and GENERATION_BATCH_SIZE == 1:
+                # Posts become coroutines on one event loop instead of pool threads
+                job = get_queue().submit_async(campaign_id, len(placeholders), lambda job: run_campaign_job_async(
+                    job, schedule, topic, platform, tone, algo, fresh), get_runner())
+            else:
+                job = get_queue().submit(campaign_id, len(placeholders), work)
+            remember_campaign(campaign_id)
+            session['job_id'] = job.id
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(job.to_dict()), 202
+            return redirect(url_for('index'))
     else:
-        posts = session.get('posts', [])
+        posts = current_posts()
         # Set default base_date and base_time if not set
-        base_date = now.strftime('%Y-%m-%d')
-        base_time = f"{now.hour:02d}:{(now.minute // 5) * 5:02d}"
-    return render_template_string(HTML_TEMPLATE, posts=posts, base_date=base_date, base_time=base_time)
+        base_date, base_time = default_schedule_start(now)
+    return render_index(posts, base_date, base_time)
+
+def default_schedule_start(now):
+    return now.strftime('%Y-%m-%d'), f"{now.hour:02d}:{(now.minute // 5) * 5:02d}"
+
+def render_index(posts, base_date, base_time, history=None, history_query=None, history_error=None):
+    job = current_job()
+    # Cross-posted campaigns are shown as a grid with one column per platform
+    platforms = []
+    for post in posts:
+        if post.get('platform') and post['platform'] not in platforms:
+            platforms.append(post['platform'])
+    with metrics.span('render'):
+        return render_template_string(HTML_TEMPLATE, posts=posts, base_date=base_date, base_time=base_time,
+                                      platforms=platforms, campaign_id=current_campaign_id(),
+                                      job=job.to_dict() if job and not job.finished else None,
+                                      history=history, history_query=history_query or {}, history_error=history_error)
+
+@app.route('/history', methods=['GET'])
+def history():
+    """Search the generation history; without a query the newest posts are listed."""
+    query = {field: request.args.get(field, '').strip() for field in ('q', 'platform', 'tone')}
+    results = get_archive().search(query['q'], query['platform'] or None, query['tone'] or None)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'posts': results})
+    return render_index(current_posts(), *default_schedule_start(datetime.now()), history=results, history_query=query)
+
+@app.route('/history/reschedule', methods=['POST'])
+def reschedule_history():
+    """Start a campaign from archived posts, scheduled like a generated one, without any completion."""
+    entries = get_archive().get_many(int(value) for value in request.form.getlist('post_id') if value.isdigit())
+    error = None
+    if not entries:
+        error = "Select at least one post to schedule"
+    elif len({entry['platform'] for entry in entries}) > 1:
+        error = "Select posts of one platform; filter the search by platform to narrow it down"
+    if error:
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'error': error}), 400
+        return render_index(current_posts(), *default_schedule_start(datetime.now()), history=[],
+                            history_error=error), 400
+    try:
+        interval = int(request.form.get('interval', 1))
+    except ValueError:
+        interval = 1
+    schedule = build_schedule(len(entries), request.form.get('baseDate'), request.form.get('baseTime'),
+                              request.form.get('timeOption', 'same'), interval, datetime.now())
+    posts = [{'date': date_str, 'time': time_str, 'content': entry['content'], 'hashtags': entry['hashtags'] or '',
+              'status': 'ok'} for (_, date_str, time_str), entry in zip(schedule, entries)]
+    tones = {entry['tone'] for entry in entries}
+    campaign_id = get_store().create_campaign(posts, topic=entries[0]['topic'], platform=entries[0]['platform'],
+                                              tone=tones.pop() if len(tones) == 1 else None)
+    remember_campaign(campaign_id)
+    session.pop('job_id', None)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'campaign_id': campaign_id, 'posts': get_store().get_posts(campaign_id)}), 201
+    return redirect(url_for('index'))
+
+@app.route('/history/stats', methods=['GET'])
+def history_stats():
+    return jsonify(get_archive().stats())
+
+def save_result(job, store, position, result, platform):
+    # Each finished post is written straight to the store so progress and
+    # partial results are visible to the status endpoint
+    fields = {
+        'content': result['content'] or '',
+        'hashtags': result['hashtags'] or '',
+        'status': result['status'],
+        'error': result['error']
+    }
+    post, _ = store.patch_post(job.campaign_id, position, fields)
+    job.record(result['status'] == 'ok')
+    metrics.posts_generated.inc(platform=platform, status=result['status'])
+    # The version lets cards that autosave keep editing the generated post
+    job.publish('post', dict(fields, index=position, version=post['version'] if post else 0))
+    return fields
+
+def run_campaign_job(job, schedule, topic, platform, tone, algo, fresh):
+    generate, _, generate_batch, save = campaign_generators(job, schedule, topic, platform, tone, algo, fresh, stream=True)
+    if GENERATION_BATCH_SIZE > 1:
+        # Several posts per completion; later batches are told which hashtags
+        # the finished posts already use
+        generate_post_batches(schedule, generate_batch, GENERATION_BATCH_SIZE, on_result=save)
+    else:
+        generate_posts(schedule, generate, on_result=save)
+
+async def run_campaign_job_async(job, schedule, topic, platform, tone, algo, fresh):
+    """run_campaign_job on the async generation loop: each post waits on its completion as a coroutine."""
+    _, generate_async, _, save = campaign_generators(job, schedule, topic, platform, tone, algo, fresh, stream=False)
+    await generate_posts_async(schedule, generate_async, on_result=save)
+
+def campaign_generators(job, schedule, topic, platform, tone, algo, fresh, stream):
+    """Closures generating one single-platform campaign: (generate, generate_async, generate_batch, save)."""
+    store = get_store()
+    # Posts still to generate share what is left of the campaign's time budget
+    deadline = campaign_deadline(len(schedule), concurrency=GENERATION_CONCURRENCY * GENERATION_BATCH_SIZE)
+    bind = deadline.bind if deadline else (lambda request: request)
+    used_hashtags = set()
+    used_lock = threading.Lock()
+
+    def used_so_far():
+        with used_lock:
+            return sorted(used_hashtags)
+
+    def save(position, result):
+        fields = save_result(job, store, position, result, platform)
+        if deadline:
+            deadline.post_finished()
+        with used_lock:
+            used_hashtags.update(fields['hashtags'].split())
+
+    # Near-duplicate posts and repeated hashtags are caught locally as posts
+    # arrive, and only the offending post is generated again
+    series = SeriesIndex() if DUPLICATE_CHECK_ENABLED else None
+    accepted = {}
+
+    def dedupe(number, content, hashtags):
+        # A generator like post_steps, so regenerations run wherever the post itself does
+        if series is None:
+            return content, hashtags
+        position = number - 1
+        for attempt in range(DUPLICATE_MAX_REGENERATIONS + 1):
+            last_attempt = attempt == DUPLICATE_MAX_REGENERATIONS
+            finding = series.check_and_add(position, content, hashtags, add_flagged=last_attempt)
+            if not finding.flagged:
+                break
+            kind = 'content' if finding.duplicate_of is not None else 'hashtags'
+            if last_attempt:
+                metrics.duplicates.inc(kind=kind, outcome='kept')
+                logger.info("Keeping post %s although it repeats %s", number, kind)
+                break
+            metrics.duplicates.inc(kind=kind, outcome='regenerated')
+            logger.info("Post %s repeats %s (similar to post %s, hashtags %s), regenerating", number, kind,
+                        None if finding.duplicate_of is None else finding.duplicate_of + 1, finding.repeated_hashtags)
+            avoid_text = accepted.get(finding.duplicate_of, '')[:300] if finding.duplicate_of is not None else None
+            try:
+                content, hashtags = yield from post_steps(topic, platform, tone, number, algo, fresh=fresh,
+                                                          avoid_hashtags=series.used_hashtags(), avoid_text=avoid_text)
+            except GenerationError:
+                series.add(position, content, hashtags)
+                break
+        accepted[position] = content
+        return content, hashtags
+
+    def steps(task):
+        position = task[0] - 1
+        on_delta = (lambda text: job.publish('delta', {'index': position, 'text': text})) if stream else None
+        content, hashtags = yield from post_steps(topic, platform, tone, task[0], algo, fresh=fresh, on_delta=on_delta)
+        return (yield from dedupe(task[0], content, hashtags))
+
+    def generate(task):
+        return run_steps(steps(task), lambda request: send_completion(bind(request)))
+
+    async def generate_async(task):
+        return await run_steps_async(steps(task), lambda request: send_completion_async(bind(request)))
+
+    def generate_batch(chunk):
+        items = generate_post_batch_llm(topic, platform, tone, [task[0] for task in chunk], algo,
+                                        fresh=fresh, used_hashtags=used_so_far(), deadline=deadline)
+        return [item if isinstance(item, Exception) or item is None or item[0] is None
+                else run_steps(dedupe(task[0], *item), lambda request: send_completion(bind(request)))
+                for task, item in zip(chunk, items)]
+
+    return generate, generate_async, generate_batch, save
+
+def run_multi_platform_job(job, schedule, platforms, topic, tone, fresh):
+    """Generate every (slot, platform) post of a cross-posted campaign in parallel.
+
+    Short platforms are rewritten from the slot's long-form draft when there
+    is one, and fall back to generating from scratch if that fails.
+    """
+    store = get_store()
+    source, tasks = multi_platform_tasks(schedule, platforms, PLATFORM_CHAR_LIMITS)
+    drafts = DraftBoard()
+    deadline = campaign_deadline(len(tasks))
+
+    def generate(task):
+        position, slot, platform = task
+        number = schedule[slot][0]
+        algo = PLATFORM_ALGORITHMS.get(platform, PLATFORM_ALGORITHMS['general'])
+        if source and platform != source and platform in DERIVED_PLATFORMS:
+            draft = drafts.get(slot, timeout=min(DRAFT_WAIT_TIMEOUT, deadline.time_left()) if deadline else DRAFT_WAIT_TIMEOUT)
+            if draft is not None:
+                try:
+                    return derive_post_llm(draft, topic, platform, tone, number, fresh=fresh, deadline=deadline)
+                except DeadlineExceeded:
+                    raise
+                except GenerationError as e:
+                    logger.info("Deriving %s post %s failed (%s), generating it directly", platform, number, e)
+            return generate_post_llm(topic, platform, tone, number, algo, fresh=fresh, deadline=deadline)
+        draft = None
+        try:
+            draft = generate_post_llm(
+                topic, platform, tone, number, algo, fresh=fresh,
+                on_delta=lambda text: job.publish('delta', {'index': position, 'text': text}), deadline=deadline
+            )
+            return draft
+        finally:
+            if platform == source:
+                drafts.put(slot, draft)
+
+    def save(_, result):
+        save_result(job, store, result['task'][0], result, result['task'][2])
+        if deadline:
+            deadline.post_finished()
+
+    generate_posts(tasks, generate, on_result=save)
+
+@app.route('/campaigns/<campaign_id>/posts/<int:index>', methods=['PATCH'])
+def patch_post(campaign_id, index):
+    """Update some fields of one post of the current campaign.
+
+    The JSON body carries the changed fields and the version the edit was
+    made against ("version", or an If-Match header); a stale version gets a
+    409 with the post as it is now instead of overwriting someone else's edit.
+    """
+    if campaign_id != current_campaign_id():
+        return jsonify({'error': 'Unknown campaign'}), 404
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    version = data.pop('version', request.headers.get('If-Match', '').strip('W/"') or None)
+    try:
+        version = int(version) if version is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'version must be an integer'}), 400
+    unknown = sorted(set(data) - set(EDITABLE_FIELDS))
+    if unknown:
+        return jsonify({'error': f"Fields cannot be edited: {', '.join(unknown)}"}), 400
+    if not data:
+        return jsonify({'error': f"Nothing to update; editable fields are {', '.join(EDITABLE_FIELDS)}"}), 400
+    fields = {}
+    for field, value in data.items():
+        if not isinstance(value, str):
+            return jsonify({'error': f'{field} must be a string'}), 400
+        if field in EDITABLE_FORMATS:
+            try:
+                datetime.strptime(value, EDITABLE_FORMATS[field])
+            except ValueError:
+                return jsonify({'error': f'{field} must look like {EDITABLE_FORMATS[field]}'}), 400
+        fields[field] = value.replace('\r\n', '\n')
+    post, outcome = get_store().patch_post(campaign_id, index, fields, version=version)
+    if outcome == 'missing':
+        return jsonify({'error': 'Unknown post'}), 404
+    post['index'] = index
+    if outcome == 'conflict':
+        return jsonify({'error': 'Post was changed since that version', 'post': post}), 409
+    response = jsonify(post)
+    response.headers['ETag'] = f'"{post["version"]}"'
+    return response
+
+def current_job():
+    job_id = session.get('job_id')
+    return get_queue().get(job_id) if job_id else None
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    status = job.to_dict()
+    status['posts'] = [dict(post, index=i) for i, post in enumerate(get_store().get_posts(job.campaign_id))]
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = get_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    # Resume after the last event the browser saw, or after the events that
+    # were already rendered into the page
+    try:
+        if 'Last-Event-ID' in request.headers:
+            cursor = int(request.headers['Last-Event-ID']) + 1
+        else:
+            cursor = int(request.args.get('after', 0))
+    except ValueError:
+        cursor = 0
+
+    def stream():
+        nonlocal cursor
+        while True:
+            events = job.wait_events(cursor, timeout=15)
+            if not events:
+                if job.finished:
+                    return
+                yield ': keep-alive\n\n'
+                continue
+            for event, data in events:
+                yield format_sse(event, data, event_id=cursor)
+                cursor += 1
+            if job.finished and cursor >= len(job.events):
+                return
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+class _CSVRow:
+    """File-like sink that hands back what csv.writer writes instead of buffering it."""
+
+    def write(self, value):
+        return value
 
 @app.route('/download-csv', methods=['GET'])
 def download_csv():
-    posts = session.get('posts', [])
-    if not posts:
-        return redirect(url_for('index'))
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Date & Time', 'Content'])
-    for post in posts:
-        # Remove HTML tags from content for CSV
-        content = re.sub('<[^<]+?>', '', post['content'])
-        # After extracting 'content' from the LLM response, remove all '**' from content before saving to posts.
-        # Also apply this cleaning in the CSV export.
-        content = content.replace('**', '')
-        hashtags = post['hashtags']
-        date_time = f"{post['date']} {post['time']}"
-        content_hashtags = f"{content} {hashtags}".strip()
-        writer.writerow([date_time, content_hashtags])
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode()),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'social_media_posts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    # Without parameters this exports the current campaign; 'campaign' may be
+    # repeated or 'all' (the session's own campaigns only), and
+    # platform/from/to narrow the export in the store
+    requested = request.args.getlist('campaign')
+    if 'all' in requested:
+        campaign_ids = session_campaign_ids()
+    elif requested:
+        owned = set(session_campaign_ids())
+        if any(campaign_id not in owned for campaign_id in requested):
+            return jsonify({'error': 'Campaign not found'}), 404
+        campaign_ids = requested
+    else:
+        campaign_id = current_campaign_id()
+        if not campaign_id:
+            return redirect(url_for('index'))
+        campaign_ids = [campaign_id]
+    posts = get_store().iter_posts(
+        campaign_ids=campaign_ids,
+        platform=request.args.get('platform') or None,
+        date_from=request.args.get('from') or None,
+        date_to=request.args.get('to') or None,
+        skip_unfinished=True
     )
 
+    def rows():
+        writer = csv.writer(_CSVRow())
+        yield writer.writerow(['Date & Time', 'Content'])
+        chunk = []
+        for post in posts:
+            # Remove HTML tags and markdown bold markers from content for CSV
+            content = HTML_TAG.sub('', post['content'] or '').replace('**', '')
+            content_hashtags = f"{content} {post['hashtags'] or ''}".strip()
+            chunk.append(writer.writerow([f"{post['date']} {post['time']}", content_hashtags]))
+            if len(chunk) >= CSV_CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+    filename = f'social_media_posts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return Response(stream_with_context(rows()), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    cache = get_cache()
+    return jsonify(cache.stats() if cache else {'enabled': False})
+
+@app.route('/rate-limit', methods=['GET'])
+def rate_limit_stats():
+    return jsonify({deployment.name: deployment.limiter.stats() for deployment in get_client().pool.deployments})
+
+@app.route('/deployments', methods=['GET'])
+def deployment_stats():
+    return jsonify(get_client().pool.stats())
+
+@app.route('/retry-stats', methods=['GET'])
+def retry_stats():
+    policy = get_client().retry_policy
+    return jsonify(policy.stats() if policy else {'enabled': False})
+
+@app.route('/circuit-breaker', methods=['GET'])
+def circuit_breaker_stats():
+    breaker = get_client().breaker
+    return jsonify(breaker.stats() if breaker else {'enabled': False})
+
+@app.route('/token-budget', methods=['GET'])
+def token_budget_stats():
+    return jsonify(dict(token_budget.stats(), max_tokens={
+        platform: token_budget.max_tokens(limit) for platform, limit in PLATFORM_CHAR_LIMITS.items()
+    }))
+
+@app.route('/prompt-cache', methods=['GET'])
+def prompt_cache_stats():
+    return jsonify(prompt_cache.stats())
+
+@app.route('/selection-stats', methods=['GET'])
+def candidate_selection_stats():
+    return jsonify(selection_stats.snapshot())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def configure_logging():
+    """Log to stderr at LOG_LEVEL; called by the entry points, so importing the app leaves logging alone."""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    configure_logging()
+    app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""ASGI entry point for the async serving mode.
+
+    uvicorn asgi:app
+
+The Flask app (form, template, CSV export) is served unchanged through
+asgiref's WSGI adapter. Single-platform campaigns are generated as coroutines
+on one event loop with an async HTTP client (ASYNC_GENERATION), so in-flight
+completions cost coroutines rather than threads. The job event stream is
+served natively here so every open results page does not hold a thread.
+"""
+import asyncio
+import os
+import re
+from urllib.parse import parse_qs
+
+os.environ.setdefault("ASYNC_GENERATION", "1")
+
+from asgiref.wsgi import WsgiToAsgi  # noqa: E402
+from api_html import app as flask_app, configure_logging  # noqa: E402
+from job_queue import get_queue  # noqa: E402
+from post_stream import format_sse  # noqa: E402
+
+# How often an open event stream looks for new job events
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.25"))
+KEEP_ALIVE_INTERVAL = 15.0
+JOB_EVENTS_PATH = re.compile(r'^/jobs/([^/]+)/events$')
+
+configure_logging()
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        match = JOB_EVENTS_PATH.match(scope['path'])
+        job = get_queue().get(match.group(1)) if match else None
+        if job is not None:
+            await job_events(scope, receive, send, job)
+            return
+    await wsgi_app(scope, receive, send)
+
+
+def _start_cursor(scope):
+    # Same rules as the Flask route: resume after Last-Event-ID, or after the
+    # events already rendered into the page
+    headers = dict(scope['headers'])
+    try:
+        if b'last-event-id' in headers:
+            return int(headers[b'last-event-id']) + 1
+        return int(parse_qs(scope['query_string'].decode()).get('after', ['0'])[0])
+    except ValueError:
+        return 0
+
+
+async def job_events(scope, receive, send, job):
+    """Server-Sent Events for one job, polled from the job's event log on the event loop."""
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')]
+    })
+    cursor = _start_cursor(scope)
+    idle = 0.0
+    try:
+        while not disconnected.is_set():
+            finished = job.finished
+            events = job.events[cursor:]
+            if events:
+                chunk = ''.join(format_sse(event, data, event_id=cursor + i) for i, (event, data) in enumerate(events))
+                cursor += len(events)
+                idle = 0.0
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            elif finished:
+                break
+            elif idle >= KEEP_ALIVE_INTERVAL:
+                idle = 0.0
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+            else:
+                try:
+                    await asyncio.wait_for(disconnected.wait(), EVENT_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    idle += EVENT_POLL_INTERVAL
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        watcher.cancel()
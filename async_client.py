@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+import time
+import httpx
+from dotenv import load_dotenv
+from azure_client import CachedResponse, _time_left, get_client
+from llm_cache import cache_key
+from rate_limiter import RATE_LIMIT_MAX_WAITS, estimate_tokens
+import metrics
+
+load_dotenv()
+
+# Connections one event loop keeps to the deployments; requests beyond this
+# wait for a free connection as coroutines
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "100"))
+RETRYABLE_EXCEPTIONS = (httpx.TransportError,)
+
+
+class AsyncAzureOpenAIClient:
+    """Coroutine counterpart of AzureOpenAIClient for the async generation mode.
+
+    Shares the synchronous client's deployment pool (with its rate limiters),
+    completion cache and retry telemetry, so quotas and cached answers hold
+    across both modes; only the HTTP calls run on an httpx.AsyncClient.
+    """
+
+    def __init__(self, client, max_connections=ASYNC_MAX_CONNECTIONS):
+        self.client = client
+        connect_timeout, read_timeout = client.timeout
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def chat_completion(self, body, timeout=None, use_cache=True, cache_variant=None):
+        """POST a chat-completions body and return the httpx.Response (see AzureOpenAIClient.chat_completion)."""
+        cache = self.client.cache
+        # The cache can read and write its SQLite file, which would stall
+        # every other coroutine on the loop, so it is used from a worker thread
+        loop = asyncio.get_running_loop()
+        key = None
+        if cache is not None:
+            key = cache_key(self.client.deployment, body, cache_variant)
+            if use_cache:
+                data = await loop.run_in_executor(None, cache.get, key)
+                if data is not None:
+                    return CachedResponse(data)
+        policy = self.client.retry_policy
+        if policy is not None:
+            response = await policy.execute_async(lambda: self._send(body, timeout), RETRYABLE_EXCEPTIONS,
+                                                  time_left=_time_left(timeout))
+        else:
+            response = await self._send(body, timeout)
+        if key is not None and response.status_code == 200:
+            data = response.json()
+            if data.get("choices"):
+                await loop.run_in_executor(None, cache.set, key, data)
+        return response
+
+    async def _send(self, body, timeout):
+        client = self.client
+        estimate = estimate_tokens(body)
+        for attempt in range(RATE_LIMIT_MAX_WAITS + 1):
+            attempt_timeout, admission = client._admit(timeout)
+            target = client.pool.choose()
+            try:
+                lease = target, await target.limiter.acquire_async(estimate, timeout=attempt_timeout)
+            except BaseException:
+                client.pool.release(target)
+                client._abandon(admission)
+                raise
+            start = time.monotonic()
+            try:
+                with metrics.span('http'):
+                    response = await self.http.post(target.url, headers=target.headers, json=body,
+                                                    timeout=attempt_timeout or httpx.USE_CLIENT_DEFAULT)
+            except asyncio.CancelledError:
+                client._abandon(admission)
+                client._release(lease)
+                raise
+            except Exception as e:
+                client._failed(target, e, admission,
+                               cut_short=isinstance(e, httpx.TimeoutException) and client._cut_short(attempt_timeout))
+                client._release(lease)
+                raise
+            client._answered(target, response, time.monotonic() - start)
+            client._release(lease, response)
+            if response.status_code != 429 or attempt == RATE_LIMIT_MAX_WAITS:
+                return response
+
+    async def close(self):
+        await self.http.aclose()
+
+
+class AsyncRunner:
+    """One event loop on a daemon thread that runs every async campaign as coroutines."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._client = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name='async-generation', daemon=True)
+        self._thread.start()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the loop from any thread; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def client(self):
+        """The loop's AsyncAzureOpenAIClient; only call this from coroutines running on the loop."""
+        if self._client is None:
+            self._client = AsyncAzureOpenAIClient(get_client())
+        return self._client
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """Return the process-wide async generation loop, starting it on first use."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = AsyncRunner()
+    return _runner
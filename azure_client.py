@@ -0,0 +1,334 @@
+import json
+import logging
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from llm_cache import cache_key, get_cache
+from circuit_breaker import CIRCUIT_BREAKER_ENABLED, CircuitBreaker
+from deployment_pool import DeploymentPool, load_deployments
+from rate_limiter import RATE_LIMIT_MAX_WAITS, estimate_tokens
+from retry_policy import RetryPolicy
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+AZURE_OPENAI_POOL_SIZE = int(os.getenv("AZURE_OPENAI_POOL_SIZE", "10"))
+AZURE_OPENAI_CONNECT_TIMEOUT = float(os.getenv("AZURE_OPENAI_CONNECT_TIMEOUT", "5"))
+AZURE_OPENAI_READ_TIMEOUT = float(os.getenv("AZURE_OPENAI_READ_TIMEOUT", "30"))
+# Ask streams to end with a usage chunk; needs API version 2024-09-01-preview or later
+AZURE_OPENAI_STREAM_USAGE = os.getenv("AZURE_OPENAI_STREAM_USAGE", "0") == "1"
+
+
+class AzureOpenAIError(Exception):
+    """Non-200 answer from the chat-completions endpoint."""
+
+    def __init__(self, status_code, message=None):
+        super().__init__(message or f"API Error: Status {status_code}")
+        self.status_code = status_code
+
+
+class CircuitOpenError(AzureOpenAIError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+    def __init__(self, retry_in):
+        super().__init__(None, f"Azure OpenAI keeps failing; requests are paused for another {retry_in:.0f}s")
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response served from the completion cache."""
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, data):
+        self._data = data
+        self.headers = {}
+
+    def json(self):
+        return self._data
+
+
+class StreamedResponse(CachedResponse):
+    """A fully read streamed completion, shaped like a regular answer.
+
+    usage is only known when the stream reported it.
+    """
+
+    def __init__(self, text, from_cache=False, usage=None, finish_reason=None):
+        data = {"choices": [{"index": 0, "finish_reason": finish_reason,
+                             "message": {"role": "assistant", "content": text}}]}
+        if usage is not None:
+            data["usage"] = usage
+        super().__init__(data)
+        self.from_cache = from_cache
+
+
+class AzureOpenAIClient:
+    """Keep-alive, pooled client for a pool of Azure OpenAI chat-completions deployments.
+
+    Every request is routed by the DeploymentPool and sent through that
+    deployment's rate limiter; all calls reuse the pooled connections of a
+    single requests.Session.
+    """
+
+    def __init__(self, pool,
+                 pool_size=AZURE_OPENAI_POOL_SIZE,
+                 connect_timeout=AZURE_OPENAI_CONNECT_TIMEOUT,
+                 read_timeout=AZURE_OPENAI_READ_TIMEOUT,
+                 cache=None, retry_policy=None, breaker=None):
+        self.pool = pool
+        self.deployment = pool.cache_name
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.breaker = breaker
+        self.session = requests.Session()
+        # Retries are decided by the caller, the adapter only pools connections
+        adapter = HTTPAdapter(pool_connections=max(1, len(pool.deployments)), pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def is_configured(self):
+        return self.pool.is_configured()
+
+    def chat_completion(self, body, timeout=None, use_cache=True, cache_variant=None):
+        """POST a chat-completions body and return the requests.Response.
+
+        Successful answers are stored in the completion cache; pass
+        use_cache=False to force a fresh completion (the new answer still
+        replaces the cached one). timeout may be a callable, asked again
+        before every attempt.
+        """
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.deployment, body, cache_variant)
+            if use_cache:
+                data = self.cache.get(key)
+                if data is not None:
+                    return CachedResponse(data)
+        if self.retry_policy is not None:
+            response = self.retry_policy.execute(lambda: self._send(body, timeout)[0], time_left=_time_left(timeout))
+        else:
+            response, _ = self._send(body, timeout)
+        if key is not None and response.status_code == 200:
+            data = response.json()
+            if data.get("choices"):
+                self.cache.set(key, data)
+        return response
+
+    def _send(self, body, timeout, stream=False):
+        """POST to a deployment of the pool through its rate limiter, moving on after 429s.
+
+        Returns (response, lease). For streams the lease is still held and
+        must be given back with _release once the stream has been read.
+        """
+        estimate = estimate_tokens(body)
+        for attempt in range(RATE_LIMIT_MAX_WAITS + 1):
+            attempt_timeout, admission = self._admit(timeout)
+            try:
+                lease = self._lease(self.pool.choose(), estimate, attempt_timeout)
+            except BaseException:
+                self._abandon(admission)
+                raise
+            target = lease[0]
+            start = time.monotonic()
+            try:
+                with metrics.span('http'):
+                    response = self.session.post(target.url, headers=target.headers, json=body,
+                                                 timeout=attempt_timeout or self.timeout, stream=stream)
+            except Exception as e:
+                self._failed(target, e, admission,
+                             cut_short=isinstance(e, requests.Timeout) and self._cut_short(attempt_timeout))
+                self._release(lease)
+                raise
+            self._answered(target, response, time.monotonic() - start)
+            if stream and response.status_code == 200:
+                return response, lease
+            self._release(lease, response)
+            if stream:
+                # An unread streamed body keeps its connection checked out of
+                # the adapter's pool until garbage collection; nobody reads an
+                # error body, so close it whether it is retried or returned
+                response.close()
+            # A 429 drains the deployment, so the next attempt goes elsewhere
+            # or, with nowhere else to go, waits out its Retry-After
+            if response.status_code != 429 or attempt == RATE_LIMIT_MAX_WAITS:
+                return response, None
+
+    def _admit(self, timeout):
+        """Resolve an attempt's timeout, then fail fast if the circuit breaker is open.
+
+        Returns (timeout, admission), admission being what the breaker's
+        allow() answered; every admitted attempt ends in _failed, _answered
+        or _abandon.
+        """
+        if callable(timeout):
+            timeout = timeout()
+        if self.breaker is None:
+            return timeout, None
+        admission = self.breaker.allow()
+        if not admission:
+            metrics.circuit_rejections.inc()
+            raise CircuitOpenError(self.breaker.retry_in())
+        return timeout, admission
+
+    def _abandon(self, admission):
+        # The attempt ended before the endpoint could tell us anything (the
+        # limiter timed out, the caller's deadline cut it short, it was
+        # cancelled); a probe must not keep the circuit half-open forever
+        if admission == 'probe':
+            self.breaker.release_probe()
+
+    def _lease(self, target, estimate, timeout=None):
+        # A request with a timeout doesn't wait longer than that for the limiter either
+        try:
+            return target, target.limiter.acquire(estimate, timeout=timeout)
+        except BaseException:
+            self.pool.release(target)
+            raise
+
+    def _cut_short(self, timeout):
+        """Whether a caller's deadline made the attempt's timeout shorter than the configured one."""
+        return timeout is not None and timeout < self.timeout[1]
+
+    def _failed(self, target, error, admission=None, cut_short=False):
+        metrics.azure_failures.inc(status=error.__class__.__name__, deployment=target.name)
+        logger.warning("Chat completion request to %s failed: %s", target.name, error.__class__.__name__)
+        if cut_short:
+            # Timing out within a caller's shortened budget says nothing about
+            # the deployment's health
+            self._abandon(admission)
+            return
+        self.pool.record(target, error=error.__class__.__name__)
+        if self.breaker is not None:
+            self.breaker.record(False)
+
+    def _answered(self, target, response, elapsed):
+        metrics.azure_requests.inc(status=response.status_code, deployment=target.name)
+        if response.status_code != 200:
+            metrics.azure_failures.inc(status=response.status_code, deployment=target.name)
+            logger.warning("Chat completion from %s returned status %s", target.name, response.status_code)
+        self.pool.record(target, response.status_code, elapsed, getattr(response, "headers", None))
+        if self.breaker is not None:
+            self.breaker.record(response.status_code < 500)
+
+    def _release(self, lease, response=None, stream=False, usage=None):
+        # A stream's usage is read from its last chunk by the caller, and is
+        # None when the stream did not report it
+        used_tokens = None
+        if response is not None and response.status_code == 200:
+            if not stream:
+                try:
+                    usage = response.json().get("usage") or {}
+                except (ValueError, AttributeError):
+                    usage = {}
+            if usage is not None:
+                metrics.observe_usage(usage)
+                used_tokens = usage.get("total_tokens")
+        if lease is None:
+            return
+        target, permit = lease
+        self.pool.release(target)
+        if response is None:
+            target.limiter.release(permit)
+            return
+        # Always give the permit back, or the concurrency slot would leak
+        target.limiter.release(permit, response.status_code, getattr(response, "headers", None), used_tokens)
+
+    def stream_chat_completion(self, body, timeout=None, use_cache=True, cache_variant=None, outcome=None):
+        """Request a streamed completion and yield content deltas as they arrive.
+
+        Raises AzureOpenAIError on a non-200 status. A cached answer is
+        yielded as a single delta, and a fully received stream is cached like
+        a regular completion. When outcome is a dict, it is given from_cache
+        and the usage the stream reported (None without AZURE_OPENAI_STREAM_USAGE),
+        as well as its finish_reason.
+        """
+        if outcome is None:
+            outcome = {}
+        outcome.update(from_cache=False, usage=None, finish_reason=None)
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.deployment, body, cache_variant)
+            if use_cache:
+                data = self.cache.get(key)
+                if data is not None:
+                    outcome.update(from_cache=True, finish_reason=data["choices"][0].get("finish_reason"))
+                    yield data["choices"][0]["message"]["content"]
+                    return
+        stream_body = dict(body, stream=True)
+        if AZURE_OPENAI_STREAM_USAGE:
+            stream_body["stream_options"] = {"include_usage": True}
+        if self.retry_policy is not None:
+            # Only the request itself is retried; a stream that broke halfway is
+            # not replayed, and streams are never hedged. Error answers come
+            # back from _send already closed, so retrying them leaks nothing
+            sent = {}
+
+            def send():
+                response, sent['lease'] = self._send(stream_body, timeout, stream=True)
+                return response
+
+            response = self.retry_policy.execute(send, hedge=False, time_left=_time_left(timeout))
+            lease = sent.get('lease')
+        else:
+            response, lease = self._send(stream_body, timeout, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise AzureOpenAIError(response.status_code)
+            parts = []
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    if chunk.get("usage"):
+                        # The last chunk, without choices, when usage was asked for
+                        outcome['usage'] = chunk["usage"]
+                    for choice in chunk.get("choices") or ():
+                        if choice.get("finish_reason"):
+                            outcome['finish_reason'] = choice["finish_reason"]
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+            finally:
+                self._release(lease, response, stream=True, usage=outcome['usage'])
+        if key is not None and parts:
+            self.cache.set(key, {"choices": [{"index": 0, "finish_reason": outcome['finish_reason'],
+                                              "message": {"role": "assistant", "content": "".join(parts)}}]})
+
+    def close(self):
+        self.session.close()
+
+
+def _time_left(timeout):
+    """What a retry's backoff may take out of a request's timeout: only a callable one follows a deadline."""
+    return timeout if callable(timeout) else None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide client over AZURE_OPENAI_DEPLOYMENTS or the AZURE_OPENAI_* deployment."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AzureOpenAIClient(
+                    DeploymentPool(load_deployments()),
+                    cache=get_cache(),
+                    retry_policy=RetryPolicy(),
+                    breaker=CircuitBreaker() if CIRCUIT_BREAKER_ENABLED else None
+                )
+    return _client
@@ -0,0 +1,107 @@
+import json
+import os
+from dotenv import load_dotenv
+from generation_engine import GenerationError
+from length_fitter import LENGTH_FIT_ENABLED, combined_length, fit_post
+from response_parser import HASHTAG_WORD
+
+load_dotenv()
+
+# Posts requested per completion; 1 keeps the one-request-per-post behaviour
+GENERATION_BATCH_SIZE = int(os.getenv("GENERATION_BATCH_SIZE", "1"))
+# How many times items that fail validation are re-requested
+BATCH_MAX_REPAIRS = int(os.getenv("BATCH_MAX_REPAIRS", "2"))
+
+# Appended to batch prompts so every answer has the same shape
+BATCH_FORMAT_INSTRUCTIONS = '''
+Return ONLY a JSON object of this exact shape, with exactly {count} items in "posts":
+{{"posts": [{{"content": "<post text without hashtags>", "hashtags": ["#Tag1", "#Tag2"]}}]}}
+Each post must be different from the others, and no hashtag may appear in more than one post.
+'''
+
+
+def parse_batch_response(text):
+    """Return the list of raw post items from a batch completion."""
+    text = text.strip()
+    # Tolerate a fenced ```json block even though JSON mode should prevent it
+    if text.startswith('```'):
+        text = text.strip('`')
+        if text.lower().startswith('json'):
+            text = text[4:]
+    data = json.loads(text)
+    posts = data.get('posts') if isinstance(data, dict) else data
+    if not isinstance(posts, list):
+        raise ValueError('"posts" is not a list')
+    return posts
+
+
+def validate_post(item, char_limit, platform=None):
+    """Check one batch item and return (content, hashtags) as the app stores them.
+
+    Items over char_limit are trimmed locally when that gives a coherent
+    post, and only rejected (and re-requested) when it doesn't.
+    """
+    if not isinstance(item, dict):
+        raise ValueError('item is not an object')
+    content = item.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError('missing content')
+    raw_hashtags = item.get('hashtags', [])
+    if isinstance(raw_hashtags, str):
+        raw_hashtags = raw_hashtags.split()
+    if not isinstance(raw_hashtags, list) or not all(isinstance(tag, str) for tag in raw_hashtags):
+        raise ValueError('hashtags is not a list of strings')
+    tags = []
+    for tag in raw_hashtags:
+        match = HASHTAG_WORD.fullmatch(tag.strip())
+        if match:
+            tags.append('#' + match.group(1))
+    content = content.strip().replace('**', '').replace('*', '')
+    hashtags = ' '.join(tags)
+    if combined_length(content, hashtags, platform) > char_limit:
+        fit = fit_post(content, hashtags, platform, char_limit)
+        if not (LENGTH_FIT_ENABLED and fit.ok):
+            raise ValueError(f'longer than {char_limit} characters')
+        content, hashtags = fit.content, fit.hashtags
+    return content, hashtags
+
+
+def run_batch(request_fn, count, char_limit, max_repairs=BATCH_MAX_REPAIRS, used_hashtags=(), platform=None,
+              on_post=None):
+    """Generate count posts with as few completions as possible.
+
+    request_fn(count, used_hashtags, attempt) returns the completion text for
+    a batch of count posts. Items that fail validation, or are missing from
+    the answer, are re-requested on their own up to max_repairs times.
+    on_post(attempt, post), when given, is called with each valid post.
+    Returns one (content, hashtags) tuple or GenerationError per post.
+    """
+    results = [None] * count
+    used = set(used_hashtags)
+    missing = list(range(count))
+    last_error = 'no answer'
+    for attempt in range(max_repairs + 1):
+        if not missing:
+            break
+        try:
+            items = parse_batch_response(request_fn(len(missing), sorted(used), attempt))
+        except GenerationError as e:
+            last_error = str(e)
+            continue
+        except ValueError as e:
+            last_error = f'invalid JSON answer: {e}'
+            continue
+        still_missing = []
+        for position, item in zip(missing, items + [None] * (len(missing) - len(items))):
+            try:
+                results[position] = validate_post(item, char_limit, platform)
+                used.update(results[position][1].split())
+                if on_post is not None:
+                    on_post(attempt, results[position])
+            except ValueError as e:
+                last_error = str(e)
+                still_missing.append(position)
+        missing = still_missing
+    for position in missing:
+        results[position] = GenerationError(f'Batch item failed validation: {last_error}')
+    return results
@@ -0,0 +1,81 @@
+"""Time generation-history searches over a large archive.
+
+    python benchmarks/bench_archive.py --posts 300000
+
+Fills a fresh SQLite archive with synthetic posts through the writer thread
+(as generation jobs would), then reports the median and worst latency of
+searches for rare and common words, topics, filters and the newest posts.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from post_archive import SQLitePostArchive  # noqa: E402
+
+VOCABULARY = [f"word{i}" for i in range(20000)]
+TOPICS = [f"topic{i} subject{i % 50}" for i in range(2000)]
+PLATFORMS = ['instagram', 'twitter', 'linkedin', 'facebook', 'tiktok', 'general']
+TONES = ['professional', 'casual', 'educational', 'inspirational', 'humorous']
+QUERIES = {
+    'rare word': {'text': 'word19999'},
+    'common word': {'text': 'word1'},
+    'two words': {'text': 'subject7 word42'},
+    'topic': {'text': 'topic12 subject12'},
+    'common word + platform': {'text': 'word1', 'platform': 'linkedin'},
+    'newest, filtered': {'platform': 'twitter', 'tone': 'humorous'},
+}
+
+
+def fill(archive, count, seed):
+    rng = random.Random(seed)
+    # Zipf-like word frequencies, so low-numbered words are common
+    cumulative = list(itertools.accumulate(1 / (i + 1) for i in range(len(VOCABULARY))))
+    for i in range(count):
+        words = rng.choices(VOCABULARY, cum_weights=cumulative, k=rng.randint(30, 150))
+        archive.add(topic=rng.choice(TOPICS), platform=rng.choice(PLATFORMS), tone=rng.choice(TONES),
+                    content=' '.join(words), hashtags=' '.join('#' + word for word in rng.sample(VOCABULARY[:300], 5)),
+                    prompt_tokens=900, completion_tokens=rng.randint(60, 300), latency=rng.uniform(1, 8))
+    archive.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=300000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = SQLitePostArchive(os.path.join(directory, 'archive.db'))
+        start = time.perf_counter()
+        fill(archive, args.posts, args.seed)
+        insert_seconds = time.perf_counter() - start
+        report = {'posts': args.posts, 'us_per_insert': round(insert_seconds / args.posts * 1e6, 1), 'queries': {}}
+        for name, query in QUERIES.items():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = archive.search(**query)
+                timings.append((time.perf_counter() - start) * 1000)
+            report['queries'][name] = {'results': len(results), 'median_ms': round(statistics.median(timings), 2),
+                                       'max_ms': round(max(timings), 2)}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"archived {report['posts']} posts at {report['us_per_insert']} us per post")
+    for name, row in report['queries'].items():
+        print(f"{name:>24}: {row['median_ms']:8.2f} ms median, {row['max_ms']:8.2f} ms max ({row['results']} results)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Time the series duplicate index as a campaign grows.
+
+    python benchmarks/bench_duplicates.py --posts 5000
+
+Indexes synthetic posts one at a time (as a job would) with a share of
+near-copies mixed in, and reports the check cost per post at several
+campaign sizes plus how many near-copies were caught.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duplicate_index import SeriesIndex  # noqa: E402
+
+VOCABULARY = [f"word{i}" for i in range(3000)]
+HASHTAGS = [f"#tag{i}" for i in range(200)]
+
+
+def make_posts(count, near_copy_share, seed):
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        if posts and rng.random() < near_copy_share:
+            # Copy an earlier post and change a few words
+            words = rng.choice(posts)[0].split()
+            for _ in range(max(1, len(words) // 20)):
+                words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+            posts.append((' '.join(words), ' '.join(rng.sample(HASHTAGS, 5)), True))
+        else:
+            posts.append((' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(20, 120))),
+                          ' '.join(rng.sample(HASHTAGS, 5)), False))
+    return posts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--near-copies', type=float, default=0.05, help='share of posts that copy an earlier one')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts, args.near_copies, args.seed)
+    index = SeriesIndex()
+    checkpoints = {size for size in (100, 1000, 5000, 10000, args.posts) if size <= args.posts}
+    window_start = time.perf_counter()
+    window_posts = 0
+    caught = copies = false_flags = 0
+    report = []
+    for position, (content, hashtags, is_copy) in enumerate(posts):
+        finding = index.check_and_add(position, content, hashtags)
+        window_posts += 1
+        copies += is_copy
+        if finding.duplicate_of is not None:
+            if is_copy:
+                caught += 1
+            else:
+                false_flags += 1
+        if position + 1 in checkpoints:
+            elapsed = time.perf_counter() - window_start
+            report.append({'indexed': position + 1, 'us_per_post': round(elapsed / window_posts * 1e6, 1)})
+            window_start, window_posts = time.perf_counter(), 0
+
+    summary = {'near_copies': copies, 'caught': caught, 'false_flags': false_flags, 'timings': report}
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    for row in report:
+        print(f"up to {row['indexed']:>6} posts: {row['us_per_post']:8.1f} us per post")
+    print(f"near-copies caught: {caught}/{copies}, unrelated posts flagged: {false_flags}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Check response_parser against the corpus and time it.
+
+    python benchmarks/bench_parser.py [--iterations N] [--json results.json]
+
+Exits with status 1 when any corpus entry parses differently from its
+expected output, so it can be run before and after parser changes.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_parser import parse_response  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus.jsonl')
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check(corpus):
+    failures = []
+    for case in corpus:
+        parsed = parse_response(case['text'], case['platform'])
+        actual = {'content': parsed.content, 'hashtags': parsed.hashtag_text, 'mentions': parsed.mentions}
+        if actual != case['expected']:
+            failures.append((case['name'], case['expected'], actual))
+    return failures
+
+
+def bench(corpus, iterations):
+    results = {}
+    for case in corpus:
+        text, platform = case['text'], case['platform']
+        start = time.perf_counter()
+        for _ in range(iterations):
+            parse_response(text, platform)
+        results[case['name']] = (time.perf_counter() - start) / iterations * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--json', help='write per-case microseconds to this file')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    failures = check(corpus)
+    for name, expected, actual in failures:
+        print(f"MISMATCH {name}\n  expected: {expected}\n  actual:   {actual}")
+
+    timings = bench(corpus, args.iterations)
+    width = max(len(name) for name in timings)
+    for name, micros in timings.items():
+        print(f"{name:<{width}}  {micros:8.2f} us/parse")
+    print(f"{'mean':<{width}}  {sum(timings.values()) / len(timings):8.2f} us/parse")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'failures': len(failures), 'us_per_parse': timings}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
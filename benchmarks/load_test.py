@@ -0,0 +1,187 @@
+"""End-to-end load test of the Flask app against the local Azure stand-in.
+
+    python benchmarks/load_test.py --post-counts 1 5 20 --concurrency 1 4 8 --output load_results.json
+
+Each virtual user submits a campaign on '/', follows its job at
+/jobs/<job_id> until it is done, then fetches /download-csv. Results per
+(postCount, concurrency) cell - throughput and p50/p95/p99 latencies - are
+written as JSON so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_azure_server import MockSettings, start_server  # noqa: E402
+
+
+def percentile(values, quantile):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(quantile * len(ordered)))], 4)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_campaign(client, post_count, platform, poll_interval):
+    """Submit one campaign and wait for it; returns (campaign seconds, csv seconds, failed posts)."""
+    start = time.perf_counter()
+    response = client.post('/', data={
+        'topic': 'Artificial Intelligence',
+        'platform': platform,
+        'tone': 'professional',
+        'postCount': str(post_count),
+        'baseDate': '2025-01-01',
+        'baseTime': '09:00',
+        'timeOption': 'different',
+        'interval': '1',
+        'fresh': '1'
+    }, headers={'Accept': 'application/json'})
+    if response.status_code != 202:
+        raise RuntimeError(f"submit returned {response.status_code}")
+    job_id = response.get_json()['id']
+    while True:
+        status = client.get(f'/jobs/{job_id}').get_json()
+        if status['state'] in ('done', 'failed'):
+            break
+        time.sleep(poll_interval)
+    campaign_seconds = time.perf_counter() - start
+    csv_start = time.perf_counter()
+    csv_response = client.get('/download-csv')
+    csv_response.get_data()
+    csv_seconds = time.perf_counter() - csv_start
+    if status['state'] == 'failed':
+        raise RuntimeError(status.get('error') or 'job failed')
+    return campaign_seconds, csv_seconds, status['failed']
+
+
+def run_cell(app, post_count, concurrency, campaigns_per_user, platform, poll_interval):
+    campaign_times = []
+    csv_times = []
+    errors = []
+    failed_posts = [0]
+    lock = threading.Lock()
+
+    def user():
+        client = app.test_client()
+        for _ in range(campaigns_per_user):
+            try:
+                campaign_seconds, csv_seconds, failed = run_campaign(client, post_count, platform, poll_interval)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                campaign_times.append(campaign_seconds)
+                csv_times.append(csv_seconds)
+                failed_posts[0] += failed
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    finished = len(campaign_times)
+    return {
+        'post_count': post_count,
+        'concurrency': concurrency,
+        'campaigns': finished,
+        'errors': len(errors),
+        'error_samples': errors[:3],
+        'failed_posts': failed_posts[0],
+        'wall_seconds': round(wall, 4),
+        'campaigns_per_second': round(finished / wall, 4) if wall else None,
+        'posts_per_second': round(finished * post_count / wall, 4) if wall else None,
+        'campaign_p50': percentile(campaign_times, 0.50),
+        'campaign_p95': percentile(campaign_times, 0.95),
+        'campaign_p99': percentile(campaign_times, 0.99),
+        'csv_p50': percentile(csv_times, 0.50),
+        'csv_p95': percentile(csv_times, 0.95),
+        'csv_p99': percentile(csv_times, 0.99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--post-counts', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--campaigns-per-user', type=int, default=3)
+    parser.add_argument('--platform', default='linkedin')
+    parser.add_argument('--poll-interval', type=float, default=0.05)
+    parser.add_argument('--latency-median', type=float, default=0.2)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-5xx', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra app settings, e.g. --env GENERATION_BATCH_SIZE=5')
+    parser.add_argument('--output', default='load_results.json')
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency_median, args.latency_sigma, args.rate_429, args.rate_5xx,
+                            retry_after=0.5, seed=args.seed)
+    server, base_url = start_server(settings)
+
+    # The app reads its settings at import time, so configure it before importing
+    app_env = {
+        'AZURE_OPENAI_ENDPOINT': base_url,
+        'AZURE_OPENAI_KEY': 'load-test',
+        'AZURE_OPENAI_DEPLOYMENT': 'mock',
+        'AZURE_OPENAI_API_VERSION': '2024-02-01',
+        'POST_STORE': 'memory',
+        'LLM_CACHE_ENABLED': '0'
+    }
+    for item in args.env:
+        key, _, value = item.partition('=')
+        app_env[key] = value
+    os.environ.update(app_env)
+    from api_html import app  # noqa: E402
+
+    results = []
+    for post_count in args.post_counts:
+        for concurrency in args.concurrency:
+            cell = run_cell(app, post_count, concurrency, args.campaigns_per_user, args.platform, args.poll_interval)
+            results.append(cell)
+            print(f"postCount={post_count:<3} concurrency={concurrency:<3} "
+                  f"{cell['campaigns_per_second'] or 0:7.3f} campaigns/s  "
+                  f"p50={cell['campaign_p50']}s p95={cell['campaign_p95']}s p99={cell['campaign_p99']}s  "
+                  f"errors={cell['errors']}")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {
+            'latency_median': args.latency_median,
+            'latency_sigma': args.latency_sigma,
+            'rate_429': args.rate_429,
+            'rate_5xx': args.rate_5xx,
+            'campaigns_per_user': args.campaigns_per_user,
+            'platform': args.platform,
+            'app_env': {key: value for key, value in app_env.items() if key != 'AZURE_OPENAI_KEY'}
+        },
+        'mock': dict(settings.counters),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Local stand-in for the Azure OpenAI chat-completions endpoint.
+
+    python benchmarks/mock_azure_server.py --port 8099 --latency-median 1.5 --rate-429 0.05
+
+Then point the app at it:
+
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099/ AZURE_OPENAI_KEY=test \\
+    AZURE_OPENAI_DEPLOYMENT=mock AZURE_OPENAI_API_VERSION=2024-02-01 python api_html.py
+
+It serves POST /openai/deployments/<deployment>/chat/completions with
+log-normally distributed latency, injected 429s (with Retry-After and
+x-ratelimit-* headers) and 5xx errors, the n parameter, JSON mode batches,
+stream=true Server-Sent Events and prompt-prefix caching in the usage. Post bodies are taken from the parser
+corpus or generated in the hashtag formats the parser understands.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus.jsonl')
+PATH_PATTERN = re.compile(r'^/openai/deployments/([^/]+)/chat/completions$')
+TOPIC_PATTERN = re.compile(r'(?:post on|tweet about|posts on|post about) "([^"]+)"')
+BATCH_COUNT_PATTERN = re.compile(r'exactly (\d+) items')
+PLATFORM_PATTERN = re.compile(r'(?:Target audience: |for an? |" for )(\w+)')
+
+SENTENCES = [
+    "Here's the thing most people miss about {topic}: it is already part of your day.",
+    "@sundarpichai once said the biggest shifts feel small at first, and {topic} proves it.",
+    "Think of {topic} like a good coffee grinder - the prep matters more than the brew.",
+    "Teams that measured {topic} before changing anything saw twice the results.",
+    "@satyanadella keeps reminding leaders that culture eats tools for breakfast.",
+    "Start with one small experiment this week and write down what changed.",
+    "Did you know? Most {topic} projects fail on adoption, not technology.",
+    "The best time to learn {topic} was last year. The second best is today. 🚀",
+]
+HASHTAG_STYLES = ('label', 'bold_label', 'line', 'trailing')
+# Like the real service, prompt prefixes seen before are reported as cached
+# from this many tokens on, in steps of PROMPT_CACHE_STEP; a token is taken
+# as four characters
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_STEP = 128
+
+
+class MockSettings:
+    def __init__(self, latency_median=1.0, latency_sigma=0.5, rate_429=0.0, rate_5xx=0.0,
+                 retry_after=1.0, stream_chunk_delay=0.02, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.stream_chunk_delay = stream_chunk_delay
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, '429': 0, '5xx': 0, 'streams': 0}
+        self.prompt_prefixes = set()
+        self.canned = []
+        if os.path.exists(CORPUS_PATH):
+            with open(CORPUS_PATH, encoding='utf-8') as f:
+                self.canned = [json.loads(line) for line in f if line.strip()]
+
+    def draw(self):
+        """Return (latency seconds, injected status or None) for one request."""
+        with self.lock:
+            self.counters['requests'] += 1
+            latency = self.latency_median * math.exp(self.random.gauss(0, self.latency_sigma))
+            roll = self.random.random()
+            if roll < self.rate_429:
+                self.counters['429'] += 1
+                return latency * 0.1, 429
+            if roll < self.rate_429 + self.rate_5xx:
+                self.counters['5xx'] += 1
+                return latency, self.random.choice((500, 503))
+            return latency, None
+
+    def cached_tokens(self, prompt):
+        """Tokens of the longest prefix of prompt sent before, as the provider's prompt cache counts them."""
+        cached = 0
+        with self.lock:
+            for end in range(PROMPT_CACHE_MIN_TOKENS * 4, len(prompt) + 1, PROMPT_CACHE_STEP * 4):
+                prefix = hash(prompt[:end])
+                if prefix in self.prompt_prefixes:
+                    cached = end // 4
+                else:
+                    self.prompt_prefixes.add(prefix)
+        return cached
+
+    def post_text(self, topic, platform):
+        with self.lock:
+            rng = random.Random(self.random.random())
+        if self.canned and rng.random() < 0.3:
+            matching = [case for case in self.canned if case['platform'] == platform] or self.canned
+            return rng.choice(matching)['text']
+        sentence_count = 2 if platform in ('twitter', 'tiktok') else rng.randint(4, 8)
+        body = ' '.join(rng.choice(SENTENCES).format(topic=topic) for _ in range(sentence_count))
+        tags = ' '.join(f"#{word}" for word in rng.sample(['AI', 'Tech', 'Growth', 'Learning', 'Future', 'Innovation', 'Data', 'Leadership'], 3))
+        style = 'trailing' if platform == 'twitter' else rng.choice(HASHTAG_STYLES)
+        if style == 'label':
+            return f"{body}\n\nHashtags: {tags}"
+        if style == 'bold_label':
+            return f"**{topic}**\n\n{body}\n\n**Hashtags:** {tags}"
+        if style == 'line':
+            return f"{body}\n{tags}"
+        return f"{body} {tags}"
+
+
+def make_handler(settings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            match = PATH_PATTERN.match(self.path.split('?', 1)[0])
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length)
+            if not match:
+                return self._json(404, {'error': {'code': 'NotFound'}})
+            if not self.headers.get('api-key'):
+                return self._json(401, {'error': {'code': '401', 'message': 'Access denied'}})
+            try:
+                body = json.loads(raw or b'{}')
+            except ValueError:
+                return self._json(400, {'error': {'code': 'BadRequest'}})
+
+            latency, status = settings.draw()
+            time.sleep(latency)
+            if status == 429:
+                return self._json(429, {'error': {'code': '429', 'message': 'Rate limit exceeded'}}, {
+                    'Retry-After': str(int(math.ceil(settings.retry_after))),
+                    'retry-after-ms': str(int(settings.retry_after * 1000)),
+                    'x-ratelimit-remaining-requests': '0',
+                    'x-ratelimit-remaining-tokens': '0'
+                })
+            if status:
+                return self._json(status, {'error': {'code': str(status), 'message': 'Injected failure'}})
+
+            prompt = ' '.join(message.get('content') or '' for message in body.get('messages', []))
+            texts = [self._completion_text(body, prompt) for _ in range(max(1, int(body.get('n', 1))))]
+            # Like the real service, an answer longer than max_tokens is cut off there
+            max_chars = int(body['max_tokens']) * 4 if body.get('max_tokens') else None
+            finish_reasons = ['length' if max_chars and len(text) > max_chars else 'stop' for text in texts]
+            texts = [text[:max_chars] for text in texts]
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = sum(len(text) for text in texts) // 4
+            if body.get('stream'):
+                usage = None
+                if (body.get('stream_options') or {}).get('include_usage'):
+                    usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                             'total_tokens': prompt_tokens + completion_tokens}
+                return self._stream(texts[0], usage, finish_reasons[0])
+            self._json(200, {
+                'id': f'chatcmpl-mock-{time.time_ns()}',
+                'object': 'chat.completion',
+                'model': match.group(1),
+                'choices': [
+                    {'index': i, 'finish_reason': finish_reason, 'message': {'role': 'assistant', 'content': text}}
+                    for i, (text, finish_reason) in enumerate(zip(texts, finish_reasons))
+                ],
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': completion_tokens,
+                    'total_tokens': prompt_tokens + completion_tokens,
+                    'prompt_tokens_details': {'cached_tokens': settings.cached_tokens(prompt)}
+                }
+            }, {'x-ratelimit-remaining-requests': '1000', 'x-ratelimit-remaining-tokens': '1000000'})
+
+        def _completion_text(self, body, prompt):
+            topic_match = TOPIC_PATTERN.search(prompt)
+            topic = topic_match.group(1) if topic_match else 'technology'
+            platform_match = PLATFORM_PATTERN.search(prompt)
+            platform = platform_match.group(1) if platform_match else ('twitter' if 'Twitter' in prompt else 'general')
+            if (body.get('response_format') or {}).get('type') == 'json_object':
+                count_match = BATCH_COUNT_PATTERN.search(prompt)
+                count = int(count_match.group(1)) if count_match else 1
+                posts = []
+                for _ in range(count):
+                    text = settings.post_text(topic, platform)
+                    tags = re.findall(r'#\w+', text)
+                    content = re.sub(r'\**hashtags\**:\**.*$', '', text, flags=re.IGNORECASE | re.DOTALL)
+                    posts.append({'content': re.sub(r'#\w+', '', content).strip(), 'hashtags': tags})
+                return json.dumps({'posts': posts})
+            return settings.post_text(topic, platform)
+
+        def _stream(self, text, usage=None, finish_reason='stop'):
+            with settings.lock:
+                settings.counters['streams'] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for start in range(0, len(text), 12):
+                chunk = {'choices': [{'index': 0, 'delta': {'content': text[start:start + 12]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(settings.stream_chunk_delay)
+            chunk = {'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            if usage is not None:
+                self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/mock-stats':
+                with settings.lock:
+                    return self._json(200, dict(settings.counters))
+            self._json(404, {'error': {'code': 'NotFound'}})
+
+    return Handler
+
+
+def start_server(settings, host='127.0.0.1', port=0):
+    """Start the mock in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-median', type=float, default=1.0, help='median seconds per completion')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='log-normal spread of the latency')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='share of requests answered with 500/503')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--stream-chunk-delay', type=float, default=0.02)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    settings = MockSettings(args.latency_median, args.latency_sigma, args.rate_429, args.rate_5xx,
+                            args.retry_after, args.stream_chunk_delay, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(settings))
+    server.daemon_threads = True
+    print(f"Mock Azure OpenAI listening on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Generate posts for many topics without the web app.
+
+    python bulk_generate.py plan.csv --output posts.csv
+
+The input is a CSV or JSONL file of rows with topic, platform, tone, date
+(YYYY-MM-DD) and time (HH:MM), plus optional count and interval (days) to
+expand a row into a series. Finished posts are appended to a checkpoint
+file as they complete, and the Hootsuite CSV is written from it, so an
+interrupted run picks up where it stopped when started again with the
+same arguments. Rows reach the CSV as posts finish, and the file is
+rewritten in plan order when the run ends.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from api_html import HTML_TAG, PLATFORM_ALGORITHMS, generate_post_llm
+from generation_engine import GENERATION_CONCURRENCY, GenerationError, generate_posts
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TONE = 'professional'
+DEFAULT_PLATFORM = 'general'
+
+
+def read_rows(path):
+    """Read plan rows from a .jsonl file or a CSV with a header line."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            rows = []
+            for line, text in enumerate((text for text in f if text.strip()), start=1):
+                try:
+                    rows.append(json.loads(text))
+                except ValueError as e:
+                    raise ValueError(f"Row {line}: {e}") from e
+            return rows
+        return list(csv.DictReader(f))
+
+
+def expand_rows(rows):
+    """Turn plan rows into one task per post: (key, topic, platform, tone, date, time, number)."""
+    tasks = []
+    for line, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Row {line}: expected an object with topic, platform, tone, date and time")
+        topic = str(row.get('topic') or '').strip()
+        if not topic:
+            raise ValueError(f"Row {line}: topic is required")
+        platform = str(row.get('platform') or DEFAULT_PLATFORM).strip().lower()
+        if platform not in PLATFORM_ALGORITHMS:
+            raise ValueError(f"Row {line}: unknown platform '{platform}', expected one of {', '.join(PLATFORM_ALGORITHMS)}")
+        tone = str(row.get('tone') or DEFAULT_TONE).strip()
+        try:
+            start = datetime.strptime(f"{row.get('date')} {row.get('time') or '09:00'}", '%Y-%m-%d %H:%M')
+            count = int(row.get('count') or 1)
+            interval = int(row.get('interval') or 1)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Row {line}: {e}") from e
+        if count < 1 or interval < 1:
+            raise ValueError(f"Row {line}: count and interval must be at least 1")
+        for number in range(1, count + 1):
+            when = start + timedelta(days=(number - 1) * interval)
+            date_str, time_str = when.strftime('%Y-%m-%d'), when.strftime('%H:%M')
+            tasks.append((task_key(line, topic, platform, tone, date_str, time_str, number),
+                          topic, platform, tone, date_str, time_str, number))
+    return tasks
+
+
+def task_key(*fields):
+    # Keyed on the plan row and its content: identical rows are separate
+    # posts, and an edited row is generated again
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()[:24]
+
+
+def load_checkpoint(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; that post is generated again
+                continue
+            done[entry['key']] = entry
+    return done
+
+
+def trim_torn_line(path):
+    """Cut a checkpoint back to its last complete line, so new entries start on a line of their own."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+
+
+def write_csv(path, tasks, done):
+    """Write the Hootsuite CSV of the finished posts in plan order."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date & Time', 'Content'])
+        for task in tasks:
+            if task[0] in done:
+                writer.writerow(csv_row(done[task[0]]))
+    os.replace(temporary, path)
+
+
+def csv_row(entry):
+    content = HTML_TAG.sub('', entry['content']).replace('**', '')
+    return [f"{entry['date']} {entry['time']}", f"{content} {entry['hashtags']}".strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help='plan file (.csv or .jsonl)')
+    parser.add_argument('--output', default='bulk_posts.csv', help='Hootsuite CSV to write')
+    parser.add_argument('--checkpoint', help='completed posts (default: <output>.checkpoint.jsonl)')
+    parser.add_argument('--workers', type=int, default=GENERATION_CONCURRENCY)
+    parser.add_argument('--stop-after-failures', type=int, default=10,
+                        help='stop sending requests after this many failures in a row, e.g. when the quota is used up')
+    parser.add_argument('--fresh', action='store_true', help='bypass the completion cache')
+    args = parser.parse_args()
+    # The CLI reports progress at INFO
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(message)s")
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+    try:
+        tasks = expand_rows(read_rows(args.input))
+    except (OSError, ValueError) as e:
+        parser.error(f"{args.input}: {e}")
+    done = load_checkpoint(checkpoint_path)
+    pending = [task for task in tasks if task[0] not in done]
+    logger.info("%d posts planned, %d already done, %d to generate", len(tasks), len(tasks) - len(pending), len(pending))
+
+    # The CSV is rebuilt from the checkpoint, so it never holds a post the
+    # checkpoint doesn't know about
+    write_csv(args.output, tasks, done)
+    output = open(args.output, 'a', newline='', encoding='utf-8')
+    writer = csv.writer(output)
+    # A crash can leave half an entry at the end; appending to it would lose the next one
+    trim_torn_line(checkpoint_path)
+    checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+
+    failures_in_row = 0
+    stopped = threading.Event()
+
+    def generate(task):
+        if stopped.is_set():
+            raise GenerationError("Stopped after repeated failures")
+        _, topic, platform, tone, _, _, number = task
+        algorithm = PLATFORM_ALGORITHMS[platform]
+        return generate_post_llm(topic, platform, tone, number, algorithm, fresh=args.fresh)
+
+    def save(position, result):
+        # Called on the main thread as posts finish, so the files need no lock
+        nonlocal failures_in_row
+        key, topic, platform, tone, date_str, time_str, number = result['task']
+        if result['status'] != 'ok':
+            if not stopped.is_set():
+                failures_in_row += 1
+                logger.warning("Failed %s post %d on '%s': %s", platform, number, topic, result['error'])
+                if failures_in_row >= args.stop_after_failures:
+                    logger.error("%d failures in a row, stopping; run again to resume", failures_in_row)
+                    stopped.set()
+            return
+        failures_in_row = 0
+        entry = {'key': key, 'topic': topic, 'platform': platform, 'tone': tone, 'date': date_str,
+                 'time': time_str, 'content': result['content'], 'hashtags': result['hashtags']}
+        checkpoint.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+        done[key] = entry
+        writer.writerow(csv_row(entry))
+        output.flush()
+
+    try:
+        results = generate_posts(pending, generate, max_workers=args.workers, on_result=save)
+    finally:
+        checkpoint.close()
+        output.close()
+        # Posts after a resume were appended as they finished; put them in plan order
+        write_csv(args.output, tasks, done)
+    failed = sum(1 for result in results if result['status'] != 'ok')
+    logger.info("Generated %d posts, %d failed; CSV written to %s", len(results) - failed, failed, args.output)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import os
+import threading
+from dotenv import load_dotenv
+from length_fitter import combined_length
+from response_parser import HASHTAG, MENTION
+
+load_dotenv()
+
+# Completions requested per post via the 'n' parameter; 1 disables selection.
+# CANDIDATE_COUNTS overrides it per platform, e.g. "twitter=3,tiktok=3".
+CANDIDATE_COUNT = int(os.getenv("CANDIDATE_COUNT", "1"))
+CANDIDATE_COUNTS = {
+    name.strip(): int(count)
+    for name, count in (item.split('=', 1) for item in os.getenv("CANDIDATE_COUNTS", "").split(',') if '=' in item)
+}
+
+# (minimum @mentions, minimum hashtags, maximum hashtags) the prompts ask for
+PLATFORM_RULES = {
+    'twitter': (1, 2, 3),
+}
+DEFAULT_RULES = (2, 1, 10)
+# Passing candidates that use about this much of the limit are preferred
+TARGET_FILL = 0.85
+
+
+def candidate_count(platform):
+    return max(1, CANDIDATE_COUNTS.get(platform, CANDIDATE_COUNT))
+
+
+def score_candidate(content, hashtags, platform, char_limit):
+    """Return (passed, score, reasons) for one parsed candidate; higher score is better."""
+    min_mentions, min_tags, max_tags = PLATFORM_RULES.get(platform, DEFAULT_RULES)
+    length = combined_length(content, hashtags, platform)
+    mentions = len(MENTION.findall(content))
+    tags = len(HASHTAG.findall(hashtags))
+    reasons = []
+    if not content:
+        reasons.append('empty')
+    if length > char_limit:
+        reasons.append('too_long')
+        length_score = -(length - char_limit) / char_limit
+    else:
+        length_score = 1 - abs(length - TARGET_FILL * char_limit) / char_limit
+    if mentions < min_mentions:
+        reasons.append('mentions')
+    if not min_tags <= tags <= max_tags:
+        reasons.append('hashtags')
+    # Length problems outweigh mention/hashtag problems, which cost a follow-up call less often
+    score = length_score * 2 + (mentions >= min_mentions) + (min_tags <= tags <= max_tags)
+    return not reasons, score, reasons
+
+
+class Selection:
+    def __init__(self, content, hashtags, passed, index, reasons):
+        self.content = content
+        self.hashtags = hashtags
+        self.passed = passed
+        self.index = index
+        self.reasons = reasons
+
+
+class SelectionStats:
+    """Per-platform counters used to tune how many candidates to request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._platforms = {}
+
+    def record(self, platform, requested, passing, chosen_index, failures):
+        with self._lock:
+            stats = self._platforms.setdefault(platform, {
+                'selections': 0, 'candidates': 0, 'passing': 0, 'all_failed': 0,
+                'chosen_index': {}, 'failures': {}
+            })
+            stats['selections'] += 1
+            stats['candidates'] += requested
+            stats['passing'] += passing
+            if not passing:
+                stats['all_failed'] += 1
+            stats['chosen_index'][chosen_index] = stats['chosen_index'].get(chosen_index, 0) + 1
+            for reason in failures:
+                stats['failures'][reason] = stats['failures'].get(reason, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for platform, stats in self._platforms.items():
+                stats = dict(stats, chosen_index=dict(stats['chosen_index']), failures=dict(stats['failures']))
+                stats['pass_rate'] = round(stats['passing'] / stats['candidates'], 4) if stats['candidates'] else 0.0
+                result[platform] = stats
+            return result
+
+
+selection_stats = SelectionStats()
+
+
+def select_candidate(texts, parse, platform, char_limit, stats=selection_stats, cut_off=()):
+    """Parse every candidate text with parse(text) -> (content, hashtags) and pick the best.
+
+    Candidates whose index is in cut_off stopped at max_tokens and fail as 'truncated'.
+    """
+    best = None
+    passing = 0
+    failures = []
+    for index, text in enumerate(texts):
+        content, hashtags = parse(text)
+        passed, score, reasons = score_candidate(content, hashtags, platform, char_limit)
+        if index in cut_off:
+            passed, reasons = False, reasons + ['truncated']
+        passing += passed
+        failures.extend(reasons)
+        if best is None or (passed, score) > best[0]:
+            best = ((passed, score), Selection(content, hashtags, passed, index, reasons))
+    selection = best[1]
+    if stats is not None:
+        stats.record(platform, len(texts), passing, selection.index, failures)
+    return selection
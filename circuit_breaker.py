@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "1") == "1"
+# Share of failed requests among the recent ones that opens the circuit
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+# Fewest recent requests the failure rate is judged on
+CIRCUIT_MIN_REQUESTS = int(os.getenv("CIRCUIT_MIN_REQUESTS", "5"))
+# Only outcomes this recent count
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+# How long an open circuit rejects requests before letting a probe through
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+WINDOW_SIZE = 50
+
+
+class CircuitBreaker:
+    """Fails requests fast while the completion endpoint keeps failing.
+
+    Closed: requests go through and outcomes are recorded. Once the recent
+    failure rate reaches failure_rate the circuit opens and every request is
+    rejected for open_seconds. Then it is half-open: a single probe request
+    goes through, and its outcome closes the circuit or opens it again.
+    """
+
+    def __init__(self, failure_rate=CIRCUIT_FAILURE_RATE, min_requests=CIRCUIT_MIN_REQUESTS,
+                 window_seconds=CIRCUIT_WINDOW_SECONDS, open_seconds=CIRCUIT_OPEN_SECONDS):
+        self.failure_rate = failure_rate
+        self.min_requests = max(1, min_requests)
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self.opened_at = None
+        self._probing = False
+        self._outcomes = deque(maxlen=WINDOW_SIZE)
+        self._counters = {'opened': 0, 'rejected': 0, 'probes': 0}
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now: None when not, 'probe' for the half-open probe, else 'request'.
+
+        The probe must end in record(), or in release_probe() when its
+        outcome says nothing about the endpoint; until then no other
+        request gets through.
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return 'request'
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                self._counters['probes'] += 1
+                return 'probe'
+            self._counters['rejected'] += 1
+            return None
+
+    def release_probe(self):
+        """Give up the probe without an outcome, so the next request becomes the probe."""
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+
+    def retry_in(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def record(self, ok):
+        """Account for one request: ok is False for connection errors, timeouts and 5xx."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state != 'closed':
+                if self._probing:
+                    self._probing = False
+                    if ok:
+                        self.state = 'closed'
+                        self.opened_at = None
+                        self._outcomes.clear()
+                    else:
+                        self._open(now)
+                return
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                self._outcomes.popleft()
+            failures = sum(1 for _, outcome in self._outcomes if not outcome)
+            if len(self._outcomes) >= self.min_requests and failures >= self.failure_rate * len(self._outcomes):
+                self._open(now)
+
+    def _open(self, now):
+        self.state = 'open'
+        self.opened_at = now
+        self._counters['opened'] += 1
+
+    def stats(self):
+        with self._lock:
+            failures = sum(1 for _, outcome in self._outcomes if not outcome)
+            return dict(
+                self._counters,
+                state=self.state,
+                recent_requests=len(self._outcomes),
+                recent_failures=failures,
+                retry_in=None if self.opened_at is None else round(
+                    max(0.0, self.opened_at + self.open_seconds - time.monotonic()), 2)
+            )
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+from rate_limiter import AZURE_OPENAI_RPM, AZURE_OPENAI_TPM, AdaptiveRateLimiter, retry_after_seconds
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# JSON list of deployments, or the path of a JSON file holding one; without it
+# the single AZURE_OPENAI_* deployment is used
+AZURE_OPENAI_DEPLOYMENTS = os.getenv("AZURE_OPENAI_DEPLOYMENTS")
+# 'least_outstanding' sends each request to the deployment with the fewest
+# requests in flight, 'latency' to the one with the lowest recent latency
+DEPLOYMENT_ROUTING = os.getenv("DEPLOYMENT_ROUTING", "least_outstanding")
+# A deployment answering 5xx or failing is left out for this long, doubling
+# with every further failure; a 429 drains it for its Retry-After
+DEPLOYMENT_DRAIN_SECONDS = float(os.getenv("DEPLOYMENT_DRAIN_SECONDS", "5"))
+DEPLOYMENT_MAX_DRAIN_SECONDS = float(os.getenv("DEPLOYMENT_MAX_DRAIN_SECONDS", "120"))
+# Weight of the newest response in a deployment's moving average latency
+LATENCY_SMOOTHING = 0.2
+
+
+class Deployment:
+    """One chat-completions deployment with its own quota and health."""
+
+    def __init__(self, name, endpoint, deployment, api_version, api_key,
+                 rpm=AZURE_OPENAI_RPM, tpm=AZURE_OPENAI_TPM, weight=1.0):
+        self.name = name
+        self.deployment = deployment
+        self.weight = max(float(weight), 0.01)
+        self.url = None
+        self.headers = None
+        if endpoint and deployment and api_version and api_key:
+            self.url = f"{endpoint.rstrip('/')}/openai/deployments/{deployment}/chat/completions?api-version={api_version}"
+            self.headers = {
+                "Content-Type": "application/json",
+                "api-key": api_key
+            }
+        # Quotas are per deployment, so each one gets its own limiter
+        self.limiter = AdaptiveRateLimiter(rpm=rpm, tpm=tpm)
+        self.outstanding = 0
+        self.latency = None
+        self.drained_until = 0.0
+        self.failures_in_row = 0
+        self.counters = {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'drained': 0}
+
+    def is_configured(self):
+        return self.url is not None
+
+
+class DeploymentPool:
+    """Routes each request to one of several deployments and drains unhealthy ones.
+
+    A deployment that answers 429 is drained until its Retry-After has
+    passed; one that answers 5xx or fails to connect is drained for a backoff
+    that grows with consecutive failures. When every deployment is drained
+    the one that recovers first is used, and its limiter waits out the pause.
+    """
+
+    def __init__(self, deployments, routing=DEPLOYMENT_ROUTING):
+        self.deployments = [deployment for deployment in deployments if deployment.is_configured()]
+        self.routing = routing
+        self._lock = threading.Lock()
+        names = {deployment.deployment for deployment in self.deployments}
+        # Answers from deployments of the same model are interchangeable, so
+        # cache keys use the deployment name(s) rather than the endpoint
+        self.cache_name = ','.join(sorted(names)) if names else None
+
+    def is_configured(self):
+        return bool(self.deployments)
+
+    def choose(self):
+        """Pick a deployment for one request and count it as outstanding until release()."""
+        with self._lock:
+            now = time.monotonic()
+            healthy = [deployment for deployment in self.deployments if deployment.drained_until <= now]
+            if healthy:
+                deployment = min(healthy, key=self._load)
+            else:
+                deployment = min(self.deployments, key=lambda deployment: deployment.drained_until)
+            deployment.outstanding += 1
+            deployment.counters['requests'] += 1
+            return deployment
+
+    def _load(self, deployment):
+        if self.routing == 'latency':
+            # Unmeasured deployments are tried first; in-flight requests count
+            # too, so one fast deployment isn't sent everything at once
+            return ((deployment.latency or 0.0) * (deployment.outstanding + 1) / deployment.weight,
+                    deployment.outstanding)
+        return deployment.outstanding / deployment.weight, deployment.latency or 0.0
+
+    def record(self, deployment, status=None, elapsed=None, headers=None, error=None):
+        """Account for one response (status) or failed request (error) from deployment."""
+        with self._lock:
+            now = time.monotonic()
+            if error is None and status < 400:
+                deployment.failures_in_row = 0
+                deployment.counters['ok'] += 1
+                if elapsed is not None:
+                    deployment.latency = elapsed if deployment.latency is None else (
+                        LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * deployment.latency)
+                return
+            if status == 429:
+                deployment.counters['throttled'] += 1
+                drain = retry_after_seconds(headers or {})
+            elif error is not None or status >= 500:
+                deployment.counters['errors'] += 1
+                deployment.failures_in_row += 1
+                drain = min(DEPLOYMENT_MAX_DRAIN_SECONDS, DEPLOYMENT_DRAIN_SECONDS * 2 ** (deployment.failures_in_row - 1))
+            else:
+                return
+            if len(self.deployments) > 1:
+                deployment.counters['drained'] += 1
+                logger.info("Draining deployment %s for %.1fs after %s", deployment.name, drain, error or status)
+            deployment.drained_until = max(deployment.drained_until, now + drain)
+
+    def release(self, deployment):
+        with self._lock:
+            deployment.outstanding -= 1
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            deployments = [dict(
+                deployment.counters,
+                name=deployment.name,
+                deployment=deployment.deployment,
+                weight=deployment.weight,
+                outstanding=deployment.outstanding,
+                latency=None if deployment.latency is None else round(deployment.latency, 4),
+                drained_for=round(max(0.0, deployment.drained_until - now), 2)
+            ) for deployment in self.deployments]
+        for entry, deployment in zip(deployments, self.deployments):
+            entry['rate_limit'] = deployment.limiter.stats()
+        return {'routing': self.routing, 'deployments': deployments}
+
+
+def load_deployments(config=AZURE_OPENAI_DEPLOYMENTS):
+    """Deployments from AZURE_OPENAI_DEPLOYMENTS, or the single AZURE_OPENAI_* one.
+
+    Each entry may set name, endpoint, deployment, api_version, api_key (or
+    api_key_env, the variable holding it), rpm, tpm and weight; missing
+    values fall back to the AZURE_OPENAI_* settings.
+    """
+    defaults = {
+        'endpoint': os.getenv("AZURE_OPENAI_ENDPOINT"),
+        'deployment': os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+        'api_version': os.getenv("AZURE_OPENAI_API_VERSION"),
+        'api_key': os.getenv("AZURE_OPENAI_KEY")
+    }
+    if not config:
+        return [Deployment(defaults['deployment'] or 'default', **defaults)]
+    if config.lstrip().startswith('['):
+        entries = json.loads(config)
+    else:
+        with open(config, encoding='utf-8') as f:
+            entries = json.load(f)
+    deployments = []
+    for entry in entries:
+        settings = dict(defaults)
+        settings.update({key: entry[key] for key in ('endpoint', 'deployment', 'api_version', 'api_key') if key in entry})
+        if 'api_key_env' in entry:
+            settings['api_key'] = os.getenv(entry['api_key_env'])
+        name = entry.get('name') or urlparse(settings['endpoint'] or '').hostname or settings['deployment']
+        deployments.append(Deployment(name, rpm=float(entry.get('rpm', AZURE_OPENAI_RPM)),
+                                      tpm=float(entry.get('tpm', AZURE_OPENAI_TPM)),
+                                      weight=entry.get('weight', 1.0), **settings))
+    return deployments
@@ -0,0 +1,162 @@
+import os
+import random
+import re
+import threading
+import zlib
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DUPLICATE_CHECK_ENABLED = os.getenv("DUPLICATE_CHECK_ENABLED", "1") == "1"
+# Estimated Jaccard similarity of word shingles at which two posts count as near-duplicates
+DUPLICATE_SIMILARITY = float(os.getenv("DUPLICATE_SIMILARITY", "0.5"))
+# Share of a post's hashtags that earlier posts already used before it is sent back
+DUPLICATE_HASHTAG_SHARE = float(os.getenv("DUPLICATE_HASHTAG_SHARE", "0.5"))
+# Regenerations spent on one post before it is kept as it is
+DUPLICATE_MAX_REGENERATIONS = int(os.getenv("DUPLICATE_MAX_REGENERATIONS", "1"))
+
+SHINGLE_WORDS = 3
+# 21 bands of 3 rows: a pair at 0.5 similarity shares a bucket with ~94%
+# probability, unrelated posts (~0.1) about 2% of the time, so few
+# candidates need to be compared
+MINHASH_PERMUTATIONS = 63
+LSH_BANDS = 21
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+WORD = re.compile(r"[\w@#']+")
+
+_random = random.Random(20240501)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+
+
+def shingles(text):
+    """Lower-cased word n-grams, hashed to 32 bits."""
+    words = WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        words = words + [''] * (SHINGLE_WORDS - len(words))
+    return {zlib.crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode('utf-8'))
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(shingle_hashes):
+    if not shingle_hashes:
+        return (_MAX_HASH,) * MINHASH_PERMUTATIONS
+    return tuple(min((a * value + b) % _PRIME & _MAX_HASH for value in shingle_hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / MINHASH_PERMUTATIONS
+
+
+def hashtag_set(hashtags):
+    return {tag.lower() for tag in hashtags.split() if tag.startswith('#')}
+
+
+@dataclass
+class Finding:
+    """Why a post was flagged: the post it nearly copies and/or the hashtags already used."""
+    duplicate_of: int = None
+    similarity: float = 0.0
+    repeated_hashtags: list = field(default_factory=list)
+
+    @property
+    def flagged(self):
+        return self.duplicate_of is not None or bool(self.repeated_hashtags)
+
+
+class SeriesIndex:
+    """Incremental index of a campaign's posts: MinHash/LSH for content, a set index for hashtags.
+
+    Checking a post only compares it with the posts sharing an LSH bucket,
+    so the cost per post stays flat as the campaign grows.
+    """
+
+    def __init__(self, threshold=DUPLICATE_SIMILARITY, hashtag_share=DUPLICATE_HASHTAG_SHARE):
+        self.threshold = threshold
+        self.hashtag_share = hashtag_share
+        self._rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        self._signatures = {}
+        self._hashtags = {}
+        self._buckets = {}
+        self._tag_counts = {}
+        self._lock = threading.Lock()
+
+    def _bands(self, signature):
+        return [(band, signature[band * self._rows:(band + 1) * self._rows]) for band in range(LSH_BANDS)]
+
+    def _check(self, signature, tags, exclude):
+        best, best_score = None, 0.0
+        candidates = set()
+        for band in self._bands(signature):
+            candidates.update(self._buckets.get(band, ()))
+        candidates.discard(exclude)
+        for position in candidates:
+            score = similarity(signature, self._signatures[position])
+            if score > best_score:
+                best, best_score = position, score
+        finding = Finding()
+        if best is not None and best_score >= self.threshold:
+            finding.duplicate_of, finding.similarity = best, best_score
+        own = self._hashtags.get(exclude, set())
+        repeated = sorted(tag for tag in tags if self._tag_counts.get(tag, 0) - (tag in own) > 0)
+        if len(repeated) >= 2 and len(repeated) >= self.hashtag_share * len(tags):
+            finding.repeated_hashtags = repeated
+        return finding
+
+    def check(self, position, content, hashtags):
+        """Compare a post with every other indexed post without adding it."""
+        signature = minhash(shingles(content))
+        with self._lock:
+            return self._check(signature, hashtag_set(hashtags), position)
+
+    def check_and_add(self, position, content, hashtags, add_flagged=True):
+        """Check a post and index it in one step, so concurrent posts see each other.
+
+        A flagged post is only indexed when add_flagged is true; pass False
+        when it is about to be regenerated and added again.
+        """
+        signature = minhash(shingles(content))
+        tags = hashtag_set(hashtags)
+        with self._lock:
+            finding = self._check(signature, tags, position)
+            if add_flagged or not finding.flagged:
+                self._add(position, signature, tags)
+            return finding
+
+    def add(self, position, content, hashtags):
+        signature = minhash(shingles(content))
+        with self._lock:
+            self._add(position, signature, hashtag_set(hashtags))
+
+    def _add(self, position, signature, tags):
+        self._remove(position)
+        self._signatures[position] = signature
+        self._hashtags[position] = tags
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(position)
+        for tag in tags:
+            self._tag_counts[tag] = self._tag_counts.get(tag, 0) + 1
+
+    def _remove(self, position):
+        signature = self._signatures.pop(position, None)
+        if signature is None:
+            return
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(position)
+                if not bucket:
+                    del self._buckets[band]
+        for tag in self._hashtags.pop(position):
+            self._tag_counts[tag] -= 1
+            if not self._tag_counts[tag]:
+                del self._tag_counts[tag]
+
+    def used_hashtags(self):
+        with self._lock:
+            return sorted(self._tag_counts)
+
+    def __len__(self):
+        return len(self._signatures)
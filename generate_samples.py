@@ -1,25 +1,23 @@
 import os
-import requests
-import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from azure_client import get_client
+from llm_cache import get_cache
+from response_parser import parse_response
+from token_budget import token_budget
+from generation_engine import GENERATION_CONCURRENCY
+from platform_variants import derivation_prompt, plan_platforms
+from length_fitter import combined_length, fit_post
+# Samples are asked for within the limits the app generates to, so the
+# max_tokens budgeted from them leaves room for the whole post
+from post_prompts import PLATFORM_CHAR_LIMITS
 
 load_dotenv()
 
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
-AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY")
-
-PLATFORM_CHAR_LIMITS = {
-    'instagram': 2200,
-    'twitter': 280,
-    'linkedin': 3000,
-    'facebook': 63206,
-    'tiktok': 150,
-    'general': 1000
-}
-
-def generate_platform_content(topic, platform, tone):
+logger = logging.getLogger(__name__)
+
+def generate_platform_content(topic, platform, tone, fresh=False):
     char_limit = PLATFORM_CHAR_LIMITS.get(platform, PLATFORM_CHAR_LIMITS['general'])
     
     prompt = f'''
@@ -59,59 +57,59 @@ Constraints:
 After the content, add a line starting with 'Hashtags:' followed by hashtags that are highly relevant to the topic only, with #, space-separated. For Twitter, use only 3-4 hashtags. For other platforms, use up to 10 hashtags. Do not repeat hashtags from previous posts in the series.
 '''
 
-    if AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_KEY and AZURE_OPENAI_DEPLOYMENT and AZURE_OPENAI_API_VERSION:
-        url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_OPENAI_KEY
-        }
+    return complete_platform_content(prompt, platform, char_limit, fresh)
+
+def derive_platform_content(draft, topic, platform, tone, fresh=False):
+    """Rewrite another platform's sample as a short post, falling back to a full generation."""
+    char_limit = PLATFORM_CHAR_LIMITS.get(platform, PLATFORM_CHAR_LIMITS['general'])
+    prompt = derivation_prompt((draft['content'], draft['hashtags']), topic, platform, tone, char_limit)
+    result = complete_platform_content(prompt, platform, char_limit, fresh, temperature=0.7)
+    if result is None or not result['within_limit']:
+        return generate_platform_content(topic, platform, tone, fresh)
+    result['derived_from'] = draft['platform']
+    return result
+
+def complete_platform_content(prompt, platform, char_limit, fresh=False, temperature=0.9):
+    client = get_client()
+    if client.is_configured():
         body = {
             "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 400,
-            "temperature": 0.9
+            "temperature": temperature
         }
-        
+        token_budget.apply(body, char_limit)
+
         try:
-            response = requests.post(url, headers=headers, json=body, timeout=30)
+            response = client.chat_completion(body, use_cache=not fresh)
             if response.status_code == 200:
                 data = response.json()
                 fullText = data["choices"][0]["message"]["content"].strip()
-                
-                # Parse content and hashtags
-                content = fullText
-                hashtags = ''
-                hashtagMatch = re.search(r'(?:^|\n)hashtags:\s*([#\w\s-]+)', fullText, re.IGNORECASE)
-                if hashtagMatch:
-                    hashtags = hashtagMatch.group(1).strip()
-                    content = re.sub(r'(?:^|\n)hashtags:\s*([#\w\s-]+)', '', content, flags=re.IGNORECASE).strip()
-                else:
-                    lines = fullText.split('\n')
-                    lastLine = lines[-1]
-                    if lastLine.count('#') >= 2:
-                        hashtags = lastLine.strip()
-                        content = '\n'.join(lines[:-1]).strip()
-                
-                # Remove markdown
-                content = content.replace('**', '').replace('*', '')
-                
-                # Check total length
-                combined = (content + ' ' + hashtags).strip()
-                
+                if not getattr(response, 'from_cache', False):
+                    token_budget.observe(data.get("usage"), [fullText])
+
+                # Parse content and hashtags (markdown is removed by the parser)
+                parsed = parse_response(fullText, platform)
+                # Lengths are counted the way the platform counts them, and
+                # over-long samples are trimmed locally when possible
+                fit = fit_post(parsed.content, parsed.hashtag_text, platform, char_limit)
+                content, hashtags = (fit.content, fit.hashtags) if fit.ok else (parsed.content, parsed.hashtag_text)
+                total_chars = combined_length(content, hashtags, platform)
+
                 return {
                     'platform': platform,
                     'char_limit': char_limit,
                     'content': content,
                     'hashtags': hashtags,
-                    'total_chars': len(combined),
-                    'within_limit': len(combined) <= char_limit
+                    'mentions': parsed.mentions,
+                    'total_chars': total_chars,
+                    'within_limit': total_chars <= char_limit
                 }
             else:
                 return None
         except Exception as e:
-            print(f"Error generating content for {platform}: {e}")
+            logger.error("Error generating content for %s: %s", platform, e)
             return None
     else:
-        print("API credentials not found. Please check your .env file.")
+        logger.error("API credentials not found. Please check your .env file.")
         return None
 
 def generate_all_platform_samples():
@@ -125,17 +123,35 @@ def generate_all_platform_samples():
     print(f"Topic: {topic}")
     print(f"Tone: {tone}")
     print("=" * 80)
+
+    # Every platform is generated at the same time; the short ones are
+    # rewritten from the longest draft once it is ready. Direct platforms
+    # are submitted first, so a derived one never holds the last free worker.
+    source, direct, derived = plan_platforms(platforms, PLATFORM_CHAR_LIMITS)
+    with ThreadPoolExecutor(max_workers=max(1, min(GENERATION_CONCURRENCY, len(platforms)))) as executor:
+        futures = {platform: executor.submit(generate_platform_content, topic, platform, tone) for platform in direct}
+
+        def derive(platform):
+            draft = futures[source].result()
+            if draft is None:
+                return generate_platform_content(topic, platform, tone)
+            return derive_platform_content(draft, topic, platform, tone)
+
+        futures.update({platform: executor.submit(derive, platform) for platform in derived})
+        results = {platform: future.result() for platform, future in futures.items()}
     
     for platform in platforms:
         print(f"\n📱 {platform.upper()}")
         print("-" * 40)
         
-        result = generate_platform_content(topic, platform, tone)
+        result = results[platform]
         
         if result:
             print(f"Character Limit: {result['char_limit']}")
             print(f"Total Characters: {result['total_chars']}")
             print(f"Within Limit: {'✅' if result['within_limit'] else '❌'}")
+            if result.get('derived_from'):
+                print(f"Derived from: {result['derived_from']}")
             print(f"\n📝 CONTENT:")
             print(result['content'])
             print(f"\n🏷️  HASHTAGS:")
@@ -150,5 +166,11 @@ def generate_all_platform_samples():
         
         print("\n" + "=" * 80)
 
+    cache = get_cache()
+    if cache:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.0%})")
+
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
     generate_all_platform_samples() 
\ No newline at end of file
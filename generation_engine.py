@@ -0,0 +1,217 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+
+# Maximum number of posts generated at the same time. Keep this at or below
+# what the Azure OpenAI deployment quota allows.
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "5"))
+# Wall-clock budget for a whole campaign; 0 (the default) lets every post run to its own timeouts
+CAMPAIGN_DEADLINE_SECONDS = float(os.getenv("CAMPAIGN_DEADLINE_SECONDS", "0"))
+# A request is never given less than this of the remaining budget
+DEADLINE_MIN_REQUEST_SECONDS = float(os.getenv("DEADLINE_MIN_REQUEST_SECONDS", "5"))
+
+
+class GenerationError(Exception):
+    """Raised by a generator when a single post could not be produced."""
+
+
+class DeadlineExceeded(GenerationError):
+    """Raised instead of sending a request once the campaign deadline has passed."""
+
+
+@dataclass
+class CompletionRequest:
+    """One chat completion a generation step needs; on_delta asks for a streamed answer."""
+    body: dict
+    use_cache: bool = True
+    cache_variant: object = None
+    on_delta: object = None
+    timeout: object = None
+
+
+class CampaignDeadline:
+    """Wall-clock budget of one campaign, shared out over the posts still to finish.
+
+    Posts run concurrency at a time, so the time left is split over the
+    rounds still needed, and every request's timeout is capped to that share.
+    Once the deadline passes no request is sent and the posts that are left
+    fail right away with DeadlineExceeded.
+    """
+
+    def __init__(self, seconds, posts, concurrency=None):
+        self.expires_at = time.monotonic() + seconds
+        self.remaining_posts = posts
+        self.concurrency = max(1, concurrency or GENERATION_CONCURRENCY)
+        self._lock = threading.Lock()
+
+    def time_left(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def request_timeout(self):
+        """Timeout for the next request attempt, or DeadlineExceeded when the time is up."""
+        left = self.time_left()
+        if left <= 0:
+            raise DeadlineExceeded("Not generated: the campaign deadline passed")
+        with self._lock:
+            rounds = max(1, math.ceil(self.remaining_posts / self.concurrency))
+        return min(left, max(left / rounds, DEADLINE_MIN_REQUEST_SECONDS))
+
+    def bind(self, request):
+        """The request with its timeout following this deadline."""
+        return replace(request, timeout=self.request_timeout)
+
+    def post_finished(self):
+        with self._lock:
+            self.remaining_posts = max(0, self.remaining_posts - 1)
+
+
+def campaign_deadline(posts, seconds=CAMPAIGN_DEADLINE_SECONDS, concurrency=None):
+    """A CampaignDeadline for a campaign of this many posts, or None when deadlines are off."""
+    return CampaignDeadline(seconds, posts, concurrency) if seconds > 0 else None
+
+
+def run_steps(steps, send):
+    """Drive a generation generator with a blocking send(request) -> response.
+
+    Generation logic is written as generators that yield CompletionRequests
+    and get the response back (or the exception raised while sending), so the
+    same code runs on worker threads here and on coroutines in run_steps_async.
+    """
+    response, error = None, None
+    while True:
+        try:
+            request = steps.throw(error) if error is not None else steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            response, error = send(request), None
+        except Exception as e:
+            response, error = None, e
+
+
+async def run_steps_async(steps, send):
+    """run_steps for a coroutine send(request)."""
+    response, error = None, None
+    while True:
+        try:
+            request = steps.throw(error) if error is not None else steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            response, error = await send(request), None
+        except Exception as e:
+            response, error = None, e
+
+
+def generate_posts(tasks, generate_fn, max_workers=None, on_result=None):
+    """Run generate_fn(task) for every task with bounded concurrency.
+
+    Results come back in the same order as tasks, one dict per task:
+    {'task', 'content', 'hashtags', 'status', 'error'} where status is
+    'ok' or 'failed'. on_result(position, result) is called as soon as each
+    post finishes, in completion order.
+    """
+    if max_workers is None:
+        max_workers = GENERATION_CONCURRENCY
+    max_workers = max(1, min(max_workers, len(tasks) or 1))
+
+    def run(task):
+        try:
+            content, hashtags = generate_fn(task)
+        except Exception as e:
+            return _result(task, None, None, 'failed', str(e) or e.__class__.__name__)
+        if content is None:
+            return _result(task, None, None, 'failed', 'No content returned from the API')
+        return _result(task, content, hashtags or '', 'ok', None)
+
+    results = [None] * len(tasks)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, task): position for position, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            position = futures[future]
+            results[position] = future.result()
+            if on_result is not None:
+                on_result(position, results[position])
+    return results
+
+
+async def generate_posts_async(tasks, generate_fn, max_concurrency=None, on_result=None):
+    """generate_posts for a coroutine generate_fn(task), on the running event loop.
+
+    Every task is a coroutine waiting on its completion rather than a thread,
+    and at most max_concurrency of them are generating at the same time.
+    on_result usually writes to the store, so it runs on a worker thread,
+    one result at a time, while the other tasks keep generating.
+    """
+    if max_concurrency is None:
+        max_concurrency = GENERATION_CONCURRENCY
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(position, task):
+        async with semaphore:
+            try:
+                content, hashtags = await generate_fn(task)
+            except Exception as e:
+                return position, _result(task, None, None, 'failed', str(e) or e.__class__.__name__)
+        if content is None:
+            return position, _result(task, None, None, 'failed', 'No content returned from the API')
+        return position, _result(task, content, hashtags or '', 'ok', None)
+
+    results = [None] * len(tasks)
+    for finished in asyncio.as_completed([run(position, task) for position, task in enumerate(tasks)]):
+        position, results[position] = await finished
+        if on_result is not None:
+            await asyncio.get_running_loop().run_in_executor(None, on_result, position, results[position])
+    return results
+
+
+def _result(task, content, hashtags, status, error):
+    return {
+        'task': task,
+        'content': content,
+        'hashtags': hashtags,
+        'status': status,
+        'error': error
+    }
+
+
+def generate_post_batches(tasks, batch_fn, batch_size, max_workers=None, on_result=None):
+    """Like generate_posts, but batch_fn(chunk) produces up to batch_size posts per call.
+
+    batch_fn returns one item per task in the chunk: a (content, hashtags)
+    tuple, or an exception instance for a post that could not be produced.
+    """
+    chunks = [tasks[start:start + batch_size] for start in range(0, len(tasks), batch_size)]
+    if max_workers is None:
+        max_workers = GENERATION_CONCURRENCY
+    max_workers = max(1, min(max_workers, len(chunks) or 1))
+
+    def run(chunk):
+        try:
+            items = batch_fn(chunk)
+        except Exception as e:
+            items = [e] * len(chunk)
+        results = []
+        for task, item in zip(chunk, list(items) + [None] * (len(chunk) - len(items))):
+            if isinstance(item, Exception):
+                results.append(_result(task, None, None, 'failed', str(item) or item.__class__.__name__))
+            elif item is None or item[0] is None:
+                results.append(_result(task, None, None, 'failed', 'No content returned from the API'))
+            else:
+                results.append(_result(task, item[0], item[1] or '', 'ok', None))
+        return results
+
+    results = [None] * len(tasks)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, chunk): number * batch_size for number, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            start = futures[future]
+            for offset, result in enumerate(future.result()):
+                results[start + offset] = result
+                if on_result is not None:
+                    on_result(start + offset, result)
+    return results
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of campaigns generated at the same time; each campaign additionally
+# fans its posts out according to GENERATION_CONCURRENCY.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))
+
+
+class Job:
+    """Progress of one background campaign generation."""
+
+    def __init__(self, campaign_id, total):
+        self.id = uuid.uuid4().hex
+        self.campaign_id = campaign_id
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.state = 'queued'
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # Append-only event log for Server-Sent Events subscribers
+        self.events = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+
+    def record(self, ok):
+        with self._lock:
+            self.completed += 1
+            if not ok:
+                self.failed += 1
+
+    def publish(self, event, data):
+        with self._changed:
+            self.events.append((event, data))
+            self._changed.notify_all()
+
+    def wait_events(self, after, timeout=None):
+        """Return events after position 'after', waiting up to timeout for new ones."""
+        with self._changed:
+            if len(self.events) <= after and not self.finished:
+                self._changed.wait(timeout)
+            return self.events[after:]
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed')
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'campaign_id': self.campaign_id,
+                'state': self.state,
+                'total': self.total,
+                'completed': self.completed,
+                'failed': self.failed,
+                'error': self.error,
+                'events': len(self.events)
+            }
+
+
+class JobQueue:
+    """Runs jobs on a small worker pool and keeps their progress for polling."""
+
+    def __init__(self, max_workers=JOB_WORKERS, retention=JOB_RETENTION):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, campaign_id, total, work):
+        """Queue work(job) and return the Job right away."""
+        job = Job(campaign_id, total)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def submit_async(self, campaign_id, total, work, runner):
+        """Like submit, for a coroutine function work(job) run on runner's event loop.
+
+        Async jobs do not take a worker thread, so they are not limited by
+        JOB_WORKERS; the rate limiter and GENERATION_CONCURRENCY bound them.
+        """
+        job = Job(campaign_id, total)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        runner.submit(self._run_async(job, work))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, work):
+        job.state = 'running'
+        job.publish('state', job.to_dict())
+        try:
+            work(job)
+            job.state = 'done'
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            job.publish('state', job.to_dict())
+
+    async def _run_async(self, job, work):
+        job.state = 'running'
+        job.publish('state', job.to_dict())
+        try:
+            await work(job)
+            job.state = 'done'
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            job.publish('state', job.to_dict())
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide job queue."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
@@ -0,0 +1,207 @@
+import math
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from response_parser import MENTION
+
+load_dotenv()
+
+LENGTH_FIT_ENABLED = os.getenv("LENGTH_FIT_ENABLED", "1") == "1"
+# A fit that keeps less than this share of the room left for content is not
+# coherent enough, and the post is regenerated instead
+LENGTH_FIT_MIN_SHARE = float(os.getenv("LENGTH_FIT_MIN_SHARE", "0.3"))
+
+# twitter-text v3: code points in these ranges weigh 1, everything else 2,
+# URLs always count as 23 and an emoji sequence as 2
+TWITTER_LIGHT_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+TWITTER_URL_LENGTH = 23
+URL = re.compile(r'https?://\S+', re.IGNORECASE)
+
+ZWJ = '\u200d'
+# Hashtags that add reach on nothing in particular; dropped before topical ones
+GENERIC_HASHTAGS = {
+    '#viral', '#trending', '#fyp', '#foryou', '#foryoupage', '#explore', '#instagood', '#follow', '#like',
+    '#love', '#news', '#motivation', '#socialmedia', '#content', '#tech', '#innovation', '#business'
+}
+SENTENCE_END = re.compile(r'[.!?…]+["\'’”)\]]*(?:\s+|$)|\n+')
+CLAUSE_END = re.compile(r'[,;:—–]\s+|\s+[—–-]\s+')
+
+
+def _extends(char, previous):
+    cp = ord(char)
+    if previous.endswith(ZWJ):
+        return True
+    if char == ZWJ or 0xFE00 <= cp <= 0xFE0F or 0x1F3FB <= cp <= 0x1F3FF or 0xE0020 <= cp <= 0xE007F or cp == 0x20E3:
+        return True
+    if unicodedata.category(char) in ('Mn', 'Me', 'Mc'):
+        return True
+    # Two regional indicators make one flag
+    if 0x1F1E6 <= cp <= 0x1F1FF and len(previous) == 1 and 0x1F1E6 <= ord(previous) <= 0x1F1FF:
+        return True
+    return previous == '\r' and char == '\n'
+
+
+def graphemes(text):
+    """Split text into user-perceived characters (extended grapheme clusters, approximately)."""
+    clusters = []
+    for char in text:
+        if clusters and _extends(char, clusters[-1]):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+    return clusters
+
+
+def _is_emoji(cluster):
+    for char in cluster:
+        cp = ord(char)
+        if 0x1F000 <= cp <= 0x1FAFF or 0x2600 <= cp <= 0x27BF or 0x2B00 <= cp <= 0x2BFF or cp in (0xFE0F, 0x20E3):
+            return True
+    return False
+
+
+def twitter_length(text):
+    """Weighted length as Twitter counts it against the 280 limit."""
+    # twitter-text counts the NFC form, so 'e' plus a combining accent is one character
+    text = unicodedata.normalize('NFC', text)
+    length = 0
+    position = 0
+    for match in URL.finditer(text):
+        length += _twitter_weight(text[position:match.start()]) + TWITTER_URL_LENGTH
+        position = match.end()
+    return length + _twitter_weight(text[position:])
+
+
+def _twitter_weight(text):
+    weight = 0
+    for cluster in graphemes(text):
+        if _is_emoji(cluster):
+            weight += 2
+            continue
+        for char in cluster:
+            cp = ord(char)
+            weight += 1 if any(low <= cp <= high for low, high in TWITTER_LIGHT_RANGES) else 2
+    return weight
+
+
+def platform_length(text, platform):
+    """Length of text as the platform counts it: weighted for Twitter, grapheme clusters elsewhere."""
+    if platform == 'twitter':
+        return twitter_length(text)
+    if text.isascii():
+        return len(text)
+    return len(graphemes(text))
+
+
+def combined_length(content, hashtags, platform):
+    return platform_length((content + ' ' + hashtags).strip(), platform)
+
+
+@dataclass
+class Fit:
+    content: str
+    hashtags: str
+    length: int
+    ok: bool
+    steps: list = field(default_factory=list)
+
+
+def split_sentences(text):
+    """Sentences (and lines) of text, each keeping its trailing punctuation and whitespace."""
+    pieces = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if match.end() > start:
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return [piece for piece in pieces if piece.strip()]
+
+
+def fit_post(content, hashtags, platform, char_limit, min_hashtags=1):
+    """Shorten a post to char_limit without another completion.
+
+    Low-value hashtags go first (generic ones, then the last ones, keeping at
+    least half and min_hashtags), then whole sentences from the end (keeping
+    the @mentions), and as a last resort the final sentence is cut at a
+    clause boundary. ok is False when no coherent fit exists.
+    """
+    steps = []
+    length = combined_length(content, hashtags, platform)
+    if length <= char_limit:
+        return Fit(content, hashtags, length, True, steps)
+
+    tags = hashtags.split()
+    keep = max(min_hashtags, math.ceil(len(tags) / 2))
+    droppable = sorted(range(len(tags)), key=lambda i: (tags[i].lower() not in GENERIC_HASHTAGS, -i))
+    dropped = set()
+    for i in droppable:
+        if len(tags) - len(dropped) <= keep or combined_length(content, hashtags, platform) <= char_limit:
+            break
+        dropped.add(i)
+        hashtags = ' '.join(tag for j, tag in enumerate(tags) if j not in dropped)
+        steps.append('hashtags')
+    length = combined_length(content, hashtags, platform)
+    if length <= char_limit:
+        return Fit(content, hashtags, length, True, steps)
+
+    had_mentions = bool(MENTION.search(content))
+    room = char_limit - (platform_length(hashtags, platform) + 1 if hashtags else 0)
+    sentences = split_sentences(content)
+    while len(sentences) > 1 and platform_length(''.join(sentences).strip(), platform) > room:
+        # Drop the last sentence that doesn't carry a mention, or simply the last one
+        without_mentions = [i for i, sentence in enumerate(sentences) if not MENTION.search(sentence)]
+        remaining_mentions = sum(1 for sentence in sentences if MENTION.search(sentence))
+        index = without_mentions[-1] if without_mentions and remaining_mentions else len(sentences) - 1
+        del sentences[index]
+        steps.append('sentence')
+    fitted = ''.join(sentences).strip()
+    if platform_length(fitted, platform) > room:
+        fitted = _cut_clause(fitted, platform, room)
+        steps.append('clause')
+
+    length = combined_length(fitted, hashtags, platform)
+    coherent = (
+        fitted
+        and length <= char_limit
+        and platform_length(fitted, platform) >= LENGTH_FIT_MIN_SHARE * room
+        and (MENTION.search(fitted) or not had_mentions)
+    )
+    return Fit(fitted, hashtags, length, bool(coherent), steps)
+
+
+def _cut_clause(sentence, platform, room):
+    """Longest prefix ending at a clause boundary that fits, closed with a full stop."""
+    best = ''
+    for match in CLAUSE_END.finditer(sentence):
+        prefix = sentence[:match.start()].rstrip()
+        candidate = prefix if prefix.endswith(('.', '!', '?', '…')) else prefix + '.'
+        if platform_length(candidate, platform) > room:
+            break
+        best = candidate
+    return best
+
+
+def truncate_words(content, hashtags, platform, char_limit):
+    """Cut content at the last whole word that fits next to the hashtags, marked with an ellipsis.
+
+    Text with no word boundary early enough (a long URL, or CJK written
+    without spaces) is cut between characters instead. Returns None when no
+    content fits at all.
+    """
+    room = char_limit - (platform_length(hashtags, platform) + 1 if hashtags else 0)
+    words = content.split(' ')
+    while words and platform_length(' '.join(words) + '…', platform) > room:
+        words.pop()
+    kept = ' '.join(words).rstrip(' ,;:')
+    if not kept.strip():
+        kept = ''
+        for cluster in graphemes(content.strip()):
+            if platform_length(kept + cluster + '…', platform) > room:
+                break
+            kept += cluster
+    kept = kept.rstrip()
+    return kept + '…' if kept else None
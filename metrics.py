@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Upper bounds in seconds; covers both local spans and slow completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(round(total, 6))}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+span_seconds = registry.histogram(
+    'hootsuite_span_seconds', 'Time spent in each stage of generating and serving posts.', ('span',))
+azure_requests = registry.counter(
+    'hootsuite_azure_requests_total', 'Chat-completion HTTP responses by status code and deployment.', ('status', 'deployment'))
+azure_failures = registry.counter(
+    'hootsuite_azure_request_failures_total', 'Failed chat-completion requests by status code or exception, and deployment.',
+    ('status', 'deployment'))
+circuit_rejections = registry.counter(
+    'hootsuite_circuit_rejections_total', 'Chat-completion requests failed fast because the circuit breaker was open.')
+regenerations = registry.counter(
+    'hootsuite_regenerations_total', 'Follow-up completions requested because a post broke its limits.', ('platform',))
+local_fits = registry.counter(
+    'hootsuite_local_fits_total', 'Over-long posts trimmed locally, or sent on to regeneration when no fit existed.',
+    ('platform', 'outcome'))
+tokens_used = registry.counter(
+    'hootsuite_tokens_used_total', 'Tokens reported in completion usage.', ('kind',))
+duplicates = registry.counter(
+    'hootsuite_duplicates_total', 'Posts flagged as repeating another post of the series, by what repeated and what was done.',
+    ('kind', 'outcome'))
+prompt_template_tokens = registry.counter(
+    'hootsuite_prompt_template_tokens_total',
+    'Prompt tokens per system prompt (kind="prompt"), and those the provider served from its prompt cache (kind="cached").',
+    ('template', 'kind'))
+posts_generated = registry.counter(
+    'hootsuite_posts_generated_total', 'Finished posts by platform and status.', ('platform', 'status'))
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block into hootsuite_span_seconds{span=name}."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_seconds.observe(time.perf_counter() - start, span=name)
+
+
+def observe_usage(usage):
+    if not usage:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if usage.get(kind):
+            tokens_used.inc(usage[kind], kind=kind.split('_')[0])
+    cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    if cached:
+        tokens_used.inc(cached, kind='cached_prompt')
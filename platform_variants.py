@@ -0,0 +1,93 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Platforms a cross-posted campaign is generated for
+CROSS_POST_PLATFORMS = ('linkedin', 'facebook', 'instagram', 'twitter', 'tiktok')
+# Short platforms rewritten from the long-form draft of the same slot instead of
+# being generated from scratch; empty to generate every platform independently
+DERIVED_PLATFORMS = tuple(
+    platform.strip() for platform in os.getenv("DERIVED_PLATFORMS", "twitter,tiktok").split(',') if platform.strip()
+)
+# Longest a derived post waits for its draft before generating on its own
+DRAFT_WAIT_TIMEOUT = float(os.getenv("DRAFT_WAIT_TIMEOUT", "300"))
+
+
+def plan_platforms(platforms, char_limits):
+    """Split platforms into (source, direct, derived).
+
+    The source is the direct platform with the largest character limit; its
+    post is the draft the derived platforms are rewritten from. Without a
+    source every platform is generated directly.
+    """
+    direct = [platform for platform in platforms if platform not in DERIVED_PLATFORMS]
+    derived = [platform for platform in platforms if platform in DERIVED_PLATFORMS]
+    if not direct:
+        return None, list(platforms), []
+    source = max(direct, key=lambda platform: char_limits.get(platform, 0))
+    return source, direct, derived
+
+
+def multi_platform_tasks(slots, platforms, char_limits):
+    """One task (position, slot, platform) per slot and platform.
+
+    position is the post's place in the campaign grid (slot-major). Derived
+    tasks are listed after every direct task: executors start tasks in order,
+    so by the time a derived task waits for its draft, the task writing that
+    draft is already running and the pool cannot deadlock.
+    """
+    source, direct, derived = plan_platforms(platforms, char_limits)
+    column = {platform: i for i, platform in enumerate(platforms)}
+    tasks = [(slot * len(platforms) + column[platform], slot, platform)
+             for platform_group in (direct, derived) for slot in range(len(slots)) for platform in platform_group]
+    return source, tasks
+
+
+class DraftBoard:
+    """Hands the long-form draft of each slot to the posts derived from it."""
+
+    def __init__(self):
+        self._drafts = {}
+        self._ready = {}
+        self._lock = threading.Lock()
+
+    def _event(self, slot):
+        with self._lock:
+            return self._ready.setdefault(slot, threading.Event())
+
+    def put(self, slot, draft):
+        """Publish the slot's draft (content, hashtags), or None if it failed."""
+        self._drafts[slot] = draft
+        self._event(slot).set()
+
+    def get(self, slot, timeout=DRAFT_WAIT_TIMEOUT):
+        if not self._event(slot).wait(timeout):
+            return None
+        return self._drafts.get(slot)
+
+
+def derivation_prompt(draft, topic, platform, tone, char_limit):
+    content, hashtags = draft
+    if platform == 'twitter':
+        rules = "- Include 1 mention starting with '@' (keep one from the original if it fits)\n- Use only 2-3 of the most relevant hashtags"
+    else:
+        rules = "- Keep at most 1 mention starting with '@'\n- Use only 3-4 of the most relevant hashtags"
+    return f'''
+Rewrite the following post about "{topic}" for {platform} in a {tone} tone.
+
+Original post:
+{content}
+
+Original hashtags: {hashtags}
+
+Requirements:
+- Keep the single most interesting idea or fact; do not add new claims
+{rules}
+- The content plus hashtags must be no longer than {char_limit} characters in total
+- Use language and emojis that fit {platform}
+- Ensure a natural, complete ending - do not cut off mid-sentence
+
+After the content, add a line starting with 'Hashtags:' followed by the hashtags, with #, space-separated.
+'''
@@ -0,0 +1,240 @@
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from post_store import POST_STORE
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+POST_ARCHIVE_ENABLED = os.getenv("POST_ARCHIVE_ENABLED", "1") == "1"
+# 'sqlite' or 'memory'; follows POST_STORE unless set
+POST_ARCHIVE = os.getenv("POST_ARCHIVE", 'memory' if POST_STORE == 'memory' else 'sqlite')
+POST_ARCHIVE_PATH = os.getenv("POST_ARCHIVE_PATH", "post_archive.db")
+# Archived posts a search returns at most
+ARCHIVE_SEARCH_LIMIT = 50
+# Newest matches of a search that are ranked by relevance
+ARCHIVE_RANK_CANDIDATES = 1000
+# Posts written per transaction by the archive's writer thread
+ARCHIVE_WRITE_BATCH = 200
+
+ARCHIVE_FIELDS = ('topic', 'platform', 'tone', 'content', 'hashtags', 'prompt_tokens', 'completion_tokens', 'latency')
+WORD = re.compile(r'\w+')
+
+
+def search_terms(text):
+    """Lower-cased words of a search box entry; '#ai' and 'AI' both search for 'ai'."""
+    return WORD.findall((text or '').lower())
+
+
+class PostArchive:
+    """History of every generated post, kept after its campaign is gone.
+
+    Entries carry the topic, platform, tone, content and hashtags together
+    with the tokens and seconds the generation cost, so a later campaign can
+    reuse a post instead of paying for it again.
+    """
+
+    def add(self, **entry):
+        raise NotImplementedError
+
+    def search(self, text=None, platform=None, tone=None, limit=ARCHIVE_SEARCH_LIMIT):
+        """Archived posts containing every word of text, best match first.
+
+        Without text the newest posts are returned. platform and tone are
+        exact filters.
+        """
+        raise NotImplementedError
+
+    def get_many(self, ids):
+        """Archived posts by id, in the order of ids; unknown ids are skipped."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Wait until every added post is searchable."""
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class MemoryPostArchive(PostArchive):
+    """Process-local archive with a linear scan, meant for tests and development."""
+
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def add(self, **entry):
+        with self._lock:
+            self._entries.append(dict({field: entry.get(field) for field in ARCHIVE_FIELDS},
+                                      id=len(self._entries) + 1, created_at=time.time()))
+
+    def search(self, text=None, platform=None, tone=None, limit=ARCHIVE_SEARCH_LIMIT):
+        terms = search_terms(text)
+        with self._lock:
+            entries = list(self._entries)
+        matches = []
+        for entry in reversed(entries):
+            if (platform and entry['platform'] != platform) or (tone and entry['tone'] != tone):
+                continue
+            if terms:
+                words = set(search_terms(' '.join(entry[field] or '' for field in ('topic', 'content', 'hashtags'))))
+                if not all(term in words for term in terms):
+                    continue
+            matches.append(dict(entry))
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def get_many(self, ids):
+        with self._lock:
+            entries = list(self._entries)
+        return [dict(entries[i - 1]) for i in ids if 0 < i <= len(entries)]
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'posts': len(self._entries)}
+
+
+class SQLitePostArchive(PostArchive):
+    """Archive in one SQLite file with an FTS5 index over topic, content and hashtags.
+
+    Posts are handed to a writer thread and inserted in batches, so archiving
+    never holds up generation (including coroutines on the async loop).
+    Without FTS5 in the linked SQLite, search falls back to LIKE scans.
+    """
+
+    def __init__(self, path=POST_ARCHIVE_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS archived_posts ("
+                " id INTEGER PRIMARY KEY, created_at REAL NOT NULL, topic TEXT, platform TEXT, tone TEXT,"
+                " content TEXT NOT NULL, hashtags TEXT, prompt_tokens INTEGER, completion_tokens INTEGER, latency REAL);"
+                "CREATE INDEX IF NOT EXISTS archived_posts_platform ON archived_posts (platform, tone);"
+            )
+            try:
+                # External-content index: the text is stored once, in archived_posts
+                self._db.executescript(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS archived_posts_fts USING fts5("
+                    " topic, content, hashtags, content='archived_posts', content_rowid='id',"
+                    " tokenize='unicode61 remove_diacritics 2');"
+                    "CREATE TRIGGER IF NOT EXISTS archived_posts_insert AFTER INSERT ON archived_posts BEGIN"
+                    " INSERT INTO archived_posts_fts (rowid, topic, content, hashtags)"
+                    " VALUES (new.id, new.topic, new.content, new.hashtags); END;"
+                    "CREATE TRIGGER IF NOT EXISTS archived_posts_delete AFTER DELETE ON archived_posts BEGIN"
+                    " INSERT INTO archived_posts_fts (archived_posts_fts, rowid, topic, content, hashtags)"
+                    " VALUES ('delete', old.id, old.topic, old.content, old.hashtags); END;"
+                )
+                self.full_text = True
+            except sqlite3.OperationalError:
+                logger.warning("SQLite was built without FTS5; archive search falls back to LIKE scans")
+                self.full_text = False
+            self._db.commit()
+        self._writer = threading.Thread(target=self._write, name='post-archive', daemon=True)
+        self._writer.start()
+
+    def add(self, **entry):
+        self._pending.put((time.time(), *(entry.get(field) for field in ARCHIVE_FIELDS)))
+
+    def _write(self):
+        while True:
+            rows = [self._pending.get()]
+            while len(rows) < ARCHIVE_WRITE_BATCH:
+                try:
+                    rows.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._lock:
+                    self._db.executemany(
+                        f"INSERT INTO archived_posts (created_at, {', '.join(ARCHIVE_FIELDS)})"
+                        f" VALUES (?{', ?' * len(ARCHIVE_FIELDS)})",
+                        rows
+                    )
+                    self._db.commit()
+            except sqlite3.Error:
+                logger.exception("Could not archive %d generated posts", len(rows))
+            for _ in rows:
+                self._pending.task_done()
+
+    def flush(self):
+        self._pending.join()
+
+    def search(self, text=None, platform=None, tone=None, limit=ARCHIVE_SEARCH_LIMIT):
+        terms = search_terms(text)
+        conditions = []
+        params = []
+        if platform:
+            conditions.append("a.platform = ?")
+            params.append(platform)
+        if tone:
+            conditions.append("a.tone = ?")
+            params.append(tone)
+        if terms and self.full_text:
+            # Every word must match; quoting keeps FTS5 operators typed into
+            # the search box literal
+            match = ' '.join(f'"{term}"' for term in terms)
+            # Ranking every match of a common word costs time linear in the
+            # archive, so only the newest ARCHIVE_RANK_CANDIDATES matches,
+            # read in rowid order, are ranked
+            query = (
+                "SELECT * FROM (SELECT a.*, archived_posts_fts.rank AS score FROM archived_posts_fts"
+                " JOIN archived_posts a ON a.id = archived_posts_fts.rowid"
+                " WHERE archived_posts_fts MATCH ?" + ''.join(f" AND {condition}" for condition in conditions)
+                + " ORDER BY archived_posts_fts.rowid DESC LIMIT ?) ORDER BY score LIMIT ?"
+            )
+            params = [match, *params, ARCHIVE_RANK_CANDIDATES]
+        else:
+            for term in terms:
+                conditions.append("(a.topic || ' ' || a.content || ' ' || COALESCE(a.hashtags, '')) LIKE ?")
+                params.append(f'%{term}%')
+            query = ("SELECT a.* FROM archived_posts a"
+                     + (" WHERE " + " AND ".join(conditions) if conditions else '')
+                     + " ORDER BY a.id DESC LIMIT ?")
+        with self._lock:
+            rows = self._db.execute(query, (*params, limit)).fetchall()
+        return [{key: row[key] for key in row.keys() if key != 'score'} for row in rows]
+
+    def get_many(self, ids):
+        ids = list(ids)
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM archived_posts WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()
+        by_id = {row['id']: dict(row) for row in rows}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM archived_posts").fetchone()[0]
+        return {'backend': 'sqlite', 'full_text': self.full_text, 'posts': count, 'pending': self._pending.qsize()}
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Return the process-wide post archive selected by POST_ARCHIVE."""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                if POST_ARCHIVE == 'memory':
+                    _archive = MemoryPostArchive()
+                else:
+                    _archive = SQLitePostArchive(POST_ARCHIVE_PATH)
+    return _archive
@@ -0,0 +1,218 @@
+import threading
+from functools import lru_cache
+import metrics
+
+PLATFORM_CHAR_LIMITS = {
+    'instagram': 800,
+    'twitter': 280,
+    'linkedin': 1200,
+    'facebook': 1000,
+    'tiktok': 150,
+    'general': 800
+}
+# Tone values of the form; prompts for these are built at import
+TONES = ('professional', 'casual', 'educational', 'inspirational', 'humorous')
+
+# Providers cache the longest prompt prefix they have seen recently (from
+# about 1,024 tokens on), so every prompt starts with the instructions that
+# all platforms and tones share. The platform, tone and limit come after
+# them, and the topic comes last, in the user message.
+POST_INSTRUCTIONS = '''
+You are an expert content creator or copywriter. Generate an engaging article/post on the topic the user gives, for the audience, style and character limit given at the end of these instructions.
+
+Context:
+- Purpose: educate, inform, and engage
+
+Tone Guidelines:
+- Professional: Use formal language, industry insights, and authoritative tone. Include data, statistics, and expert opinions.
+- Casual & Friendly: Use conversational language, personal anecdotes, and relatable examples. Be warm and approachable.
+- Educational: Use clear explanations, step-by-step breakdowns, and teaching moments. Include "did you know" facts and learning points.
+- Inspirational: Use motivational language, success stories, and uplifting messages. Include quotes, achievements, and positive energy.
+- Humorous: Use wit, clever analogies, and light-hearted approach. Include puns, funny observations, and entertaining angles.
+
+Structure:
+- Start with a compelling hook that immediately explains what the topic is and why it matters to the reader.
+- Use a comprehensive, story-like narrative that thoroughly explores the topic with detailed explanations, real-world examples, and practical applications.
+- Organize the post into 2-3 engaging, descriptive sections or paragraphs for shorter platforms (Instagram, Facebook, General), or 3-4 sections for longer platforms (LinkedIn). Each section should deeply explore different aspects, provide detailed explanations, and include practical examples that help readers truly understand the topic.
+- Use tone-appropriate formatting: Professional (clean, structured), Casual (emojis, friendly), Educational (bullet points, examples), Inspirational (bold statements, quotes), Humorous (clever formatting, puns).
+- Include comprehensive examples: Professional (detailed industry cases), Casual (relatable personal stories), Educational (step-by-step learning moments), Inspirational (detailed success stories), Humorous (entertaining analogies with explanations).
+- Provide detailed explanations that break down complex concepts into simple, understandable parts.
+- End with a comprehensive summary that reinforces understanding and provides actionable insights.
+
+Tone & Style:
+- Use storytelling, relatable examples, and vivid language to make the topic enjoyable and easy to understand for all readers.
+- Use simple, clear language. Avoid overly AI‑sounding or polished phrases.
+- Maintain conversational flow, vary sentence length, sprinkle rhetorical questions or surprises for “burstiness” and engagement.
+
+Mentions:
+- You must mention at least 2 influential people (real or hypothetical, relevant to the topic and platform) in the post, and each mention must start with '@' (e.g., @sundarpichai, @tim_cook, @satyanadella, @larrypage, @sherylsandberg, @markzuckerberg, etc). More than 2 mentions are allowed if relevant.
+- Choose the most relevant influential people for the topic (e.g., Sundar Pichai, Tim Cook, Satya Nadella, Larry Page, Sheryl Sandberg, Mark Zuckerberg, etc).
+
+Hashtags:
+- All hashtags must be placed together at the end of the post, not within the content.
+- Hashtags must be highly relevant to the topic only (not the platform or generic tags).
+- You must include hashtags as instructed. Do not skip this step.
+
+Constraints:
+- Each section ≈ 80–120 words
+- Don’t use jargon unless you define it
+- Avoid vague statements; be specific
+- IMPORTANT: The entire post, including headings, content, and hashtags, must be no longer than the character limit. Do not exceed this limit. Finish your story or post naturally within this space. Do not cut off mid-sentence or mid-thought - ensure complete, coherent endings.
+
+Engagement Tips:
+- Professional: Use industry statistics, expert quotes, and authoritative language. Include detailed data-driven insights, comprehensive case studies, and professional achievements with thorough explanations.
+- Casual & Friendly: Use emojis, personal stories, and conversational language. Include relatable examples, detailed personal anecdotes, and warm interactions that help readers connect with the topic.
+- Educational: Use "did you know" facts, step-by-step explanations, and detailed learning moments. Include comprehensive examples, teaching points, and thorough breakdowns of complex concepts.
+- Inspirational: Use motivational quotes, success stories, and uplifting language. Include detailed achievement stories, comprehensive success examples, and positive energy that motivates learning.
+- Humorous: Use clever puns, witty observations, and entertaining angles. Include funny analogies with detailed explanations and light-hearted humor that makes learning enjoyable.
+- Provide comprehensive explanations that break down complex topics into simple, understandable parts
+- Include practical applications and real-world examples that help readers truly understand and apply the knowledge
+- Use detailed analogies and metaphors that make abstract concepts concrete and relatable
+
+After the content, add a line starting with 'Hashtags:' followed by hashtags that are highly relevant to the topic only, with #, space-separated. For Twitter, use only 2-3 hashtags. For other platforms, use up to 10 hashtags. Do not repeat hashtags from previous posts in the series.
+'''
+
+POST_TARGET = '''
+Target audience: {platform}
+Style: {tone}
+Character limit: {char_limit} characters for the entire post, including headings, content, and hashtags.
+'''
+
+TWEET_INSTRUCTIONS = '''
+You are an expert Twitter content creator. Generate a concise, engaging tweet about the topic the user gives.
+
+Requirements:
+- Maximum 240 characters for content (leaving 40 for hashtags and mentions)
+- Include 1 mention starting with '@' (e.g., @sundarpichai, @tim_cook, @satyanadella)
+- Use only 2-3 relevant hashtags at the end
+- Make it viral-worthy and shareable
+- Use trending language and emojis where appropriate
+- Include surprising facts or statistics
+- Create FOMO (fear of missing out) or curiosity
+- Use power words and emotional triggers
+- Ensure the tweet has a natural, complete ending - do not cut off mid-sentence
+
+Format: Content with mention + hashtags
+Example: "🚀 AI is changing healthcare FOREVER! @sundarpichai just revealed Google's AI can diagnose diseases 10x faster than doctors. This is INSANE! The future is NOW! 🔥 #AI #Healthcare #Tech"
+
+Generate the tweet within the 280 character limit.
+'''
+
+SHORTER_INSTRUCTIONS = '''
+You are an expert content creator. Generate a concise, engaging post on the topic the user gives, for the platform, tone and character limit given at the end of these instructions.
+
+Requirements:
+- Include at least 2 mentions starting with '@'
+- Add relevant hashtags at the end
+- For Twitter: use only 3-4 hashtags
+- For other platforms: use up to 10 hashtags
+- Make it engaging and complete within the limit
+- Match the tone: Professional (authoritative), Casual (friendly), Educational (instructive), Inspirational (uplifting), Humorous (entertaining)
+- Use tone-appropriate language and examples
+- Include tone-specific engagement elements
+- Provide comprehensive explanations that help readers truly understand the topic
+- Include detailed examples and practical applications
+- Break down complex concepts into simple, digestible parts
+- Make complex topics simple and accessible
+- Do not exceed the character limit under any circumstances
+- Ensure natural, complete endings - do not cut off mid-sentence or mid-thought
+
+Generate the content and hashtags within this strict limit.
+'''
+
+SHORTER_TARGET = '''
+Platform: {platform}
+Tone: {tone}
+Maximum {char_limit} characters total (including hashtags)
+'''
+
+SHORTER_TWEET_INSTRUCTIONS = '''
+You are an expert Twitter content creator. Generate a concise tweet about the topic the user gives.
+
+Requirements:
+- Maximum 240 characters for content
+- Include 1 mention starting with '@'
+- Use only 2-3 relevant hashtags
+- Make it viral-worthy and shareable
+- Use trending language and emojis where appropriate
+- Include surprising facts or statistics
+- Create FOMO or curiosity
+- Use power words and emotional triggers
+- Do not exceed 280 characters total
+- Ensure natural, complete endings - do not cut off mid-sentence
+
+Generate a tweet within the strict limit.
+'''
+
+
+def template_name(template, platform):
+    """Name of the system prompt a request uses: 'post' or 'regeneration', for tweets 'tweet' or 'tweet_regeneration'."""
+    if platform == 'twitter':
+        return 'tweet' if template == 'post' else 'tweet_regeneration'
+    return template
+
+
+@lru_cache(maxsize=256)
+def system_prompt(template, platform, tone):
+    """System message of a 'post' or 'regeneration' request; formatted once per (platform, tone)."""
+    if platform == 'twitter':
+        return TWEET_INSTRUCTIONS if template == 'post' else SHORTER_TWEET_INSTRUCTIONS
+    char_limit = PLATFORM_CHAR_LIMITS.get(platform, PLATFORM_CHAR_LIMITS['general'])
+    if template == 'post':
+        return POST_INSTRUCTIONS + POST_TARGET.format(platform=platform, tone=tone, char_limit=char_limit)
+    return SHORTER_INSTRUCTIONS + SHORTER_TARGET.format(platform=platform, tone=tone, char_limit=char_limit)
+
+
+def post_messages(template, topic, platform, tone, avoid_hashtags=(), avoid_text=None):
+    """Chat messages for one post: the shared system prompt, then a short user message with the topic."""
+    user = f'Write the tweet about "{topic}".\n' if platform == 'twitter' else f'Write the post on "{topic}".\n'
+    if avoid_text:
+        # Sent when an earlier attempt came out too close to another post in the series
+        user += f"\nWrite about a different angle than this earlier post in the series, and do not reuse its wording:\n{avoid_text}\n"
+    if avoid_hashtags:
+        user += f"\nDo not use any of these hashtags, which other posts in the series already use: {' '.join(avoid_hashtags)}\n"
+    return [
+        {"role": "system", "content": system_prompt(template, platform, tone)},
+        {"role": "user", "content": user}
+    ]
+
+
+class PromptCacheStats:
+    """Prompt tokens per system prompt, and how many the provider served from its prompt cache."""
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def observe(self, template, usage):
+        if not usage:
+            return
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        with self._lock:
+            counters = self._templates.setdefault(template, {'requests': 0, 'prompt_tokens': 0, 'cached_tokens': 0})
+            counters['requests'] += 1
+            counters['prompt_tokens'] += prompt_tokens
+            counters['cached_tokens'] += cached_tokens
+        metrics.prompt_template_tokens.inc(prompt_tokens, template=template, kind='prompt')
+        if cached_tokens:
+            metrics.prompt_template_tokens.inc(cached_tokens, template=template, kind='cached')
+
+    def stats(self):
+        with self._lock:
+            return {template: dict(counters, cached_share=round(counters['cached_tokens'] / counters['prompt_tokens'], 3)
+                                   if counters['prompt_tokens'] else 0.0)
+                    for template, counters in self._templates.items()}
+
+
+prompt_cache = PromptCacheStats()
+
+def warm_prompts():
+    """Format the system prompt of every known platform and tone up front, so requests only look them up."""
+    for platform in PLATFORM_CHAR_LIMITS:
+        for tone in TONES:
+            for template in ('post', 'regeneration'):
+                system_prompt(template, platform, tone)
+
+
+warm_prompts()
@@ -0,0 +1,395 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 'sqlite' (default) or 'memory'
+POST_STORE = os.getenv("POST_STORE", "sqlite")
+POST_STORE_PATH = os.getenv("POST_STORE_PATH", "posts.db")
+# Campaigns older than this many days are deleted; 0 keeps them forever
+POST_STORE_RETENTION_DAYS = float(os.getenv("POST_STORE_RETENTION_DAYS", "0"))
+# Expired campaigns are looked for at most this often
+PRUNE_INTERVAL = 3600
+# Error of posts whose generation job was lost with the process that ran it
+INTERRUPTED_ERROR = "Not generated: the server restarted"
+
+# platform is only set on posts of multi-platform campaigns
+POST_FIELDS = ('date', 'time', 'content', 'hashtags', 'status', 'error', 'platform')
+CAMPAIGN_FIELDS = ('topic', 'platform', 'tone')
+# Rows read per query when iterating over many posts
+EXPORT_PAGE_SIZE = 500
+
+
+class CampaignStore:
+    """Server-side storage for generated campaigns.
+
+    A campaign is an ordered list of post dicts addressed by (campaign_id, index),
+    so a single post can be read or written without touching the others.
+    Campaigns older than retention seconds (0 for never) are deleted as new
+    ones are created.
+    """
+
+    retention = 0
+    _next_prune = 0.0
+
+    def create_campaign(self, posts=(), **meta):
+        raise NotImplementedError
+
+    def campaign_exists(self, campaign_id):
+        raise NotImplementedError
+
+    def get_campaign(self, campaign_id):
+        raise NotImplementedError
+
+    def get_posts(self, campaign_id):
+        raise NotImplementedError
+
+    def get_post(self, campaign_id, index):
+        raise NotImplementedError
+
+    def put_post(self, campaign_id, index, post):
+        raise NotImplementedError
+
+    def update_post(self, campaign_id, index, fields):
+        return self.patch_post(campaign_id, index, fields)[1] == 'ok'
+
+    def patch_post(self, campaign_id, index, fields, version=None):
+        """Update some fields of one post and bump its version.
+
+        With version given the update only happens while the post is still at
+        that version (optimistic locking). Returns (post, outcome) where
+        outcome is 'ok', 'conflict' or 'missing' and post is the stored post
+        after the call (None when missing).
+        """
+        raise NotImplementedError
+
+    def fail_pending_posts(self, error, created_before):
+        """Mark the pending posts of campaigns created before a timestamp as failed.
+
+        Jobs only live in the process that runs them, so after a restart
+        nothing will ever finish those posts. Returns the number of posts.
+        """
+        raise NotImplementedError
+
+    def prune_campaigns(self, created_before):
+        """Delete the campaigns created before a timestamp with their posts; returns how many."""
+        raise NotImplementedError
+
+    def _prune_expired(self):
+        now = time.time()
+        if self.retention <= 0 or now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL
+        self.prune_campaigns(now - self.retention)
+
+    def iter_posts(self, campaign_ids=None, platform=None, date_from=None, date_to=None, skip_unfinished=False):
+        """Yield posts across campaigns in creation order, one page at a time.
+
+        Every filter is optional: campaign_ids limits the campaigns, platform
+        matches the campaign's platform and date_from/date_to are inclusive
+        'YYYY-MM-DD' bounds on the post date. skip_unfinished drops pending or
+        failed posts that have no content. Each post dict also carries
+        campaign_id, index, topic and platform.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+
+class MemoryCampaignStore(CampaignStore):
+    """Process-local store, meant for tests and single-process development."""
+
+    def __init__(self, retention=POST_STORE_RETENTION_DAYS * 86400):
+        self.retention = retention
+        self._campaigns = {}
+        self._posts = {}
+        self._lock = threading.Lock()
+
+    def create_campaign(self, posts=(), **meta):
+        self._prune_expired()
+        campaign_id = self.new_id()
+        with self._lock:
+            self._campaigns[campaign_id] = dict(
+                {field: meta.get(field) for field in CAMPAIGN_FIELDS},
+                id=campaign_id, created_at=time.time()
+            )
+            self._posts[campaign_id] = {i: _normalize(post) for i, post in enumerate(posts)}
+        return campaign_id
+
+    def campaign_exists(self, campaign_id):
+        return campaign_id in self._campaigns
+
+    def get_campaign(self, campaign_id):
+        campaign = self._campaigns.get(campaign_id)
+        return dict(campaign) if campaign else None
+
+    def get_posts(self, campaign_id):
+        with self._lock:
+            posts = self._posts.get(campaign_id, {})
+            return [dict(posts[i]) for i in sorted(posts)]
+
+    def get_post(self, campaign_id, index):
+        post = self._posts.get(campaign_id, {}).get(index)
+        return dict(post) if post else None
+
+    def put_post(self, campaign_id, index, post):
+        with self._lock:
+            self._posts.setdefault(campaign_id, {})[index] = _normalize(post)
+
+    def patch_post(self, campaign_id, index, fields, version=None):
+        fields = {k: v for k, v in fields.items() if k in POST_FIELDS}
+        with self._lock:
+            post = self._posts.get(campaign_id, {}).get(index)
+            if post is None:
+                return None, 'missing'
+            if version is not None and post['version'] != version:
+                return dict(post), 'conflict'
+            if fields:
+                post.update(fields)
+                post['version'] += 1
+            return dict(post), 'ok'
+
+    def fail_pending_posts(self, error, created_before):
+        failed = 0
+        with self._lock:
+            for campaign_id, campaign in self._campaigns.items():
+                if campaign['created_at'] >= created_before:
+                    continue
+                for post in self._posts.get(campaign_id, {}).values():
+                    if post['status'] == 'pending':
+                        post.update(status='failed', error=error)
+                        post['version'] += 1
+                        failed += 1
+        return failed
+
+    def prune_campaigns(self, created_before):
+        with self._lock:
+            expired = [campaign_id for campaign_id, campaign in self._campaigns.items()
+                       if campaign['created_at'] < created_before]
+            for campaign_id in expired:
+                del self._campaigns[campaign_id]
+                self._posts.pop(campaign_id, None)
+        return len(expired)
+
+    def iter_posts(self, campaign_ids=None, platform=None, date_from=None, date_to=None, skip_unfinished=False):
+        with self._lock:
+            campaigns = sorted(self._campaigns.values(), key=lambda campaign: (campaign['created_at'], campaign['id']))
+        for campaign in campaigns:
+            if campaign_ids is not None and campaign['id'] not in campaign_ids:
+                continue
+            for i, post in enumerate(self.get_posts(campaign['id'])):
+                post_platform = post['platform'] or campaign['platform']
+                if platform and post_platform != platform:
+                    continue
+                if not _matches(post, date_from, date_to, skip_unfinished):
+                    continue
+                yield dict(post, campaign_id=campaign['id'], index=i, topic=campaign['topic'], platform=post_platform)
+
+
+class SQLiteCampaignStore(CampaignStore):
+    """Store backed by one SQLite file; posts are rows keyed by (campaign_id, idx)."""
+
+    def __init__(self, path=POST_STORE_PATH, retention=POST_STORE_RETENTION_DAYS * 86400):
+        self.retention = retention
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS campaigns ("
+                " id TEXT PRIMARY KEY, topic TEXT, platform TEXT, tone TEXT, created_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS posts ("
+                " campaign_id TEXT NOT NULL, idx INTEGER NOT NULL,"
+                " date TEXT, time TEXT, content TEXT, hashtags TEXT, status TEXT, error TEXT, platform TEXT,"
+                " version INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (campaign_id, idx));"
+            )
+            # Columns added after the first release; older databases get them here
+            columns = {row['name'] for row in self._db.execute("PRAGMA table_info(posts)")}
+            for column, definition in (('platform', 'TEXT'), ('version', 'INTEGER NOT NULL DEFAULT 0')):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE posts ADD COLUMN {column} {definition}")
+            self._db.commit()
+
+    def create_campaign(self, posts=(), **meta):
+        self._prune_expired()
+        campaign_id = self.new_id()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO campaigns (id, topic, platform, tone, created_at) VALUES (?, ?, ?, ?, ?)",
+                (campaign_id, *(meta.get(field) for field in CAMPAIGN_FIELDS), time.time())
+            )
+            self._db.executemany(
+                "INSERT INTO posts (campaign_id, idx, date, time, content, hashtags, status, error, platform)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(campaign_id, i, *_row(post)) for i, post in enumerate(posts)]
+            )
+            self._db.commit()
+        return campaign_id
+
+    def campaign_exists(self, campaign_id):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM campaigns WHERE id = ?", (campaign_id,)).fetchone() is not None
+
+    def get_campaign(self, campaign_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_posts(self, campaign_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM posts WHERE campaign_id = ? ORDER BY idx", (campaign_id,)
+            ).fetchall()
+        return [_from_row(row) for row in rows]
+
+    def get_post(self, campaign_id, index):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM posts WHERE campaign_id = ? AND idx = ?", (campaign_id, index)
+            ).fetchone()
+        return _from_row(row) if row else None
+
+    def put_post(self, campaign_id, index, post):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO posts (campaign_id, idx, date, time, content, hashtags, status, error, platform)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (campaign_id, index, *_row(post))
+            )
+            self._db.commit()
+
+    def patch_post(self, campaign_id, index, fields, version=None):
+        fields = {k: v for k, v in fields.items() if k in POST_FIELDS}
+        updated = 0
+        with self._lock:
+            if fields:
+                query = (f"UPDATE posts SET {''.join(f'{field} = ?, ' for field in fields)}version = version + 1"
+                         " WHERE campaign_id = ? AND idx = ?")
+                params = [*fields.values(), campaign_id, index]
+                if version is not None:
+                    query += " AND version = ?"
+                    params.append(version)
+                updated = self._db.execute(query, params).rowcount
+                self._db.commit()
+            row = self._db.execute(
+                "SELECT * FROM posts WHERE campaign_id = ? AND idx = ?", (campaign_id, index)
+            ).fetchone()
+        if row is None:
+            return None, 'missing'
+        post = _from_row(row)
+        if (fields and not updated) or (not fields and version is not None and post['version'] != version):
+            return post, 'conflict'
+        return post, 'ok'
+
+    def fail_pending_posts(self, error, created_before):
+        with self._lock:
+            failed = self._db.execute(
+                "UPDATE posts SET status = 'failed', error = ?, version = version + 1"
+                " WHERE status = 'pending' AND campaign_id IN (SELECT id FROM campaigns WHERE created_at < ?)",
+                (error, created_before)
+            ).rowcount
+            self._db.commit()
+        return failed
+
+    def prune_campaigns(self, created_before):
+        with self._lock:
+            expired = "SELECT id FROM campaigns WHERE created_at < ?"
+            self._db.execute(f"DELETE FROM posts WHERE campaign_id IN ({expired})", (created_before,))
+            pruned = self._db.execute(f"DELETE FROM campaigns WHERE id IN ({expired})", (created_before,)).rowcount
+            self._db.commit()
+        return pruned
+
+    def iter_posts(self, campaign_ids=None, platform=None, date_from=None, date_to=None, skip_unfinished=False):
+        conditions = []
+        params = []
+        if campaign_ids is not None:
+            campaign_ids = list(campaign_ids)
+            if not campaign_ids:
+                return
+            conditions.append(f"p.campaign_id IN ({', '.join('?' * len(campaign_ids))})")
+            params.extend(campaign_ids)
+        if platform:
+            conditions.append("COALESCE(p.platform, c.platform) = ?")
+            params.append(platform)
+        if date_from:
+            conditions.append("p.date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("p.date <= ?")
+            params.append(date_to)
+        if skip_unfinished:
+            conditions.append("NOT (COALESCE(p.status, '') IN ('pending', 'failed') AND COALESCE(p.content, '') = '')")
+        query = (
+            "SELECT p.*, COALESCE(p.platform, c.platform) AS post_platform, c.topic, c.created_at FROM posts p JOIN campaigns c ON c.id = p.campaign_id"
+            " WHERE (c.created_at, p.campaign_id, p.idx) > (?, ?, ?)"
+            + ''.join(f" AND {condition}" for condition in conditions)
+            + " ORDER BY c.created_at, p.campaign_id, p.idx LIMIT ?"
+        )
+        # Keyset pagination: the lock is only held while a page is read, so a
+        # long export doesn't block generation jobs writing their posts
+        cursor_key = (-1.0, '', -1)
+        while True:
+            with self._lock:
+                rows = self._db.execute(query, (*cursor_key, *params, EXPORT_PAGE_SIZE)).fetchall()
+            for row in rows:
+                yield dict(_from_row(row), campaign_id=row['campaign_id'], index=row['idx'],
+                           topic=row['topic'], platform=row['post_platform'])
+            if len(rows) < EXPORT_PAGE_SIZE:
+                return
+            last = rows[-1]
+            cursor_key = (last['created_at'], last['campaign_id'], last['idx'])
+
+
+def _matches(post, date_from, date_to, skip_unfinished):
+    date = post.get('date') or ''
+    if date_from and date < date_from:
+        return False
+    if date_to and date > date_to:
+        return False
+    if skip_unfinished and post.get('status') in ('pending', 'failed') and not post.get('content'):
+        return False
+    return True
+
+
+def _normalize(post):
+    return dict({field: post.get(field) for field in POST_FIELDS}, version=post.get('version') or 0)
+
+
+def _row(post):
+    return tuple(post.get(field) for field in POST_FIELDS)
+
+
+def _from_row(row):
+    return dict({field: row[field] for field in POST_FIELDS}, version=row['version'])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide campaign store selected by POST_STORE.
+
+    Posts a previous process left pending are failed when the store is
+    opened, since their jobs went away with it.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if POST_STORE == 'memory':
+                    store = MemoryCampaignStore()
+                else:
+                    store = SQLiteCampaignStore(POST_STORE_PATH)
+                store.fail_pending_posts(INTERRUPTED_ERROR, created_before=time.time())
+                store._prune_expired()
+                _store = store
+    return _store
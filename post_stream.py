@@ -0,0 +1,56 @@
+import json
+import re
+from response_parser import HASHTAG_LINE
+
+# A trailing run of hashtags (possibly still being typed) at the end of the text
+TRAILING_HASHTAGS = re.compile(r'(?:\s*#\w*)+\s*$')
+MARKER_WORD = 'hashtags:'
+
+
+class IncrementalPostParser:
+    """Split a streamed completion into displayable content as text arrives.
+
+    feed() returns the part of the content that is safe to show: text after a
+    'Hashtags:' line is never released, and a trailing line that could still
+    turn into that line or into a run of hashtags is held back until more text
+    arrives. The final content/hashtags split is done on the complete text.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._released = 0
+        self._marker = None
+
+    def feed(self, delta):
+        self.text += delta
+        if self._marker is None:
+            match = HASHTAG_LINE.search(self.text, max(0, self.text.rfind('\n', 0, self._released)))
+            if match:
+                self._marker = match.start()
+        end = self._marker if self._marker is not None else self._safe_end()
+        if end <= self._released:
+            return ''
+        released = self.text[self._released:end]
+        self._released = end
+        return released.replace('*', '')
+
+    def _safe_end(self):
+        text = self.text
+        line_start = text.rfind('\n') + 1
+        last_line = text[line_start:].lstrip(' \t*_').lower()
+        if last_line and MARKER_WORD.startswith(last_line[:len(MARKER_WORD)]):
+            return line_start
+        match = TRAILING_HASHTAGS.search(text, line_start)
+        if match:
+            return match.start()
+        return len(text)
+
+
+def format_sse(event, data, event_id=None):
+    """Encode one Server-Sent Events message with a JSON payload."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Deployment quota; 0 leaves that dimension unlimited
+AZURE_OPENAI_RPM = float(os.getenv("AZURE_OPENAI_RPM", "0"))
+AZURE_OPENAI_TPM = float(os.getenv("AZURE_OPENAI_TPM", "0"))
+RATE_LIMIT_MIN_CONCURRENCY = int(os.getenv("RATE_LIMIT_MIN_CONCURRENCY", "1"))
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "10"))
+# How many times a request waits out a 429 Retry-After before giving up
+RATE_LIMIT_MAX_WAITS = int(os.getenv("RATE_LIMIT_MAX_WAITS", "3"))
+# Used when a 429 comes back without a Retry-After header
+DEFAULT_RETRY_AFTER = 2.0
+# Stop growing concurrency when less than this share of a quota window is left
+LOW_REMAINING_SHARE = 0.1
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate units per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (0 when it can be taken now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+    def cap(self, remaining):
+        # The server's view of the window wins when it is lower than ours
+        self.level = min(self.level, remaining)
+
+
+class RatePermit:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+
+class AdaptiveRateLimiter:
+    """Shared client-side limiter for one deployment.
+
+    Token buckets keep requests and estimated tokens within the configured
+    RPM/TPM, 429 Retry-After pauses every caller, and the number of
+    concurrent requests adapts AIMD-style: +1 per window of successes,
+    halved on every throttle.
+    """
+
+    def __init__(self, rpm=AZURE_OPENAI_RPM, tpm=AZURE_OPENAI_TPM,
+                 min_concurrency=RATE_LIMIT_MIN_CONCURRENCY, max_concurrency=RATE_LIMIT_MAX_CONCURRENCY):
+        # Azure enforces quotas over short windows, so allow a burst of about 10 seconds
+        self.requests = TokenBucket(rpm / 60.0, max(1.0, rpm / 6.0)) if rpm else None
+        self.tokens = TokenBucket(tpm / 60.0, max(1.0, tpm / 6.0)) if tpm else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.last_retry_after = None
+        self._allow_increase = True
+        self._cond = threading.Condition()
+
+    def acquire(self, estimated_tokens=0, timeout=None):
+        """Block until a request may be sent; returns a permit for release()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._try_acquire(estimated_tokens, now)
+                if wait <= 0:
+                    break
+                if deadline is not None:
+                    if now >= deadline:
+                        raise TimeoutError("Timed out waiting for the rate limiter")
+                    wait = min(wait, deadline - now)
+                # Woken early by release(); waits are re-evaluated on every loop
+                self._cond.wait(wait)
+        return RatePermit(estimated_tokens)
+
+    async def acquire_async(self, estimated_tokens=0, timeout=None):
+        """acquire() for coroutines: sleeps on the event loop instead of blocking a thread."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            with self._cond:
+                wait = self._try_acquire(estimated_tokens, now)
+            if wait <= 0:
+                return RatePermit(estimated_tokens)
+            if deadline is not None:
+                if now >= deadline:
+                    raise TimeoutError("Timed out waiting for the rate limiter")
+                wait = min(wait, deadline - now)
+            await asyncio.sleep(wait)
+
+    def _try_acquire(self, estimated_tokens, now):
+        """Take a slot and return 0, or return how long to wait before trying again."""
+        wait = self.paused_until - now
+        if self.in_flight >= int(self.limit):
+            wait = max(wait, 0.05)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(estimated_tokens, now))
+        if wait > 0:
+            return wait
+        self.in_flight += 1
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(estimated_tokens)
+        return 0
+
+    def release(self, permit, status_code=None, headers=None, used_tokens=None):
+        """Return a permit and adapt to the response status and rate-limit headers."""
+        headers = headers or {}
+        with self._cond:
+            self.in_flight -= 1
+            if self.tokens is not None and used_tokens is not None and used_tokens < permit.tokens:
+                self.tokens.give(permit.tokens - used_tokens)
+            self._read_remaining(headers)
+            if status_code == 429:
+                retry_after = retry_after_seconds(headers)
+                self.throttled += 1
+                self.last_retry_after = retry_after
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+            elif status_code is not None and status_code < 400 and self._allow_increase:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _read_remaining(self, headers):
+        self._allow_increase = True
+        for name, bucket in (('x-ratelimit-remaining-requests', self.requests),
+                             ('x-ratelimit-remaining-tokens', self.tokens)):
+            value = headers.get(name)
+            if value is None:
+                continue
+            try:
+                remaining = float(value)
+            except ValueError:
+                continue
+            if bucket is not None:
+                bucket.cap(remaining)
+                if remaining < bucket.capacity * LOW_REMAINING_SHARE:
+                    self._allow_increase = False
+            elif remaining <= 1:
+                self._allow_increase = False
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                'concurrency_limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'throttled': self.throttled,
+                'last_retry_after': self.last_retry_after,
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 2)
+            }
+            if self.requests is not None:
+                stats['request_bucket'] = round(self.requests.level, 1)
+            if self.tokens is not None:
+                stats['token_bucket'] = round(self.tokens.level, 1)
+            return stats
+
+
+def retry_after_seconds(headers):
+    """Seconds to wait according to retry-after-ms / Retry-After headers."""
+    for name, scale in (('retry-after-ms', 0.001), ('Retry-After', 1.0), ('retry-after', 1.0)):
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                pass
+    return DEFAULT_RETRY_AFTER
+
+
+def estimate_tokens(body):
+    """Rough prompt + completion tokens Azure counts against the TPM quota."""
+    prompt_chars = sum(len(message.get("content") or '') for message in body.get("messages", []))
+    return int(prompt_chars / 4) + body.get("max_tokens", 0) * body.get("n", 1)
@@ -0,0 +1,126 @@
+import re
+from dataclasses import dataclass, field
+
+# A 'Hashtags:' label at the start of a line, tolerating markdown bold ("**Hashtags:**")
+HASHTAG_LABEL = re.compile(r'[ \t*_]*hashtags[ \t*_]*:[ \t*_]*', re.IGNORECASE)
+# Where a 'Hashtags:' line starts inside a (possibly partial) text
+HASHTAG_LINE = re.compile(r'(?:^|\n)[ \t*_]*hashtags[ \t*_]*:', re.IGNORECASE)
+HASHTAG = re.compile(r'#\w+')
+HASHTAG_TOKEN = re.compile(r'#\w+$')
+# A hashtag as a model writes it in a JSON list, with or without the '#'
+HASHTAG_WORD = re.compile(r'#?(\w+)')
+MENTION = re.compile(r'@\w+')
+# Characters allowed on a label line / its continuation, as the original parser accepted
+LABEL_VALUE = re.compile(r'[#\w\s-]*')
+
+
+@dataclass
+class ParsedPost:
+    content: str
+    hashtag_text: str
+    hashtags: list = field(default_factory=list)
+    mentions: list = field(default_factory=list)
+
+    @property
+    def combined(self):
+        return (self.content + ' ' + self.hashtag_text).strip()
+
+    @property
+    def content_chars(self):
+        return len(self.content)
+
+    @property
+    def hashtag_chars(self):
+        return len(self.hashtag_text)
+
+    @property
+    def total_chars(self):
+        return len(self.combined)
+
+
+def parse_response(text, platform='general'):
+    """Split a completion into post content and hashtags.
+
+    In priority order the hashtags come from a 'Hashtags:' line, from a
+    trailing run of hashtags (Twitter, where they share the tweet's line), or
+    from lines that are mostly hashtags. Markdown '*' is removed from the content.
+    """
+    text = text.strip()
+    content, hashtag_text = _split_label(text)
+    if hashtag_text is None:
+        if platform == 'twitter':
+            content, hashtag_text = _split_trailing(text)
+        else:
+            content, hashtag_text = _split_hashtag_lines(text)
+    content = content.replace('*', '')
+    return ParsedPost(
+        content=content,
+        hashtag_text=hashtag_text,
+        hashtags=HASHTAG.findall(hashtag_text),
+        mentions=MENTION.findall(content)
+    )
+
+
+def split_content_hashtags(text, platform='general'):
+    """(content, hashtags) tuple form of parse_response, as the app stores posts."""
+    parsed = parse_response(text, platform)
+    return parsed.content, parsed.hashtag_text
+
+
+def _split_label(text):
+    # One pass over the lines: everything on a 'Hashtags:' line (and on
+    # following lines that only continue the list) is hashtags, the rest content
+    if not HASHTAG_LINE.search(text):
+        return text, None
+    content_lines = []
+    hashtag_parts = []
+    in_label = False
+    for line in text.split('\n'):
+        match = HASHTAG_LABEL.match(line)
+        if match:
+            value = line[match.end():]
+            valid = LABEL_VALUE.match(value).end()
+            hashtag_parts.append(value[:valid])
+            if value[valid:].strip():
+                content_lines.append(value[valid:])
+            in_label = True
+        elif in_label and line.strip() and LABEL_VALUE.fullmatch(line) and '#' in line:
+            hashtag_parts.append(line)
+        else:
+            in_label = False
+            content_lines.append(line)
+    if not hashtag_parts:
+        return text, None
+    return '\n'.join(content_lines).strip(), ' '.join(' '.join(hashtag_parts).split())
+
+
+def _split_trailing(text):
+    # Walk back over whitespace-separated tokens while they are hashtags; like
+    # the original pattern the run must be preceded by whitespace
+    start = len(text)
+    while True:
+        token_end = start
+        while token_end > 0 and text[token_end - 1].isspace():
+            token_end -= 1
+        token_start = token_end
+        while token_start > 0 and not text[token_start - 1].isspace():
+            token_start -= 1
+        if token_start == 0 or token_start == token_end or not HASHTAG_TOKEN.match(text, token_start, token_end):
+            break
+        start = token_start
+    if start == len(text):
+        return text, ''
+    return text[:start].strip(), text[start:].strip()
+
+
+def _split_hashtag_lines(text):
+    content_lines = []
+    hashtags = ''
+    for line in text.split('\n'):
+        # Only lines with at least two '#' can be hashtag lines; skip the word count otherwise
+        hashtag_count = line.count('#')
+        if hashtag_count >= 2 and hashtag_count >= len(line.split()) * 0.5:
+            hashtags = line.strip()
+        else:
+            content_lines.append(line)
+    return '\n'.join(content_lines).strip(), hashtags
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+# Fire a duplicate request when one takes longer than this latency quantile
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0") == "1"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+# Successful calls observed before hedging starts, so the quantile means something
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "20"))
+
+# Failures worth another attempt: the request never produced an answer, or
+# the service had a transient problem. 429 is handled by the rate limiter and
+# other 4xx answers would fail the same way again.
+RETRYABLE_STATUS = {408, 500, 502, 503, 504}
+RETRYABLE_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+LATENCY_WINDOW = 500
+TELEMETRY_WINDOW = 200
+
+
+def percentile(values, quantile):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class RetryPolicy:
+    """Retries transient failures with exponential backoff and full jitter,
+    optionally hedging slow requests, and keeps per-attempt telemetry."""
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 hedging=HEDGE_ENABLED, hedge_quantile=HEDGE_QUANTILE, hedge_min_samples=HEDGE_MIN_SAMPLES):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge') if hedging else None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._attempts = deque(maxlen=TELEMETRY_WINDOW)
+        self._counters = {'calls': 0, 'attempts': 0, 'retries': 0, 'failed_calls': 0, 'hedges_fired': 0, 'hedges_won': 0}
+        self._failures = {}
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number 'attempt' (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _delay(self, attempt, time_left):
+        # A backoff never outlasts the caller's budget; once that is spent,
+        # time_left raises (e.g. DeadlineExceeded) rather than sleeping at all
+        delay = self.backoff(attempt)
+        if time_left is not None:
+            delay = min(delay, max(0.0, time_left()))
+        return delay
+
+    def hedge_threshold(self):
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return percentile(self._latencies, self.hedge_quantile)
+
+    def execute(self, fn, hedge=True, time_left=None):
+        """Call fn() -> response until it succeeds or stops being retryable.
+
+        time_left, when given, is called before each backoff and caps it to
+        the seconds the caller has left.
+        """
+        call_start = time.monotonic()
+        response = None
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.monotonic()
+            try:
+                response, hedged = self._call(fn, hedge and self.hedging)
+            except RETRYABLE_EXCEPTIONS as e:
+                last_error = e
+                response = None
+                self._record(attempt, start, None, e.__class__.__name__, False)
+            else:
+                status = response.status_code
+                self._record(attempt, start, status, None, hedged)
+                if status not in RETRYABLE_STATUS:
+                    self._finish(call_start, ok=status < 400)
+                    return response
+            if attempt < self.max_attempts:
+                with self._lock:
+                    self._counters['retries'] += 1
+                time.sleep(self._delay(attempt, time_left))
+        self._finish(call_start, ok=False)
+        if response is not None:
+            return response
+        raise last_error
+
+    async def execute_async(self, fn, retryable_exceptions=RETRYABLE_EXCEPTIONS, time_left=None):
+        """execute() for a coroutine fn(); backoffs sleep on the event loop and nothing is hedged."""
+        call_start = time.monotonic()
+        response = None
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.monotonic()
+            try:
+                response = await fn()
+            except retryable_exceptions as e:
+                last_error = e
+                response = None
+                self._record(attempt, start, None, e.__class__.__name__, False)
+            else:
+                status = response.status_code
+                self._record(attempt, start, status, None, False)
+                if status not in RETRYABLE_STATUS:
+                    self._finish(call_start, ok=status < 400)
+                    return response
+            if attempt < self.max_attempts:
+                with self._lock:
+                    self._counters['retries'] += 1
+                await asyncio.sleep(self._delay(attempt, time_left))
+        self._finish(call_start, ok=False)
+        if response is not None:
+            return response
+        raise last_error
+
+    def _call(self, fn, hedge):
+        threshold = self.hedge_threshold() if hedge else None
+        if threshold is None:
+            return fn(), False
+        primary = self._executor.submit(fn)
+        try:
+            return primary.result(timeout=threshold), False
+        except FutureTimeout:
+            pass
+        with self._lock:
+            self._counters['hedges_fired'] += 1
+        backup = self._executor.submit(fn)
+        pending = {primary, backup}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        with self._lock:
+                            self._counters['hedges_won'] += 1
+                    # The slower request keeps running; its answer is dropped
+                    return future.result(), future is backup
+                first_error = first_error or future.exception()
+        raise first_error
+
+    def _record(self, attempt, start, status, error, hedged):
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._counters['attempts'] += 1
+            outcome = error or str(status)
+            if error or status in RETRYABLE_STATUS:
+                self._failures[outcome] = self._failures.get(outcome, 0) + 1
+            self._attempts.append({
+                'attempt': attempt,
+                'status': status,
+                'error': error,
+                'hedged': hedged,
+                'seconds': round(elapsed, 4),
+                'at': time.time()
+            })
+
+    def _finish(self, call_start, ok):
+        elapsed = time.monotonic() - call_start
+        with self._lock:
+            self._counters['calls'] += 1
+            if ok:
+                self._latencies.append(elapsed)
+            else:
+                self._counters['failed_calls'] += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            return dict(
+                self._counters,
+                failures=dict(self._failures),
+                latency_p50=percentile(latencies, 0.50),
+                latency_p95=percentile(latencies, 0.95),
+                latency_p99=percentile(latencies, 0.99),
+                recent_attempts=list(self._attempts)[-20:]
+            )
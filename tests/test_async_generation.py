@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from async_client import AsyncAzureOpenAIClient  # noqa: E402
+from azure_client import AzureOpenAIClient  # noqa: E402
+from deployment_pool import Deployment, DeploymentPool  # noqa: E402
+from generation_engine import generate_posts_async  # noqa: E402
+from llm_cache import CompletionCache, cache_key  # noqa: E402
+
+BODY = {"messages": [{"role": "user", "content": 'Write the post on "AI".'}]}
+BLOCKING_SECONDS = 0.2
+
+
+async def ticks_during(coroutine):
+    """Run coroutine and count how often another coroutine got the loop meanwhile."""
+    ticks = 0
+    done = asyncio.Event()
+
+    async def tick():
+        nonlocal ticks
+        while not done.is_set():
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.ensure_future(tick())
+    try:
+        result = await coroutine
+    finally:
+        done.set()
+        await ticker
+    return result, ticks
+
+
+class SlowCache(CompletionCache):
+    # Stands in for a cache whose SQLite file is slow to read
+    def get(self, key):
+        time.sleep(BLOCKING_SECONDS)
+        return super().get(key)
+
+
+def test_slow_saves_do_not_block_the_loop():
+    saved = []
+
+    async def generate(task):
+        return f'post {task}', '#tag'
+
+    def save(position, result):
+        time.sleep(BLOCKING_SECONDS)
+        saved.append(position)
+
+    results, ticks = asyncio.run(ticks_during(generate_posts_async([1, 2], generate, on_result=save)))
+    assert sorted(saved) == [0, 1]
+    assert [result['status'] for result in results] == ['ok', 'ok']
+    assert ticks >= 10
+
+
+def test_cache_reads_do_not_block_the_loop():
+    cache = SlowCache(path=None)
+    deployment = Deployment('mock', 'http://127.0.0.1:9', 'mock', '2024-02-01', 'test')
+    client = AzureOpenAIClient(DeploymentPool([deployment]), cache=cache)
+    cache.set(cache_key(client.deployment, BODY, 1), {"choices": [{"message": {"content": "cached"}}]})
+
+    async def cached_completion():
+        async_client = AsyncAzureOpenAIClient(client)
+        try:
+            return await async_client.chat_completion(BODY, cache_variant=1)
+        finally:
+            await async_client.http.aclose()
+
+    response, ticks = asyncio.run(ticks_during(cached_completion()))
+    assert response.from_cache
+    assert ticks >= 5
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import azure_client  # noqa: E402
+from azure_client import AzureOpenAIClient, AzureOpenAIError  # noqa: E402
+from deployment_pool import Deployment, DeploymentPool  # noqa: E402
+from mock_azure_server import MockSettings, start_server  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+BODY = {"messages": [{"role": "user", "content": 'Write the post on "AI".'}]}
+
+
+def tracked_client(url, retry_policy=None):
+    deployment = Deployment('mock', url, 'mock', '2024-02-01', 'test')
+    client = AzureOpenAIClient(DeploymentPool([deployment]), retry_policy=retry_policy)
+    responses = []
+    post = client.session.post
+
+    def tracking_post(*args, **kwargs):
+        response = post(*args, **kwargs)
+        closed = {'closed': False}
+        close = response.close
+
+        def tracking_close():
+            closed['closed'] = True
+            close()
+
+        response.close = tracking_close
+        responses.append((response, closed))
+        return response
+
+    client.session.post = tracking_post
+    return client, responses
+
+
+@pytest.fixture
+def failing_server():
+    server, url = start_server(MockSettings(latency_median=0.01, latency_sigma=0.01, rate_5xx=1.0, seed=1))
+    yield url
+    server.shutdown()
+
+
+@pytest.mark.parametrize('retry_policy', [None, RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)],
+                         ids=['no retries', 'retries'])
+def test_failed_streams_close_their_responses(failing_server, retry_policy):
+    client, responses = tracked_client(failing_server, retry_policy)
+    with pytest.raises(AzureOpenAIError):
+        list(client.stream_chat_completion(BODY, use_cache=False))
+    assert len(responses) == (3 if retry_policy else 1)
+    assert all(closed['closed'] for _, closed in responses)
+
+
+@pytest.fixture
+def server():
+    server, url = start_server(MockSettings(latency_median=0.01, latency_sigma=0.01, stream_chunk_delay=0, seed=1))
+    yield url
+    server.shutdown()
+
+
+@pytest.mark.parametrize('max_tokens, finish_reason', [(8, 'length'), (2000, 'stop')])
+def test_stream_reports_its_finish_reason(server, max_tokens, finish_reason):
+    client, _ = tracked_client(server)
+    outcome = {}
+    text = ''.join(client.stream_chat_completion(dict(BODY, max_tokens=max_tokens), use_cache=False, outcome=outcome))
+    assert outcome['finish_reason'] == finish_reason
+    assert text and (len(text) <= max_tokens * 4)
+
+
+def test_streamed_usage_reaches_the_token_counters(server, monkeypatch):
+    monkeypatch.setattr(azure_client, 'AZURE_OPENAI_STREAM_USAGE', True)
+    observed = []
+    monkeypatch.setattr(azure_client.metrics, 'observe_usage', observed.append)
+    client, _ = tracked_client(server)
+    outcome = {}
+    list(client.stream_chat_completion(BODY, use_cache=False, outcome=outcome))
+    assert outcome['usage']['completion_tokens'] > 0
+    assert observed == [outcome['usage']]
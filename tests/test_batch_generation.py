@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch_generation import parse_batch_response, run_batch, validate_post  # noqa: E402
+from generation_engine import GenerationError  # noqa: E402
+
+
+def post(n, tags=None):
+    return {'content': f'Post number {n} with @sam in it.', 'hashtags': tags or [f'#Tag{n}', f'#Other{n}']}
+
+
+def answers(*batches):
+    """request_fn that answers with the given batches in turn and records its calls."""
+    calls = []
+
+    def request(count, used, attempt):
+        calls.append((count, list(used), attempt))
+        batch = batches[len(calls) - 1]
+        if isinstance(batch, Exception):
+            raise batch
+        return batch if isinstance(batch, str) else json.dumps({'posts': batch})
+
+    return request, calls
+
+
+def test_full_batch_needs_one_completion():
+    request, calls = answers([post(1), post(2), post(3)])
+    results = run_batch(request, 3, 200)
+    assert [content for content, _ in results] == [f'Post number {n} with @sam in it.' for n in (1, 2, 3)]
+    assert calls == [(3, [], 0)]
+
+
+def test_invalid_and_missing_items_are_repaired():
+    request, calls = answers([post(1), {'content': ''}], [post(2), post(3)])
+    results = run_batch(request, 3, 200)
+    assert [content for content, _ in results] == [f'Post number {n} with @sam in it.' for n in (1, 2, 3)]
+    # Only the two failed positions are asked for again, avoiding the hashtags already used
+    assert calls[1] == (2, ['#Other1', '#Tag1'], 1)
+
+
+def test_items_still_failing_after_the_repairs_are_errors():
+    request, calls = answers('not json', [post(1)], GenerationError('API Error: Status 500'))
+    results = run_batch(request, 2, 200, max_repairs=2)
+    assert results[0][0] == 'Post number 1 with @sam in it.'
+    assert isinstance(results[1], GenerationError)
+    assert len(calls) == 3
+
+
+def test_fenced_answer_is_parsed():
+    assert parse_batch_response('```json\n{"posts": [{"content": "x"}]}\n```') == [{'content': 'x'}]
+
+
+def test_validate_post_normalises_hashtags():
+    assert validate_post({'content': '**Bold** post', 'hashtags': 'AI #Data'}, 100) == ('Bold post', '#AI #Data')
+    with pytest.raises(ValueError):
+        validate_post({'content': 'x' * 300, 'hashtags': []}, 100)
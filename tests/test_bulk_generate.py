@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('POST_STORE', 'memory')
+os.environ.setdefault('POST_ARCHIVE', 'memory')
+
+import bulk_generate  # noqa: E402
+from bulk_generate import expand_rows, read_rows  # noqa: E402
+
+ROW = {'topic': 'AI', 'platform': 'linkedin', 'tone': 'casual', 'date': '2025-03-01', 'time': '09:00'}
+
+
+def test_identical_rows_get_their_own_keys():
+    tasks = expand_rows([ROW, dict(ROW)])
+    assert len({task[0] for task in tasks}) == 2
+
+
+def test_series_expands_by_interval():
+    tasks = expand_rows([dict(ROW, count='3', interval='2')])
+    assert [(task[4], task[6]) for task in tasks] == [('2025-03-01', 1), ('2025-03-03', 2), ('2025-03-05', 3)]
+
+
+@pytest.mark.parametrize('row, message', [
+    (dict(ROW, platform='myspace'), "unknown platform 'myspace'"),
+    (dict(ROW, count='many'), 'invalid literal'),
+    (dict(ROW, count='-1'), 'at least 1'),
+    (dict(ROW, date='01/03/2025'), 'does not match format'),
+    (dict(ROW, topic=' '), 'topic is required'),
+    (['AI', 'linkedin'], 'expected an object'),
+])
+def test_bad_rows_are_reported_with_their_number(row, message):
+    with pytest.raises(ValueError, match=f"^Row 2: .*{message}"):
+        expand_rows([ROW, row])
+
+
+def test_bad_jsonl_line_is_reported_with_its_number(tmp_path):
+    path = tmp_path / 'plan.jsonl'
+    path.write_text('{"topic": "AI"}\n\n{"topic": \n', encoding='utf-8')
+    with pytest.raises(ValueError, match='^Row 2: '):
+        read_rows(str(path))
+
+
+def test_bad_plan_is_a_usage_error(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'plan.csv'
+    path.write_text('topic,platform,date\nAI,linkedin,2025-03-01\nAI,myspace,2025-03-01\n', encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['bulk_generate.py', str(path), '--output', str(tmp_path / 'posts.csv')])
+    with pytest.raises(SystemExit) as exit_info:
+        bulk_generate.main()
+    assert exit_info.value.code == 2
+    assert "Row 2: unknown platform 'myspace'" in capsys.readouterr().err
+    assert not (tmp_path / 'posts.csv').exists()
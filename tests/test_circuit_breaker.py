@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from azure_client import AzureOpenAIClient  # noqa: E402
+from circuit_breaker import CircuitBreaker  # noqa: E402
+from deployment_pool import Deployment, DeploymentPool  # noqa: E402
+from mock_azure_server import MockSettings, start_server  # noqa: E402
+
+BODY = {"messages": [{"role": "user", "content": 'Write the post on "AI".'}]}
+
+
+def open_breaker():
+    # Opens on the first failure and lets a probe through right away
+    breaker = CircuitBreaker(min_requests=1, open_seconds=0)
+    breaker.record(False)
+    assert breaker.state == 'open'
+    return breaker
+
+
+def client_for(url, breaker, rpm=0):
+    deployment = Deployment('mock', url, 'mock', '2024-02-01', 'test', rpm=rpm)
+    return AzureOpenAIClient(DeploymentPool([deployment]), breaker=breaker)
+
+
+@pytest.fixture
+def slow_server():
+    server, url = start_server(MockSettings(latency_median=1.0, latency_sigma=0.01, seed=1))
+    yield url
+    server.shutdown()
+
+
+def test_released_probe_lets_the_next_probe_through():
+    breaker = open_breaker()
+    assert breaker.allow() == 'probe'
+    assert breaker.allow() is None
+    breaker.release_probe()
+    assert breaker.allow() == 'probe'
+
+
+def test_probe_cut_short_by_deadline_releases_probe(slow_server):
+    breaker = open_breaker()
+    client = client_for(slow_server, breaker)
+    with pytest.raises(requests.Timeout):
+        client.chat_completion(BODY, timeout=0.2, use_cache=False)
+    # A timeout the caller shortened is no verdict on the endpoint
+    assert breaker.state == 'half_open'
+    assert breaker.allow() == 'probe'
+
+
+def test_probe_timing_out_in_the_limiter_releases_probe(slow_server):
+    breaker = CircuitBreaker(min_requests=1, open_seconds=0)
+    client = client_for(slow_server, breaker, rpm=1)
+    client.chat_completion(BODY, use_cache=False)
+    breaker.record(False)
+    with pytest.raises(TimeoutError):
+        client.chat_completion(BODY, timeout=0.1, use_cache=False)
+    assert breaker.allow() == 'probe'
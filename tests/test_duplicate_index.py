@@ -0,0 +1,59 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from duplicate_index import SeriesIndex, minhash, shingles, similarity  # noqa: E402
+
+QUANTUM = ("Quantum computers use qubits that can be zero and one at once, which lets them try many answers "
+           "in parallel for hard problems.")
+REWORDED = ("Quantum computers use qubits that can be zero and one at once, which lets them try many answers "
+            "together for hard problems.")
+PASTA = "Cooking pasta well starts with salting the water generously and tasting it before you drain the noodles."
+
+
+def test_similarity_estimates_shingle_overlap():
+    assert similarity(minhash(shingles(QUANTUM)), minhash(shingles(QUANTUM))) == 1.0
+    assert 0.5 < similarity(minhash(shingles(QUANTUM)), minhash(shingles(REWORDED))) < 0.95
+    assert similarity(minhash(shingles(QUANTUM)), minhash(shingles(PASTA))) < 0.2
+
+
+def test_near_duplicate_is_flagged_above_the_threshold():
+    index = SeriesIndex(threshold=0.5)
+    assert not index.check_and_add(0, QUANTUM, '').flagged
+    finding = index.check_and_add(1, REWORDED, '')
+    assert finding.duplicate_of == 0 and finding.similarity >= 0.5
+    assert not index.check_and_add(2, PASTA, '').flagged
+
+
+def test_stricter_threshold_lets_rewording_through():
+    index = SeriesIndex(threshold=0.95)
+    index.add(0, QUANTUM, '')
+    assert index.check(1, REWORDED, '').duplicate_of is None
+
+
+def test_hashtags_need_two_repeats_and_the_share():
+    index = SeriesIndex(hashtag_share=0.5)
+    index.add(0, QUANTUM, '#Q #AI')
+    assert index.check(1, PASTA, '#q #ai #Food').repeated_hashtags == ['#ai', '#q']
+    # One repeat is never enough, and two of six is under half
+    assert not index.check(1, PASTA, '#Q #Food').flagged
+    assert not index.check(1, PASTA, '#Q #AI #A #B #C #D').flagged
+
+
+def test_a_post_is_not_compared_with_itself():
+    index = SeriesIndex()
+    index.add(0, QUANTUM, '#Q #AI')
+    assert not index.check(0, QUANTUM, '#Q #AI').flagged
+    # Re-adding a position replaces it instead of counting its hashtags twice
+    index.add(0, PASTA, '#Food')
+    assert index.used_hashtags() == ['#food']
+    assert len(index) == 1
+
+
+def test_flagged_post_can_stay_out_of_the_index():
+    index = SeriesIndex()
+    index.add(0, QUANTUM, '')
+    assert index.check_and_add(1, REWORDED, '', add_flagged=False).flagged
+    assert len(index) == 1
@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from length_fitter import (combined_length, fit_post, graphemes, platform_length, truncate_words,  # noqa: E402
+                           twitter_length)
+
+
+@pytest.mark.parametrize('text, length', [
+    ('hello', 5),
+    ('see https://example.com/a/very/long/path?x=1 now', 4 + 23 + 4),
+    ('👍', 2),
+    ('👩‍👩‍👧', 2),
+    ('🇺🇸', 2),
+    ('量子', 4),
+    ('e\u0301', 1),
+    ('cafe\u0301', 4),
+])
+def test_twitter_weighting(text, length):
+    assert twitter_length(text) == length
+
+
+def test_graphemes_keep_clusters_together():
+    assert graphemes('e\u0301👩‍👩‍👧🇺🇸👍🏽a') == ['e\u0301', '👩‍👩‍👧', '🇺🇸', '👍🏽', 'a']
+
+
+def test_other_platforms_count_graphemes():
+    assert platform_length('e\u0301x', 'linkedin') == 2
+    assert platform_length('👍🏽 ok', 'instagram') == 4
+    assert combined_length('Post', '#a #b', 'linkedin') == len('Post #a #b')
+
+
+def test_generic_then_last_hashtags_are_dropped_first():
+    fit = fit_post('A short post by @sam.', '#AI #viral #Data #fyp #Quantum #Cloud', 'twitter', 40, min_hashtags=1)
+    assert fit.ok
+    assert fit.hashtags == '#AI #Data #Quantum'
+    assert fit.steps == ['hashtags'] * 3
+
+
+def test_at_least_half_the_hashtags_are_kept():
+    fit = fit_post('Words ' * 10 + 'by @sam.', '#One #Two #Three #Four', 'linkedin', 60, min_hashtags=1)
+    assert len(fit.hashtags.split()) == 2
+
+
+def test_sentences_without_mentions_are_dropped_first():
+    content = 'Filler sentence first. Then the one with @sam in it. More filler at the end here.'
+    fit = fit_post(content, '#a', 'linkedin', 50)
+    assert fit.ok
+    assert fit.content == 'Then the one with @sam in it.'
+
+
+def test_fit_that_keeps_too_little_is_not_ok():
+    fit = fit_post('One single very long sentence without any clause boundary at all ' * 3, '#a', 'linkedin', 30)
+    assert not fit.ok
+
+
+def test_truncate_words_cuts_at_a_word():
+    content = truncate_words('hello big world ' * 30, '#a', 'twitter', 280)
+    assert content.endswith('…') and content[:-1].split()[-1] in ('hello', 'big', 'world')
+    assert twitter_length(content + ' #a') <= 280
+
+
+@pytest.mark.parametrize('content', ['x' * 400, '量子计算' * 100, '👍' * 300])
+def test_truncate_words_without_boundaries_cuts_graphemes(content):
+    cut = truncate_words(content, '#a', 'twitter', 280)
+    assert cut and cut.endswith('…')
+    assert 270 <= twitter_length(cut + ' #a') <= 280
+
+
+def test_truncate_words_returns_none_when_nothing_fits():
+    assert truncate_words('abc', '#a' * 200, 'twitter', 280) is None
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import llm_cache  # noqa: E402
+from llm_cache import CompletionCache, cache_key  # noqa: E402
+
+BODY = {"messages": [{"role": "user", "content": "Write the post."}], "temperature": 0.9, "max_tokens": 400}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_key_covers_body_deployment_and_variant():
+    key = cache_key('gpt', BODY, 1)
+    assert key == cache_key('gpt', dict(reversed(list(BODY.items()))), 1)
+    assert key != cache_key('gpt', dict(BODY, max_tokens=401), 1)
+    assert key != cache_key('other', BODY, 1)
+    assert key != cache_key('gpt', BODY, 2)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CompletionCache(max_entries=2, path=None)
+    cache.set('a', {'n': 1})
+    cache.set('b', {'n': 2})
+    assert cache.get('a') == {'n': 1}
+    cache.set('c', {'n': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1} and cache.get('c') == {'n': 3}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = CompletionCache(ttl=60, path=None)
+    cache.set('a', {'n': 1})
+    clock[0] += 59
+    assert cache.get('a') == {'n': 1}
+    clock[0] += 2
+    assert cache.get('a') is None
+    assert cache.stats()['memory_entries'] == 0
+
+
+def test_disk_tier_survives_a_restart_and_expires(tmp_path, clock):
+    path = str(tmp_path / 'cache.db')
+    CompletionCache(ttl=60, path=path).set('a', {'n': 1})
+    cache = CompletionCache(ttl=60, path=path)
+    assert cache.get('a') == {'n': 1}
+    assert cache.stats()['disk_hits'] == 1
+    clock[0] += 61
+    assert CompletionCache(ttl=60, path=path).get('a') is None
+
+
+def test_disk_tier_keeps_the_most_recently_used(tmp_path, clock):
+    cache = CompletionCache(max_entries=1, path=str(tmp_path / 'cache.db'), disk_max_entries=2)
+    cache.set('a', {'n': 1})
+    clock[0] += 1
+    cache.set('b', {'n': 2})
+    clock[0] += 1
+    assert cache.get('a') == {'n': 1}
+    clock[0] += 1
+    cache.set('c', {'n': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1}
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('POST_STORE', 'memory')
+os.environ.setdefault('POST_ARCHIVE', 'memory')
+
+import api_html  # noqa: E402
+from post_store import MemoryCampaignStore, SQLiteCampaignStore  # noqa: E402
+
+POSTS = [
+    {'date': '2025-01-01', 'time': '09:00', 'content': 'First post', 'hashtags': '#one', 'status': 'ok'},
+    {'date': '2025-01-02', 'time': '09:00', 'content': 'Second post', 'hashtags': '#two', 'status': 'ok'},
+]
+
+
+@pytest.fixture
+def campaign(monkeypatch):
+    store = MemoryCampaignStore()
+    monkeypatch.setattr(api_html, 'get_store', lambda: store)
+    campaign_id = store.create_campaign(POSTS, topic='AI', platform='linkedin', tone='casual')
+    client = api_html.app.test_client()
+    with client.session_transaction() as session:
+        session['campaign_id'] = campaign_id
+    return client, store, campaign_id
+
+
+def test_patch_bumps_the_version(campaign):
+    client, store, campaign_id = campaign
+    version = store.get_post(campaign_id, 0)['version']
+    response = client.patch(f'/campaigns/{campaign_id}/posts/0', json={'content': 'Edited', 'version': version})
+    assert response.status_code == 200
+    assert response.json['version'] == version + 1
+    assert response.headers['ETag'] == f'"{version + 1}"'
+    assert store.get_post(campaign_id, 0)['content'] == 'Edited'
+    assert store.get_post(campaign_id, 1)['content'] == 'Second post'
+
+
+def test_stale_version_is_a_conflict(campaign):
+    client, store, campaign_id = campaign
+    version = store.get_post(campaign_id, 0)['version']
+    assert client.patch(f'/campaigns/{campaign_id}/posts/0', json={'content': 'Mine', 'version': version}).status_code == 200
+    response = client.patch(f'/campaigns/{campaign_id}/posts/0', json={'content': 'Theirs', 'version': version})
+    assert response.status_code == 409
+    assert response.json['post']['content'] == 'Mine'
+    assert store.get_post(campaign_id, 0)['content'] == 'Mine'
+
+
+def test_stale_if_match_is_a_conflict(campaign):
+    client, store, campaign_id = campaign
+    version = store.get_post(campaign_id, 0)['version']
+    response = client.patch(f'/campaigns/{campaign_id}/posts/0', json={'time': '10:30'},
+                            headers={'If-Match': f'"{version}"'})
+    assert response.status_code == 200
+    response = client.patch(f'/campaigns/{campaign_id}/posts/0', json={'time': '11:00'},
+                            headers={'If-Match': f'"{version}"'})
+    assert response.status_code == 409
+    assert store.get_post(campaign_id, 0)['time'] == '10:30'
+
+
+def test_unknown_post_and_campaign(campaign):
+    client, _, campaign_id = campaign
+    assert client.patch(f'/campaigns/{campaign_id}/posts/9', json={'content': 'x'}).status_code == 404
+    assert client.patch('/campaigns/someone-else/posts/0', json={'content': 'x'}).status_code == 404
+
+
+@pytest.mark.parametrize('body', [
+    {'date': '01/02/2025'},
+    {'time': '9am'},
+    {'status': 'ok'},
+    {'content': 5},
+    {'content': 'x', 'version': 'latest'},
+    {},
+])
+def test_invalid_edits_are_rejected(campaign, body):
+    client, store, campaign_id = campaign
+    before = store.get_post(campaign_id, 0)
+    assert client.patch(f'/campaigns/{campaign_id}/posts/0', json=body).status_code == 400
+    assert store.get_post(campaign_id, 0) == before
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_store_versions(backend, tmp_path):
+    store = MemoryCampaignStore() if backend == 'memory' else SQLiteCampaignStore(str(tmp_path / 'posts.db'))
+    campaign_id = store.create_campaign(POSTS, topic='AI', platform='linkedin', tone='casual')
+    version = store.get_post(campaign_id, 0)['version']
+    post, outcome = store.patch_post(campaign_id, 0, {'content': 'Edited'}, version=version)
+    assert outcome == 'ok' and post['version'] == version + 1
+    post, outcome = store.patch_post(campaign_id, 0, {'content': 'Late'}, version=version)
+    assert outcome == 'conflict' and post['content'] == 'Edited'
+    assert store.patch_post(campaign_id, 5, {'content': 'x'}) == (None, 'missing')
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('POST_STORE', 'memory')
+os.environ.setdefault('POST_ARCHIVE', 'memory')
+
+import api_html  # noqa: E402
+from azure_client import CachedResponse  # noqa: E402
+from candidate_selection import select_candidate  # noqa: E402
+from generation_engine import GenerationError, run_steps  # noqa: E402
+from response_parser import split_content_hashtags  # noqa: E402
+
+COMPLETE = "Quantum computers are coming, says @sundarpichai, and @satyanadella agrees.\n\nHashtags: #Quantum #Tech"
+CUT_OFF = "Quantum computers are coming, says @sundarpichai, and @satyanadella"
+
+
+class Answer(CachedResponse):
+    from_cache = False
+
+
+def answer(*choices):
+    return Answer({"choices": [{"index": i, "finish_reason": finish_reason,
+                                "message": {"role": "assistant", "content": text}}
+                               for i, (text, finish_reason) in enumerate(choices)]})
+
+
+class Configured:
+    def is_configured(self):
+        return True
+
+
+@pytest.fixture
+def generate(monkeypatch):
+    monkeypatch.setattr(api_html, 'get_client', Configured)
+    monkeypatch.setattr(api_html, 'POST_ARCHIVE_ENABLED', False)
+
+    def generate(*answers):
+        requests = []
+
+        def send(request):
+            requests.append(dict(request.body))
+            return answers[len(requests) - 1]
+
+        steps = api_html.post_steps('Quantum computing', 'linkedin', 'casual', 1, '')
+        return run_steps(steps, send), requests
+
+    return generate
+
+
+def test_complete_answer_is_kept(generate):
+    (content, hashtags), requests = generate(answer((COMPLETE, 'stop')))
+    assert hashtags == '#Quantum #Tech'
+    assert len(requests) == 1
+
+
+def test_cut_off_answer_is_regenerated_with_more_room(generate):
+    (content, hashtags), requests = generate(answer((CUT_OFF, 'length')), answer((COMPLETE, 'stop')))
+    assert hashtags == '#Quantum #Tech'
+    assert len(requests) == 2
+    assert requests[1]['max_tokens'] == 2 * requests[0]['max_tokens']
+
+
+def test_answer_cut_off_twice_fails(generate):
+    with pytest.raises(GenerationError, match='cut off'):
+        generate(answer((CUT_OFF, 'length')), answer((CUT_OFF, 'length')))
+
+
+def test_cut_off_candidate_loses_to_a_complete_one():
+    selection = select_candidate([COMPLETE, COMPLETE], lambda text: split_content_hashtags(text, 'linkedin'),
+                                 'linkedin', 1200, stats=None, cut_off={0})
+    assert selection.index == 1
+    assert selection.passed
+    selection = select_candidate([COMPLETE], lambda text: split_content_hashtags(text, 'linkedin'),
+                                 'linkedin', 1200, stats=None, cut_off={0})
+    assert not selection.passed and 'truncated' in selection.reasons
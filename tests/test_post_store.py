@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import post_store  # noqa: E402
+from post_store import INTERRUPTED_ERROR, MemoryCampaignStore, SQLiteCampaignStore  # noqa: E402
+
+POSTS = [
+    {'date': '2025-01-01', 'time': '09:00', 'content': 'Done', 'hashtags': '#one', 'status': 'ok'},
+    {'date': '2025-01-02', 'time': '09:00', 'content': '', 'hashtags': '', 'status': 'pending'},
+]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def open_store(request, tmp_path):
+    def open_store(retention=0):
+        if request.param == 'memory':
+            return MemoryCampaignStore(retention=retention)
+        return SQLiteCampaignStore(str(tmp_path / 'posts.db'), retention=retention)
+    return open_store
+
+
+def test_pending_posts_of_older_campaigns_fail(open_store):
+    store = open_store()
+    interrupted = store.create_campaign(POSTS, topic='AI', platform='linkedin', tone='casual')
+    time.sleep(0.01)
+    started = time.time()
+    time.sleep(0.01)
+    running = store.create_campaign(POSTS, topic='AI', platform='linkedin', tone='casual')
+    assert store.fail_pending_posts(INTERRUPTED_ERROR, created_before=started) == 1
+    done, failed = store.get_posts(interrupted)
+    assert done['status'] == 'ok' and done['content'] == 'Done'
+    assert failed['status'] == 'failed' and failed['error'] == INTERRUPTED_ERROR
+    assert failed['version'] == 1
+    assert store.get_post(running, 1)['status'] == 'pending'
+
+
+def test_reopened_store_fails_what_the_last_process_left_pending(tmp_path, monkeypatch):
+    path = str(tmp_path / 'posts.db')
+    campaign_id = SQLiteCampaignStore(path).create_campaign(POSTS, topic='AI', platform='linkedin', tone='casual')
+    monkeypatch.setattr(post_store, 'POST_STORE', 'sqlite')
+    monkeypatch.setattr(post_store, 'POST_STORE_PATH', path)
+    monkeypatch.setattr(post_store, '_store', None)
+    post = post_store.get_store().get_post(campaign_id, 1)
+    assert post['status'] == 'failed' and post['error'] == INTERRUPTED_ERROR
+
+
+def test_prune_removes_only_older_campaigns(open_store):
+    store = open_store()
+    old = store.create_campaign(POSTS, topic='Old', platform='linkedin', tone='casual')
+    time.sleep(0.01)
+    cutoff = time.time()
+    time.sleep(0.01)
+    new = store.create_campaign(POSTS, topic='New', platform='linkedin', tone='casual')
+    assert store.prune_campaigns(cutoff) == 1
+    assert not store.campaign_exists(old) and store.get_posts(old) == []
+    assert store.campaign_exists(new) and len(store.get_posts(new)) == 2
+    assert [post['topic'] for post in store.iter_posts()] == ['New', 'New']
+
+
+def test_expired_campaigns_are_pruned_as_new_ones_are_created(open_store, monkeypatch):
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(post_store.time, 'time', lambda: clock['now'])
+    store = open_store(retention=60)
+    old = store.create_campaign(POSTS, topic='Old', platform='linkedin', tone='casual')
+    clock['now'] += post_store.PRUNE_INTERVAL
+    store.create_campaign(POSTS, topic='New', platform='linkedin', tone='casual')
+    assert not store.campaign_exists(old)
+
+
+def test_no_retention_keeps_everything(open_store, monkeypatch):
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(post_store.time, 'time', lambda: clock['now'])
+    store = open_store()
+    old = store.create_campaign(POSTS, topic='Old', platform='linkedin', tone='casual')
+    clock['now'] += 365 * 86400
+    store.create_campaign(POSTS, topic='New', platform='linkedin', tone='casual')
+    assert store.campaign_exists(old)
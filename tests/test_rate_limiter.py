@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rate_limiter import DEFAULT_RETRY_AFTER, AdaptiveRateLimiter, estimate_tokens, retry_after_seconds  # noqa: E402
+
+
+def test_concurrency_grows_additively_on_success():
+    limiter = AdaptiveRateLimiter(max_concurrency=10)
+    limiter.limit = 2.0
+    for _ in range(2):
+        limiter.release(limiter.acquire(), 200)
+    # +1/limit per success: about one more slot per window of successes
+    assert limiter.limit == pytest.approx(2.0 + 1 / 2 + 1 / 2.5)
+
+
+def test_throttle_halves_concurrency_and_pauses_everyone():
+    limiter = AdaptiveRateLimiter(min_concurrency=2, max_concurrency=10)
+    limiter.release(limiter.acquire(), 429, {'retry-after-ms': '300'})
+    assert limiter.limit == 5.0
+    assert limiter.throttled == 1 and limiter.last_retry_after == pytest.approx(0.3)
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.1)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.1
+    for _ in range(5):
+        limiter.release(limiter.acquire(), 429, {'Retry-After': '0'})
+    assert limiter.limit == 2.0
+
+
+def test_concurrency_limit_blocks_until_release():
+    limiter = AdaptiveRateLimiter(max_concurrency=1)
+    permit = limiter.acquire()
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.1)
+    limiter.release(permit, 200)
+    limiter.acquire(timeout=0.1)
+
+
+def test_low_remaining_quota_stops_growth():
+    limiter = AdaptiveRateLimiter(rpm=600, max_concurrency=10)
+    limiter.limit = 2.0
+    limiter.release(limiter.acquire(), 200, {'x-ratelimit-remaining-requests': '1'})
+    assert limiter.limit == 2.0
+    assert limiter.requests.level <= 1
+
+
+def test_token_quota_refunds_unused_estimate():
+    limiter = AdaptiveRateLimiter(tpm=6000)
+    permit = limiter.acquire(estimated_tokens=800)
+    assert limiter.tokens.level == pytest.approx(200, abs=1)
+    limiter.release(permit, 200, used_tokens=300)
+    assert limiter.tokens.level == pytest.approx(700, abs=1)
+
+
+@pytest.mark.parametrize('headers, seconds', [
+    ({'retry-after-ms': '1500', 'Retry-After': '9'}, 1.5),
+    ({'Retry-After': '3'}, 3.0),
+    ({'Retry-After': 'soon'}, DEFAULT_RETRY_AFTER),
+    ({}, DEFAULT_RETRY_AFTER),
+])
+def test_retry_after_headers(headers, seconds):
+    assert retry_after_seconds(headers) == seconds
+
+
+def test_estimate_counts_prompt_and_every_candidate():
+    body = {'messages': [{'content': 'x' * 400}], 'max_tokens': 100, 'n': 3}
+    assert estimate_tokens(body) == 100 + 300
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from post_stream import IncrementalPostParser  # noqa: E402
+from response_parser import parse_response, split_content_hashtags  # noqa: E402
+
+with open(os.path.join(ROOT, 'benchmarks', 'parser_corpus.jsonl'), encoding='utf-8') as f:
+    CORPUS = [json.loads(line) for line in f if line.strip()]
+
+
+def stream(text, chunk_size):
+    parser = IncrementalPostParser()
+    released = ''.join(parser.feed(text[start:start + chunk_size]) for start in range(0, len(text), chunk_size))
+    return parser, released
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=[case['name'] for case in CORPUS])
+def test_corpus_parses_as_expected(case):
+    parsed = parse_response(case['text'], case['platform'])
+    assert {'content': parsed.content, 'hashtags': parsed.hashtag_text, 'mentions': parsed.mentions} == case['expected']
+    assert split_content_hashtags(case['text'], case['platform']) == (case['expected']['content'],
+                                                                       case['expected']['hashtags'])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 17])
+@pytest.mark.parametrize('case', CORPUS, ids=[case['name'] for case in CORPUS])
+def test_streamed_content_is_a_prefix_of_the_final_parse(case, chunk_size):
+    parser, released = stream(case['text'], chunk_size)
+    assert parser.text == case['text']
+    # Whatever was shown while streaming is content, never hashtags
+    assert case['expected']['content'].startswith(released.strip())
+
+
+def test_label_line_is_split_off():
+    content, hashtags = split_content_hashtags("Start small, measure everything.\n\n**Hashtags:** #AI #Leadership")
+    assert content == "Start small, measure everything."
+    assert hashtags == "#AI #Leadership"
+
+
+def test_label_list_continues_on_the_next_line():
+    content, hashtags = split_content_hashtags("Post body.\nHashtags:\n#One #Two\n#Three")
+    assert content == "Post body."
+    assert hashtags == "#One #Two #Three"
+
+
+def test_trailing_hashtag_run_on_twitter():
+    parsed = parse_response("Big news from @sundarpichai about #AI today! #Tech #Future", 'twitter')
+    assert parsed.content == "Big news from @sundarpichai about #AI today!"
+    assert parsed.hashtags == ['#Tech', '#Future']
+    assert parsed.mentions == ['@sundarpichai']
+
+
+def test_no_hashtags_leaves_content_alone():
+    assert split_content_hashtags("Just a plain post.", 'twitter') == ("Just a plain post.", '')
+
+
+def test_partial_label_is_held_back_until_it_is_decided():
+    parser = IncrementalPostParser()
+    assert parser.feed("Great post.\nHa") == "Great post.\n"
+    assert parser.feed("shtags: #a #b") == ''
+    parser = IncrementalPostParser()
+    parser.feed("Great post.\nHa")
+    assert parser.feed("ppy days ahead") == "Happy days ahead"
+
+
+def test_trailing_hashtags_are_held_back_while_streaming():
+    parser = IncrementalPostParser()
+    assert parser.feed("Nice tweet #A") == "Nice tweet"
+    assert parser.feed("I #Tech") == ''
+    parser = IncrementalPostParser()
+    assert parser.feed("Nice tweet #AI is") == "Nice tweet #AI is"
+
+
+def test_markdown_stars_are_not_streamed():
+    parser = IncrementalPostParser()
+    assert parser.feed("**Bold** start\n") == "Bold start\n"
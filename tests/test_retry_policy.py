@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generation_engine import CampaignDeadline, DeadlineExceeded  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+
+class Unavailable:
+    status_code = 503
+
+
+def failing(calls):
+    def fn():
+        calls.append(time.monotonic())
+        return Unavailable()
+    return fn
+
+
+def slow_policy():
+    policy = RetryPolicy(max_attempts=3, base_delay=10, max_delay=10)
+    # Always the longest backoff, so only the clamp can keep it short
+    policy.backoff = lambda attempt: 10
+    return policy
+
+
+def test_backoff_is_clamped_to_the_time_left():
+    calls = []
+    start = time.monotonic()
+    response = slow_policy().execute(failing(calls), time_left=lambda: 0.05)
+    assert response.status_code == 503
+    assert len(calls) == 3
+    assert time.monotonic() - start < 1
+
+
+def test_backoff_stops_at_the_campaign_deadline():
+    calls = []
+    deadline = CampaignDeadline(0.2, posts=1)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        slow_policy().execute(failing(calls), time_left=deadline.request_timeout)
+    # The first backoff sleeps out what is left, the second is never started
+    assert len(calls) == 2
+    assert 0.15 < time.monotonic() - start < 1
+
+
+def test_async_backoff_is_clamped_to_the_time_left():
+    calls = []
+
+    async def fn():
+        calls.append(time.monotonic())
+        return Unavailable()
+
+    start = time.monotonic()
+    response = asyncio.run(slow_policy().execute_async(fn, time_left=lambda: 0.05))
+    assert response.status_code == 503
+    assert len(calls) == 3
+    assert time.monotonic() - start < 1
+
+
+def test_without_time_left_the_backoff_is_unchanged():
+    policy = RetryPolicy(max_attempts=2, base_delay=0.1, max_delay=0.1)
+    policy.backoff = lambda attempt: 0.1
+    start = time.monotonic()
+    policy.execute(failing([]))
+    assert time.monotonic() - start >= 0.1
@@ -0,0 +1,80 @@
+import math
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Starting characters-per-token ratio until responses have been observed
+TOKEN_CHARS_PER_TOKEN = float(os.getenv("TOKEN_CHARS_PER_TOKEN", "4.0"))
+# Extra room over the exact budget so posts end naturally instead of being cut
+TOKEN_BUDGET_HEADROOM = float(os.getenv("TOKEN_BUDGET_HEADROOM", "1.3"))
+# Fixed tokens for the 'Hashtags:' label, line breaks and similar framing
+TOKEN_BUDGET_OVERHEAD = int(os.getenv("TOKEN_BUDGET_OVERHEAD", "24"))
+TOKEN_BUDGET_MIN = int(os.getenv("TOKEN_BUDGET_MIN", "64"))
+TOKEN_BUDGET_MAX = int(os.getenv("TOKEN_BUDGET_MAX", "4000"))
+# Budgets are rounded up to a multiple of this so that small calibration
+# changes don't change the request body (and with it the cache key)
+TOKEN_BUDGET_STEP = int(os.getenv("TOKEN_BUDGET_STEP", "32"))
+# Optional stop sequences, separated by '|'
+TOKEN_BUDGET_STOP = [stop.encode().decode('unicode_escape') for stop in os.getenv("TOKEN_BUDGET_STOP", "").split('|') if stop]
+# Weight of each new observation in the moving average
+CALIBRATION_ALPHA = 0.1
+
+
+class TokenBudget:
+    """Derives max_tokens from a character limit using a measured chars-per-token ratio."""
+
+    def __init__(self, chars_per_token=TOKEN_CHARS_PER_TOKEN, headroom=TOKEN_BUDGET_HEADROOM,
+                 overhead=TOKEN_BUDGET_OVERHEAD, minimum=TOKEN_BUDGET_MIN, maximum=TOKEN_BUDGET_MAX,
+                 step=TOKEN_BUDGET_STEP, stop=TOKEN_BUDGET_STOP):
+        self.chars_per_token = chars_per_token
+        self.headroom = headroom
+        self.overhead = overhead
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.stop = stop
+        self.observations = 0
+        self._lock = threading.Lock()
+
+    def max_tokens(self, char_limit, posts=1, per_post_overhead=None):
+        """Token budget for posts of up to char_limit characters each."""
+        if per_post_overhead is None:
+            per_post_overhead = self.overhead
+        with self._lock:
+            ratio = self.chars_per_token
+        tokens = posts * (char_limit / ratio * self.headroom + per_post_overhead)
+        tokens = math.ceil(tokens / self.step) * self.step
+        return max(self.minimum, min(self.maximum, tokens))
+
+    def apply(self, body, char_limit, posts=1, per_post_overhead=None):
+        """Set max_tokens (and stop, when configured) on a chat-completions body."""
+        body["max_tokens"] = self.max_tokens(char_limit, posts, per_post_overhead)
+        if self.stop:
+            body["stop"] = self.stop
+        return body
+
+    def observe(self, usage, texts):
+        """Calibrate the ratio from a response's usage and the generated text(s)."""
+        if not usage:
+            return
+        completion_tokens = usage.get("completion_tokens")
+        chars = sum(len(text) for text in texts)
+        if not completion_tokens or not chars:
+            return
+        with self._lock:
+            ratio = chars / completion_tokens
+            self.chars_per_token += CALIBRATION_ALPHA * (ratio - self.chars_per_token)
+            self.observations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'chars_per_token': round(self.chars_per_token, 3),
+                'observations': self.observations,
+                'headroom': self.headroom
+            }
+
+
+token_budget = TokenBudget()